@@ -0,0 +1,68 @@
+"""
+Single-core throughput of the per-chunk audio gain: the previous allocating implementation
+against GainStage, for a steady gain and for a gain ramp between blocks.
+
+Usage:
+    python -m benchmarks.audio_gain
+    python -m benchmarks.audio_gain --seconds 2 --runs 2000
+
+Chunks are random 48 kHz stereo int16 PCM of the given length, as Lyria streams them.
+"""
+
+import argparse
+import time
+from typing import Callable
+import numpy as np
+from service.lyria.gain_stage import GainStage
+
+
+def legacy_gain(audio_data: bytes, gain: float) -> bytes:
+    audio_array = np.frombuffer(audio_data, dtype=np.int16)
+    adjusted_array = audio_array.astype(np.float32) * gain
+    adjusted_array = np.clip(adjusted_array, -32768, 32767).astype(np.int16)
+    return adjusted_array.tobytes()
+
+
+def chunks_per_second(name: str, runs: int, process: Callable[[], object]) -> float:
+    for _ in range(min(runs, 50)):
+        process()
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        process()
+    rate = runs / (time.perf_counter() - start)
+    print(f"{name:22} {rate:10.0f} chunks/s")
+    return rate
+
+
+def main(args: argparse.Namespace) -> None:
+    rng = np.random.default_rng(7)
+    frames = int(args.seconds * GainStage.SAMPLE_RATE)
+    chunk = rng.integers(
+        -32768, 32767, frames * GainStage.CHANNELS, dtype=np.int16
+    ).tobytes()
+    print(f"{args.runs} chunks of {args.seconds:g}s ({len(chunk)} bytes) on one core")
+
+    legacy = chunks_per_second(
+        "legacy", args.runs, lambda: legacy_gain(chunk, args.gain)
+    )
+
+    stage = GainStage(args.gain)
+    steady = chunks_per_second("gain stage", args.runs, lambda: stage.process(chunk))
+
+    ramping = GainStage(args.gain, ramp_seconds=args.seconds)
+
+    def ramp() -> object:
+        ramping.ramp_to(0.9 if ramping.gain != 0.9 else args.gain)
+        return ramping.process(chunk)
+
+    ramped = chunks_per_second("gain stage (ramping)", args.runs, ramp)
+    print(f"speedup {steady / legacy:.2f}x steady, {ramped / legacy:.2f}x ramping")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=2.0, help="Chunk length")
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--gain", type=float, default=0.3)
+    main(parser.parse_args())
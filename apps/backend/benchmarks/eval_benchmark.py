@@ -0,0 +1,86 @@
+"""
+Offline benchmark for the full GlobalEvalService.evaluate path using recorded Groq responses.
+
+Usage:
+    python -m benchmarks.eval_benchmark video.mp4 --mode record      # once, needs GROQ_API_KEY
+    python -m benchmarks.eval_benchmark video.mp4                    # replay with recorded latency
+    python -m benchmarks.eval_benchmark video.mp4 --latency 0 --profile
+
+Recordings are keyed by a hash of each request, so a replay only hits when the frames,
+prompts and chosen models match the recorded run. Adaptive state (latency trackers, batch
+sizing) is reset before every run so each one starts cold like the recording did.
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import time
+
+
+def _reset_adaptive_state() -> None:
+    from utils.llm.hedging import HedgedCaller
+    from utils.llm.vision_batcher import VisionBatcher
+
+    HedgedCaller._callers.clear()
+    VisionBatcher._batchers.clear()
+
+
+def run_once(video: bytes) -> float:
+    from service.global_eval.global_eval_service import GlobalEvalService
+
+    _reset_adaptive_state()
+    start = time.perf_counter()
+    response = GlobalEvalService(video).evaluate()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{elapsed:8.2f}s  {len(response.scene_analysis)} scenes, "
+        f"{len(response.master_plan.musical_blocks)} blocks"
+    )
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("video", help="Video file to analyze")
+    parser.add_argument(
+        "--mode", choices=("record", "replay"), default="replay", help="Provider mode"
+    )
+    parser.add_argument(
+        "--recordings", default="recordings", help="Directory holding the recordings"
+    )
+    parser.add_argument(
+        "--latency",
+        help="Replay latency in seconds per call, defaults to the recorded latency",
+    )
+    parser.add_argument("--runs", type=int, default=1, help="Number of runs")
+    parser.add_argument(
+        "--profile", action="store_true", help="Print a cProfile of the last run"
+    )
+    args = parser.parse_args()
+
+    os.environ["LLM_PROVIDER_MODE"] = args.mode
+    os.environ["LLM_RECORDINGS_DIR"] = args.recordings
+    os.environ["SCENE_CACHE_ENABLED"] = "false"
+    if args.latency is not None:
+        os.environ["LLM_REPLAY_LATENCY"] = args.latency
+    if args.mode == "replay":
+        os.environ.setdefault("GROQ_API_KEY", "replay")
+
+    with open(args.video, "rb") as f:
+        video = f.read()
+
+    timings = [run_once(video) for _ in range(max(args.runs - 1, 0))]
+
+    if args.profile:
+        profiler = cProfile.Profile()
+        timings.append(profiler.runcall(run_once, video))
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    else:
+        timings.append(run_once(video))
+
+    if len(timings) > 1:
+        print(
+            f"min {min(timings):.2f}s  mean {sum(timings) / len(timings):.2f}s  "
+            f"max {max(timings):.2f}s over {len(timings)} runs"
+        )
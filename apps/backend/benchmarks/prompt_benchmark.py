@@ -0,0 +1,177 @@
+"""
+Offline benchmark for the LLM prompts: compares the legacy prompts with the compact,
+token-budgeted ones built by PromptBuilder.
+
+Usage:
+    python -m benchmarks.prompt_benchmark
+    python -m benchmarks.prompt_benchmark --input recorded_session.json
+    python -m benchmarks.prompt_benchmark --live   # also times real Groq calls
+
+The optional input file holds {"scene_analysis": [...], "transcript": [...]} as produced
+by GlobalEvalService. Without it, synthetic videos of several lengths are generated.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from typing import Callable, List, Tuple
+from utils.llm.prompt_builder import PromptBuilder
+from utils.llm.transcript_index import TranscriptIndex
+
+WORDS = (
+    "city night rain neon street walk quiet voice friend laugh memory light "
+    "window train morning coffee argue promise leave return ocean wind road"
+).split()
+MOODS = ["Tense", "Joyful", "Melancholic", "Calm", "Hopeful", "Dark"]
+BUILD_RUNS = 20
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_video(duration: float, seed: int = 7) -> Tuple[List[dict], List[dict]]:
+    rng = random.Random(seed)
+    scenes = []
+    t = 0.0
+    while t < duration:
+        end = min(duration, t + rng.uniform(4, 12))
+        scenes.append(
+            {
+                "description": _sentence(rng, 55),
+                "mood": rng.choice(MOODS),
+                "keywords": [rng.choice(WORDS) for _ in range(4)],
+                "dialogue_summary": _sentence(rng, 15),
+                "timestamp": round((t + end) / 2, 2),
+                "start_time": round(t, 2),
+                "end_time": round(end, 2),
+            }
+        )
+        t = end
+
+    transcript = []
+    t = 0.0
+    while t < duration:
+        end = min(duration, t + rng.uniform(2, 6))
+        transcript.append(
+            {
+                "text": _sentence(rng, 14),
+                "timestamp": f"{round(t, 2)} - {round(end, 2)}",
+            }
+        )
+        t = end
+
+    return scenes, transcript
+
+
+def _timed(build: Callable[[], str]) -> Tuple[str, float]:
+    prompt = build()
+    start = time.perf_counter()
+    for _ in range(BUILD_RUNS):
+        build()
+    return prompt, (time.perf_counter() - start) / BUILD_RUNS * 1000
+
+
+def _scene_data(scenes: List[dict], transcript: List[dict]) -> List[dict]:
+    scenes = scenes[:5]
+    scene_transcripts = TranscriptIndex(transcript).query_many(
+        [scene["start_time"] for scene in scenes],
+        [scene["end_time"] for scene in scenes],
+    )
+    return [
+        {
+            "timestamp": scene["timestamp"],
+            "scene_start": scene["start_time"],
+            "scene_end": scene["end_time"],
+            "transcription": scene_transcript,
+        }
+        for scene, scene_transcript in zip(scenes, scene_transcripts)
+    ]
+
+
+def _live_latency(prompt: str) -> Tuple[float, int, int]:
+    from groq import Groq
+
+    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    start = time.perf_counter()
+    response = client.chat.completions.create(
+        model=os.getenv("GROQ_REASONING_MODEL", "openai/gpt-oss-120b"),
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.7,
+    )
+    elapsed = time.perf_counter() - start
+    usage = response.usage
+    return (
+        elapsed,
+        usage.prompt_tokens if usage else 0,
+        usage.completion_tokens if usage else 0,
+    )
+
+
+def run(cases: List[Tuple[str, List[dict], List[dict]]], live: bool) -> None:
+    legacy = PromptBuilder(compact=False)
+    compact = PromptBuilder(
+        token_budget=int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "8000")), compact=True
+    )
+
+    header = f"{'case':<14}{'prompt':<14}{'legacy tok':>12}{'compact tok':>13}{'saved':>8}{'legacy ms':>11}{'compact ms':>12}"
+    print(header)
+    print("-" * len(header))
+
+    for name, scenes, transcript in cases:
+        scene_data = _scene_data(scenes, transcript)
+        builds = {
+            "scene chunk": (
+                lambda: legacy.build_scene_prompt(scene_data),
+                lambda: compact.build_scene_prompt(scene_data),
+            ),
+            "master plan": (
+                lambda: legacy.build_master_plan_prompt(scenes, transcript),
+                lambda: compact.build_master_plan_prompt(scenes, transcript),
+            ),
+        }
+
+        for label, (build_legacy, build_compact) in builds.items():
+            legacy_prompt, legacy_ms = _timed(build_legacy)
+            compact_prompt, compact_ms = _timed(build_compact)
+            legacy_tokens = PromptBuilder.estimate_tokens(legacy_prompt)
+            compact_tokens = PromptBuilder.estimate_tokens(compact_prompt)
+            saved = 1 - compact_tokens / legacy_tokens if legacy_tokens else 0.0
+            print(
+                f"{name:<14}{label:<14}{legacy_tokens:>12}{compact_tokens:>13}"
+                f"{saved:>8.0%}{legacy_ms:>11.2f}{compact_ms:>12.2f}"
+            )
+
+            if live and label == "master plan":
+                for variant, prompt in (
+                    ("legacy", legacy_prompt),
+                    ("compact", compact_prompt),
+                ):
+                    elapsed, prompt_tokens, completion_tokens = _live_latency(prompt)
+                    print(
+                        f"{'':<14}{'  live ' + variant:<14}{prompt_tokens:>12} in"
+                        f"{completion_tokens:>9} out{elapsed:>10.2f}s"
+                    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", help="JSON file with scene_analysis and transcript")
+    parser.add_argument(
+        "--live", action="store_true", help="Also time real master plan calls"
+    )
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input) as f:
+            data = json.load(f)
+        cases = [("input", data["scene_analysis"], data["transcript"])]
+    else:
+        cases = [
+            (f"{minutes} min", *synthetic_video(minutes * 60.0))
+            for minutes in (1, 5, 15, 30)
+        ]
+
+    run(cases, live=args.live)
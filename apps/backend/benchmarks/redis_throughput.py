@@ -0,0 +1,138 @@
+"""
+Store and get throughput of RedisService against a running Redis or Redis Cluster.
+
+Usage:
+    docker compose -f benchmarks/redis-cluster.yml up -d
+    python -m benchmarks.redis_throughput --url redis://localhost:6380
+    python -m benchmarks.redis_throughput --url redis://localhost:7000 --cluster
+    python -m benchmarks.redis_throughput --url redis://localhost:7000 --cluster --replica-reads
+
+The compose file starts a standalone server on 6380 and a 3 primary / 3 replica cluster
+on 7000-7005. Gets go through fetch_session with the TTL extension used on WebSocket
+connect; the near-cache is disabled so every get reaches Redis.
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+from models.llm_response import LLMResponse, MasterPlan, MusicBlocks
+from models.lyria_config import LyriaConfig
+from service.redis_service import RedisService
+
+
+def synthetic_session(blocks: int) -> LLMResponse:
+    return LLMResponse(
+        scene_analysis=[
+            {
+                "description": f"Scene {i} on a rainy street at night",
+                "mood": "Melancholic",
+                "keywords": ["rain", "neon", "city"],
+                "timestamp": i * 5.0,
+                "start_time": i * 5.0,
+                "end_time": i * 5.0 + 5.0,
+            }
+            for i in range(blocks * 4)
+        ],
+        master_plan=MasterPlan(
+            global_context="Noir thriller with a slow build",
+            musical_blocks=[
+                MusicBlocks(
+                    time_range={"start": i * 20.0, "end": i * 20.0 + 20.0},
+                    musical_direction="Sparse piano over low strings",
+                    transition="Crossfade",
+                    gain=0.8,
+                    lyria_config=LyriaConfig(
+                        prompt="melancholic piano, low strings, rain ambience",
+                        bpm=80,
+                        scale="C_MAJOR_A_MINOR",
+                        weight=1.0,
+                    ),
+                )
+                for i in range(blocks)
+            ],
+        ),
+    )
+
+
+async def run_phase(
+    name: str,
+    count: int,
+    concurrency: int,
+    operation: Callable[[int], Awaitable[object]],
+) -> List[object]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def timed(i: int) -> object:
+        async with semaphore:
+            start = time.perf_counter()
+            result = await operation(i)
+            latencies.append(time.perf_counter() - start)
+            return result
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(timed(i) for i in range(count)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(
+        f"{name:6} {count / elapsed:9.0f} ops/s  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms"
+    )
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    service = RedisService(
+        redis_url=args.url,
+        max_connections=args.concurrency,
+        layout=args.layout,
+        near_cache_size=0,
+        cluster=args.cluster,
+        replica_reads=args.replica_reads,
+        replica_url=args.replica_url,
+    )
+    await service.connect()
+    session = synthetic_session(args.blocks)
+
+    try:
+        print(
+            f"{args.sessions} sessions of {args.blocks} blocks, "
+            f"concurrency {args.concurrency}, {args.layout} layout"
+        )
+        session_ids = await run_phase(
+            "store",
+            args.sessions,
+            args.concurrency,
+            lambda i: service.store_session(session),
+        )
+        for _ in range(args.rounds):
+            await run_phase(
+                "get",
+                args.sessions,
+                args.concurrency,
+                lambda i: service.fetch_session(session_ids[i], extend_ttl=1800),
+            )
+        await asyncio.gather(*(service.delete_session(s) for s in session_ids))
+    finally:
+        await service.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="redis://localhost:6379", help="Redis URL")
+    parser.add_argument("--cluster", action="store_true", help="Use cluster mode")
+    parser.add_argument(
+        "--replica-reads", action="store_true", help="Read sessions from replicas"
+    )
+    parser.add_argument("--replica-url", help="Replica URL for a standalone primary")
+    parser.add_argument(
+        "--layout", choices=RedisService.LAYOUTS, default=RedisService.LAYOUT_BLOB
+    )
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--blocks", type=int, default=30, help="Blocks per session")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=3, help="Get rounds per run")
+    asyncio.run(main(parser.parse_args()))
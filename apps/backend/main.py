@@ -1,22 +1,31 @@
 import os
 import json
+import asyncio
 import uvicorn
 from contextlib import asynccontextmanager
 from typing import Dict, Any
 from fastapi import (
     FastAPI,
     UploadFile,
+    BackgroundTasks,
     WebSocket,
     WebSocketDisconnect,
     HTTPException,
     File,
     status,
     Depends,
+    Request,
 )
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from models.llm_response import MasterPlan
 from service.global_eval.global_eval_service import GlobalEvalService
+from service.lyria.audio_encoder import AudioFormat
+from service.lyria.broadcast_hub import BroadcastHub
+from service.lyria.lyria_pool import LyriaSessionPool
 from service.lyria.lyria_service import LyriaService
+from service.lyria.soundtrack_cache import SoundtrackCache, parse_byte_range
 from shared.logging import get_logger
 from service.redis_service import RedisService
 from service.auth.dependencies import get_current_user, get_ws_token
@@ -27,6 +36,48 @@ load_dotenv()
 redis_service = RedisService(
     redis_url=os.getenv("REDIS_URL", "redis://localhost:6379"),
     session_ttl=int(os.getenv("REDIS_SESSION_TTL", "3600")),
+    max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+    pool_timeout=float(os.getenv("REDIS_POOL_TIMEOUT", "5")),
+    socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "5")),
+    socket_connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", "2")),
+    health_check_interval=int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30")),
+    compress_threshold=int(os.getenv("REDIS_SESSION_COMPRESS_THRESHOLD", "4096")),
+    layout=os.getenv("REDIS_SESSION_LAYOUT", RedisService.LAYOUT_BLOB),
+    initial_blocks=int(os.getenv("REDIS_SESSION_INITIAL_BLOCKS", "3")),
+    near_cache_size=int(os.getenv("REDIS_NEAR_CACHE_SIZE", "256")),
+    cluster=os.getenv("REDIS_CLUSTER", "false").lower() == "true",
+    replica_reads=os.getenv("REDIS_REPLICA_READS", "false").lower() == "true",
+    replica_url=os.getenv("REDIS_REPLICA_URL") or None,
+    replica_fallback=os.getenv("REDIS_REPLICA_FALLBACK", "true").lower() == "true",
+    retry_attempts=int(os.getenv("REDIS_RETRY_ATTEMPTS", "3")),
+    retry_backoff_cap=float(os.getenv("REDIS_RETRY_BACKOFF_CAP", "1")),
+)
+
+lyria_pool = LyriaSessionPool(
+    idle_ttl=float(os.getenv("LYRIA_PREWARM_TTL", "30")),
+    max_sessions=int(os.getenv("LYRIA_PREWARM_MAX_SESSIONS", "32")),
+    enabled=os.getenv("LYRIA_PREWARM", "true").lower() == "true",
+)
+
+soundtrack_cache = (
+    SoundtrackCache(
+        root=os.getenv("SOUNDTRACK_CACHE_DIR", "/tmp/timbre-soundtracks"),
+        ttl=float(os.getenv("SOUNDTRACK_CACHE_TTL", "86400")),
+        segment_seconds=float(os.getenv("SOUNDTRACK_SEGMENT_SECONDS", "30")),
+    )
+    if os.getenv("SOUNDTRACK_CACHE", "false").lower() == "true"
+    else None
+)
+
+broadcast_hub = (
+    BroadcastHub(
+        redis_service,
+        owner_ttl=int(os.getenv("LYRIA_BROADCAST_OWNER_TTL", "15")),
+        queue_chunks=int(os.getenv("LYRIA_BROADCAST_QUEUE_CHUNKS", "8")),
+        compress=os.getenv("LYRIA_BROADCAST_COMPRESS", "true").lower() == "true",
+    )
+    if os.getenv("LYRIA_BROADCAST", "false").lower() == "true"
+    else None
 )
 
 
@@ -42,6 +93,17 @@ async def lifespan(app: FastAPI):
     yield
 
     # Shutdown
+    if broadcast_hub:
+        try:
+            await broadcast_hub.close()
+        except Exception as e:
+            logger.error(f"Error closing broadcast subscriptions on shutdown: {e}")
+
+    try:
+        await lyria_pool.close()
+    except Exception as e:
+        logger.error(f"Error closing pre-warmed Lyria sessions on shutdown: {e}")
+
     try:
         await redis_service.disconnect()
         logger.info("Application shutdown completed - Redis disconnected")
@@ -60,11 +122,46 @@ app.add_middleware(
 )
 
 
+async def continue_progressive_analysis(
+    global_context_service: GlobalEvalService,
+    session_id: str,
+    previous_plan: MasterPlan,
+) -> None:
+    musical_blocks = []
+    scene_analysis = []
+    analysis_error = None
+    try:
+        remainder = await asyncio.to_thread(
+            global_context_service.evaluate_remainder, previous_plan
+        )
+        musical_blocks = remainder.master_plan.musical_blocks
+        scene_analysis = remainder.scene_analysis
+    except Exception as e:
+        logger.error(f"Background analysis failed for session {session_id}: {e}")
+        # Playback stops waiting for blocks and tells the client why the music ends
+        analysis_error = "Analysis of the rest of the video failed"
+
+    try:
+        await redis_service.append_musical_blocks(
+            session_id,
+            musical_blocks,
+            scene_analysis,
+            analysis_complete=analysis_error is None,
+            analysis_error=analysis_error,
+        )
+    except Exception as e:
+        logger.error(
+            f"Failed to append background analysis to session {session_id}: {e}"
+        )
+
+
 @app.post("/api/context")
 async def get_context(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(
         ..., description="MP4 video file to analyze", media_type="video/mp4"
     ),
+    progressive: bool = False,
     current_user: Dict[str, Any] = Depends(get_current_user),
 ) -> Dict[str, Any]:
     logger.info("Processing video file for global context extraction")
@@ -102,7 +199,11 @@ async def get_context(
 
         try:
             global_context_service = GlobalEvalService(video=video_content)
-            config = global_context_service.evaluate()
+            if progressive:
+                opening_seconds = float(os.getenv("PROGRESSIVE_OPENING_SECONDS", "30"))
+                config = global_context_service.evaluate_opening(opening_seconds)
+            else:
+                config = global_context_service.evaluate()
 
             if not config:
                 logger.error("Global evaluation service returned empty configuration")
@@ -118,10 +219,31 @@ async def get_context(
             try:
                 session_id = await redis_service.store_session(config)
                 logger.info(f"Session {session_id} created for video: {file.filename}")
+                # Playback usually follows; have a primed Lyria connection ready for it
+                if config.master_plan.musical_blocks:
+                    lyria_pool.prewarm(
+                        session_id, config.master_plan.musical_blocks[0].lyria_config
+                    )
+
+                if not config.analysis_complete:
+                    background_tasks.add_task(
+                        continue_progressive_analysis,
+                        global_context_service,
+                        session_id,
+                        config.master_plan,
+                    )
+                    return {
+                        "session_id": session_id,
+                        "message": "Opening analyzed, remaining video is being analyzed in the background",
+                        "expires_in": redis_service.session_ttl,
+                        "analysis_complete": False,
+                    }
+
                 return {
                     "session_id": session_id,
                     "message": "Video analysis completed successfully",
                     "expires_in": redis_service.session_ttl,
+                    "analysis_complete": True,
                 }
             except Exception as redis_error:
                 logger.error(f"Failed to store session in Redis: {redis_error}")
@@ -150,6 +272,63 @@ async def get_context(
         )
 
 
+@app.get("/api/soundtrack/{session_id}")
+async def get_soundtrack(
+    session_id: str,
+    request: Request,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+) -> StreamingResponse:
+    """The session's rendered soundtrack as WAV, with byte range support for seeking"""
+    if soundtrack_cache is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Soundtrack cache is disabled",
+        )
+
+    try:
+        # Manifest reads hit the disk, keep them off the loop serving music sockets
+        segments = await asyncio.to_thread(soundtrack_cache.segments, session_id)
+        complete = await asyncio.to_thread(soundtrack_cache.is_complete, session_id)
+    except ValueError:
+        segments = []
+    if not segments:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No audio has been rendered for this session yet",
+        )
+
+    size = soundtrack_cache.wav_size(segments)
+    headers = {
+        "Accept-Ranges": "bytes",
+        # A partial render grows as live playback continues
+        "Cache-Control": "private, max-age=3600" if complete else "no-cache",
+    }
+    byte_range = None
+    if request.headers.get("range"):
+        try:
+            byte_range = parse_byte_range(request.headers["range"], size)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{size}"},
+            )
+
+    first, last = byte_range or (0, size - 1)
+    headers["Content-Length"] = str(last - first + 1)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+
+    return StreamingResponse(
+        soundtrack_cache.iter_wav(session_id, segments, first, last),
+        status_code=(
+            status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK
+        ),
+        media_type="audio/wav",
+        headers=headers,
+    )
+
+
 @app.websocket("/ws/music")
 async def music_websocket_endpoint(websocket: WebSocket, token: str):
     try:
@@ -173,33 +352,63 @@ async def music_websocket_endpoint(websocket: WebSocket, token: str):
 
         try:
             session_id = data["session_id"]
-            llm_response = await redis_service.get_session(session_id)
+            session = await redis_service.fetch_session(session_id, extend_ttl=1800)
 
-            if llm_response is None:
+            if session is None:
                 logger.error(f"Session {session_id} not found or expired")
                 await websocket.close(code=1003, reason="Session not found or expired")
                 return
 
-            await redis_service.extend_session_ttl(session_id)
             logger.info(f"Retrieved and extended session {session_id}")
+            # Overlaps connecting to Lyria with the checkpoint lookup and session_data send,
+            # unless the music comes from the cache or another connection's broadcast
+            musical_blocks = session.llm_response.master_plan.musical_blocks
+            if musical_blocks and not (
+                (soundtrack_cache and soundtrack_cache.is_complete(session_id))
+                or (broadcast_hub and await broadcast_hub.owned(session_id))
+            ):
+                lyria_pool.prewarm(session_id, musical_blocks[0].lyria_config)
 
         except Exception as e:
             logger.error("Could not fetch session values from redis: %s", e)
             await websocket.close(code=1003, reason="Failed to retrieve session data")
             return
 
-        await websocket.send_text(
-            json.dumps(
-                {
-                    "type": "session_data",
-                    "data": redis_service._llm_response_to_dict(llm_response),
-                }
+        resume_token = data.get("resume_token")
+        checkpoint = None
+        if resume_token:
+            try:
+                checkpoint = await redis_service.get_checkpoint(
+                    session_id, resume_token
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Could not load playback checkpoint, starting fresh: {e}"
+                )
+
+        audio_format = None
+        if isinstance(data.get("audio"), dict):
+            audio_format = AudioFormat.negotiate(data["audio"])
+            await websocket.send_text(
+                json.dumps({"type": "audio_format", **audio_format.to_dict()})
             )
-        )
+
+        await websocket.send_text(session.message("session_data"))
 
         lyria_service = LyriaService(
-            user_websocket=websocket, llm_response=llm_response
+            user_websocket=websocket,
+            llm_response=session.llm_response,
+            session_id=session_id,
+            redis_service=redis_service,
+            block_count=session.block_count,
+            resume_token=resume_token if checkpoint else None,
+            audio_format=audio_format,
+            lyria_pool=lyria_pool,
+            soundtrack_cache=soundtrack_cache,
+            broadcast_hub=broadcast_hub,
         )
+        if checkpoint or data.get("position") is not None:
+            await lyria_service.resume(checkpoint, position=data.get("position"))
         await lyria_service.start_session()
 
         logger.info("Lyria session started successfully")
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 from models.lyria_config import LyriaConfig
 
 
@@ -22,3 +22,6 @@ class MasterPlan:
 class LLMResponse:
     scene_analysis: List[dict]
     master_plan: MasterPlan
+    analysis_complete: bool = True
+    # Set when background analysis failed, no more blocks will be appended
+    analysis_error: Optional[str] = None
@@ -1,6 +1,11 @@
 from google.genai import types
 from dataclasses import dataclass
 
+# Scale names are matched case-insensitively against the Lyria enum
+_LYRIA_SCALES = {
+    scale_member.name.lower(): scale_member for scale_member in types.Scale
+}
+
 
 @dataclass
 class LyriaConfig:
@@ -18,7 +23,7 @@ class LyriaConfig:
         }
 
     def get_lyria_scale(self) -> types.Scale:
-        for scale_member in types.Scale:
-            if scale_member.name.lower() == self.scale.lower():
-                return scale_member
-        raise ValueError(f"Invalid scale value: {self.scale}")
+        scale_member = _LYRIA_SCALES.get(self.scale.lower())
+        if scale_member is None:
+            raise ValueError(f"Invalid scale value: {self.scale}")
+        return scale_member
@@ -1,5 +1,8 @@
 import concurrent.futures
-from models.llm_response import LLMResponse
+from dataclasses import replace
+from typing import List, Optional, Tuple
+from models.frame import Frame
+from models.llm_response import LLMResponse, MasterPlan
 from shared.logging import get_logger
 from utils.audio.audio_utils import AudioUtils
 from utils.helper.helper_utils import HelperUtils
@@ -17,19 +20,77 @@ class GlobalEvalService:
         self.temp_video_path = self.helper_utils.create_temp_file(video=video)
         self.video_utils = VideoUtils(self.temp_video_path)
         self.llm_utils = LLMUtils()
+        # Where the opening analysis stopped; the background pass covers the rest
+        self.split_time = 0.0
+
+    def _extract_transcript_and_frames(self) -> Tuple[List[dict], List[Frame]]:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            transcription_future = executor.submit(
+                self.audio_utils.get_transcription, video_bytes=self.video
+            )
+            frames_future = executor.submit(self.video_utils.get_unique_frames)
+
+            return transcription_future.result(), frames_future.result()
+
+    def _extract_segment(
+        self, start: float, end: Optional[float]
+    ) -> Tuple[List[dict], List[Frame]]:
+        """
+        Transcript and scenes of the video from start to end, or to the end of the video
+        when end is None. Times are shifted back onto the full video's timeline.
+        """
+        clip_path = self.helper_utils.trim_video(
+            video_path=self.temp_video_path,
+            start_duration=start,
+            end_duration=end,
+        )
+        with open(clip_path, "rb") as clip_file:
+            clip = clip_file.read()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            transcription_future = executor.submit(
+                self.audio_utils.get_transcription, video_bytes=clip
+            )
+            # Removes the clip once the scenes are extracted
+            frames_future = executor.submit(VideoUtils(clip_path).get_unique_frames)
+
+            transcriptions = transcription_future.result()
+            frames = frames_future.result()
+
+        if not start:
+            return transcriptions, frames
+        return self._shift_transcript(transcriptions, start), [
+            replace(
+                frame,
+                timestamp=frame.timestamp + start,
+                scene_start=frame.scene_start + start,
+                scene_end=frame.scene_end + start,
+            )
+            for frame in frames
+        ]
+
+    @staticmethod
+    def _shift_transcript(transcriptions: List[dict], offset: float) -> List[dict]:
+        shifted = []
+        for entry in transcriptions:
+            try:
+                start, end = (float(t) for t in entry["timestamp"].split(" - "))
+            except (KeyError, ValueError, AttributeError):
+                logger.warning(f"Could not shift transcript entry: {entry}")
+                continue
+            shifted.append(
+                {
+                    **entry,
+                    "timestamp": f"{round(start + offset, 2)} - {round(end + offset, 2)}",
+                }
+            )
+        return shifted
 
     def evaluate(self) -> LLMResponse:
         try:
             logger.info("Starting global evaluation of the video.")
 
-            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                transcription_future = executor.submit(
-                    self.audio_utils.get_transcription, video_bytes=self.video
-                )
-                frames_future = executor.submit(self.video_utils.get_unique_frames)
-
-                transcriptions = transcription_future.result()
-                frames = frames_future.result()
+            transcriptions, frames = self._extract_transcript_and_frames()
 
             response = self.llm_utils.get_global_config(
                 transcript=transcriptions, frames=frames
@@ -42,6 +103,82 @@ class GlobalEvalService:
             logger.error(f"Error during global evaluation: {e}")
             raise e
 
+    def evaluate_opening(self, opening_seconds: float) -> LLMResponse:
+        try:
+            logger.info(
+                f"Starting progressive evaluation of the first {opening_seconds}s."
+            )
+
+            duration = self.video_utils.get_duration()
+            if 0 < duration <= opening_seconds:
+                # Nothing would be left for the background pass
+                logger.info("Video fits in the opening, evaluating it in full.")
+                response = self.evaluate()
+                response.analysis_complete = True
+                return response
+
+            transcriptions, frames = self._extract_segment(0.0, opening_seconds)
+            self.split_time = max(
+                (frame.scene_end for frame in frames), default=opening_seconds
+            )
+
+            response = self.llm_utils.get_global_config(
+                transcript=transcriptions, frames=frames
+            )
+            response.analysis_complete = False
+
+            logger.info(
+                f"Opening evaluation completed up to {self.split_time}s, the rest is left for background analysis."
+            )
+
+            return response
+        except Exception as e:
+            logger.error(f"Error during opening evaluation: {e}")
+            raise e
+
+    def evaluate_remainder(self, previous_plan: MasterPlan) -> LLMResponse:
+        try:
+            logger.info("Starting background evaluation of the remaining video.")
+
+            # Only what the opening pass left out is transcribed and scene-detected
+            remaining_transcript, remaining_frames = self._extract_segment(
+                self.split_time, None
+            )
+            if not remaining_frames:
+                return LLMResponse(
+                    scene_analysis=[],
+                    master_plan=MasterPlan(
+                        global_context=previous_plan.global_context,
+                        musical_blocks=[],
+                    ),
+                )
+
+            response = self.llm_utils.get_global_config(
+                transcript=remaining_transcript,
+                frames=remaining_frames,
+                previous_plan=previous_plan,
+            )
+
+            if previous_plan.musical_blocks:
+                previous_end = float(previous_plan.musical_blocks[-1].time_range["end"])
+                musical_blocks = [
+                    block
+                    for block in response.master_plan.musical_blocks
+                    if float(block.time_range["end"]) > previous_end
+                ]
+                if musical_blocks:
+                    musical_blocks[0].time_range["start"] = previous_end
+                response.master_plan.musical_blocks = musical_blocks
+
+            logger.info(
+                f"Background evaluation completed with {len(response.master_plan.musical_blocks)} new blocks."
+            )
+
+            return response
+        except Exception as e:
+            logger.error(f"Error during background evaluation: {e}")
+            raise e
+
 
 if __name__ == "__main__":
     import time
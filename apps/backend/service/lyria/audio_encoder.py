@@ -0,0 +1,401 @@
+import asyncio
+import concurrent.futures
+import os
+import shutil
+import struct
+import subprocess
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple, Union
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+_ENCODER_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv("AUDIO_ENCODER_WORKERS", "4")),
+    thread_name_prefix="audio-encode",
+)
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    """Encoding of the audio sent to a client, negotiated on the WebSocket handshake"""
+
+    ENCODING_PCM = "pcm"
+    ENCODING_OPUS = "opus"
+    ENCODING_FLAC = "flac"
+    CODEC_IDS = {ENCODING_PCM: 0, ENCODING_OPUS: 1, ENCODING_FLAC: 2}
+    SAMPLE_RATES = (48000, 24000, 16000)
+    SOURCE_SAMPLE_RATE = 48000
+    SOURCE_CHANNELS = 2
+
+    encoding: str = ENCODING_PCM
+    sample_rate: int = SOURCE_SAMPLE_RATE
+    channels: int = SOURCE_CHANNELS
+    bitrate: int = 64000
+
+    @property
+    def is_source(self) -> bool:
+        """Whether Lyria's PCM can be sent as is"""
+        return (
+            self.encoding == self.ENCODING_PCM
+            and self.sample_rate == self.SOURCE_SAMPLE_RATE
+            and self.channels == self.SOURCE_CHANNELS
+        )
+
+    @classmethod
+    def negotiate(cls, requested: Dict[str, Any]) -> "AudioFormat":
+        """The closest supported format to what the client asked for"""
+        encoding = str(requested.get("encoding", cls.ENCODING_PCM)).lower()
+        if encoding not in cls.CODEC_IDS:
+            logger.warning(f"Unsupported audio encoding {encoding}, using pcm")
+            encoding = cls.ENCODING_PCM
+
+        try:
+            sample_rate = int(requested.get("sample_rate", cls.SOURCE_SAMPLE_RATE))
+            channels = int(requested.get("channels", cls.SOURCE_CHANNELS))
+            bitrate = int(requested.get("bitrate", 64000))
+        except (TypeError, ValueError):
+            sample_rate, channels = cls.SOURCE_SAMPLE_RATE, cls.SOURCE_CHANNELS
+            bitrate = 64000
+        if sample_rate not in cls.SAMPLE_RATES:
+            sample_rate = cls.SOURCE_SAMPLE_RATE
+        channels = 1 if channels == 1 else cls.SOURCE_CHANNELS
+        bitrate = min(max(bitrate, 16000), 256000)
+
+        audio_format = cls(encoding, sample_rate, channels, bitrate)
+        if not audio_format.is_source and not shutil.which("ffmpeg"):
+            logger.warning("ffmpeg not found, sending uncompressed audio")
+            return cls()
+        return audio_format
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "encoding": self.encoding,
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+            "bitrate": self.bitrate,
+        }
+
+
+def opus_packet_frames(packet: bytes) -> int:
+    """Duration of an Opus packet in 48 kHz frames, from its TOC byte (RFC 6716 3.1)"""
+    toc = packet[0]
+    config = toc >> 3
+    if config < 12:
+        frame = (480, 960, 1920, 2880)[config & 3]
+    elif config < 16:
+        frame = (480, 960)[config & 1]
+    else:
+        frame = (120, 240, 480, 960)[config & 3]
+    code = toc & 3
+    if code == 0:
+        count = 1
+    elif code < 3:
+        count = 2
+    else:
+        count = packet[1] & 0x3F
+    return frame * count
+
+
+class OggPacketReader:
+    """Splits an Ogg byte stream into its packets as pages arrive"""
+
+    # capture pattern, version, header type, granule position, serial, page sequence,
+    # checksum, segment count
+    PAGE_HEADER = struct.Struct("<4sBBqIIIB")
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        # A packet continued on the next page
+        self.partial = bytearray()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        self.buffer += data
+        packets = []
+        while len(self.buffer) >= self.PAGE_HEADER.size:
+            capture, *_, segments = self.PAGE_HEADER.unpack_from(self.buffer)
+            if capture != b"OggS":
+                raise ValueError("Lost Ogg page sync")
+            table_end = self.PAGE_HEADER.size + segments
+            if len(self.buffer) < table_end:
+                break
+            lacing = self.buffer[self.PAGE_HEADER.size : table_end]
+            if len(self.buffer) < table_end + sum(lacing):
+                break
+
+            offset = table_end
+            for size in lacing:
+                self.partial += self.buffer[offset : offset + size]
+                offset += size
+                if size < 255:
+                    packets.append(bytes(self.partial))
+                    self.partial.clear()
+            del self.buffer[:offset]
+        return packets
+
+
+class OpusStream:
+    """
+    One Opus encode spanning a run of contiguous chunks. A single long-lived ffmpeg keeps
+    the encoder state from chunk to chunk, so there is no priming or padding at chunk
+    boundaries. Its Ogg output is unpacked and the raw Opus packets are sent on, for the
+    client to decode as one stream.
+    """
+
+    SAMPLE_RATE = 48000
+    # libopus holds back up to a frame plus its lookahead until more input arrives
+    ENCODER_DELAY = 2 * 960
+    OUTPUT_TIMEOUT = 1.0
+
+    def __init__(self, command: List[str], start: int) -> None:
+        self.command = command
+        # Music time of the first input frame, in 48 kHz frames
+        self.start = start
+        self.written = 0
+        # 48 kHz frames in the packets read, and in those already taken
+        self.decoded = 0
+        self.taken = 0
+        self.head: Optional[bytes] = None
+        self.head_sent = False
+        self.pre_skip = 0
+        self.packets: List[bytes] = []
+        self.output = asyncio.Event()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.reader_task: Optional[asyncio.Task] = None
+
+    @property
+    def end(self) -> int:
+        """Music time the next chunk must start at to continue this stream"""
+        return self.start + self.written
+
+    async def open(self) -> None:
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self.reader_task = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        reader = OggPacketReader()
+        try:
+            while data := await self.process.stdout.read(64 * 1024):
+                for packet in reader.feed(data):
+                    if self.head is None:
+                        # OpusHead: version, channels, pre-skip, ...
+                        self.head = packet
+                        self.pre_skip = struct.unpack_from("<H", packet, 10)[0]
+                    elif packet.startswith(b"OpusTags"):
+                        continue
+                    elif packet:
+                        self.packets.append(packet)
+                        self.decoded += opus_packet_frames(packet)
+                self.output.set()
+        finally:
+            self.output.set()
+
+    async def write(
+        self, pcm: Union[bytes, memoryview]
+    ) -> Tuple[bool, bytes, int, int]:
+        """
+        Encodes a chunk and takes the packets ready so far. Returns whether the payload
+        starts the stream with the OpusHead, the payload of length-prefixed packets, its
+        decoded length and the music time of its first sample after the pre-skip.
+        """
+        self.process.stdin.write(pcm)
+        await self.process.stdin.drain()
+        self.written += len(pcm) // (2 * AudioFormat.SOURCE_CHANNELS)
+
+        deadline = asyncio.get_running_loop().time() + self.OUTPUT_TIMEOUT
+        while (
+            self.head is None
+            or self.decoded - self.pre_skip < self.written - self.ENCODER_DELAY
+        ) and not self.reader_task.done():
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            self.output.clear()
+            try:
+                await asyncio.wait_for(self.output.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        if self.reader_task.done():
+            # Raises when the output could not be parsed
+            self.reader_task.result()
+            raise OSError("ffmpeg stopped encoding")
+        if self.head is None:
+            raise OSError("ffmpeg produced no Opus stream")
+
+        starts = not self.head_sent
+        packets = [self.head] if starts else []
+        self.head_sent = True
+        packets += self.packets
+        self.packets = []
+
+        timestamp = self.start + max(self.taken - self.pre_skip, 0)
+        frames = self.decoded - self.taken
+        self.taken = self.decoded
+        payload = b"".join(
+            struct.pack("<H", len(packet)) + packet for packet in packets
+        )
+        return starts, payload, frames, timestamp
+
+    async def close(self) -> None:
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            await asyncio.wait_for(self.process.wait(), self.OUTPUT_TIMEOUT)
+        except (asyncio.TimeoutError, OSError):
+            if self.process.returncode is None:
+                self.process.kill()
+        finally:
+            if self.reader_task:
+                self.reader_task.cancel()
+
+
+class AudioEncoder:
+    """
+    Encodes Lyria's 48 kHz stereo int16 chunks for one client. Every chunk goes out as a
+    FRAME_HEADER followed by raw PCM, a standalone FLAC file, or the Opus packets of the
+    client's continuous OpusStream. Per-chunk ffmpeg runs use a shared thread pool so
+    encoding never blocks the event loop.
+
+    The header's sequence number counts every chunk Lyria produced, including any dropped
+    before sending, and its timestamp is the chunk's start in 48 kHz frames of music
+    time, so the client can detect gaps and keep later chunks in place. A gap restarts
+    the Opus stream, flagged with FLAG_STREAM_START and the new OpusHead.
+    """
+
+    # version, codec id, channels, flags, sample rate, frames per channel,
+    # sequence number, media timestamp
+    FRAME_HEADER = struct.Struct("<BBBBIIIQ")
+    FRAME_VERSION = 3
+    FLAG_STREAM_START = 1
+
+    def __init__(self, audio_format: AudioFormat) -> None:
+        self.audio_format = audio_format
+        self.command = self._ffmpeg_command(audio_format)
+        self.stream: Optional[OpusStream] = None
+        # Set once the Opus stream failed; the rest of the session goes out as PCM
+        self.stream_failed = False
+
+    @staticmethod
+    def _ffmpeg_command(audio_format: AudioFormat) -> List[str]:
+        command = [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-f",
+            "s16le",
+            "-ar",
+            str(AudioFormat.SOURCE_SAMPLE_RATE),
+            "-ac",
+            str(AudioFormat.SOURCE_CHANNELS),
+            "-i",
+            "pipe:0",
+            "-ar",
+            str(audio_format.sample_rate),
+            "-ac",
+            str(audio_format.channels),
+        ]
+        if audio_format.encoding == AudioFormat.ENCODING_OPUS:
+            command += ["-c:a", "libopus", "-b:a", str(audio_format.bitrate)]
+            # One page per packet, flushed straight away, so packets arrive as encoded
+            command += ["-page_duration", "20000", "-flush_packets", "1", "-f", "ogg"]
+        elif audio_format.encoding == AudioFormat.ENCODING_FLAC:
+            command += ["-c:a", "flac", "-f", "flac"]
+        else:
+            command += ["-f", "s16le"]
+        return command + ["pipe:1"]
+
+    def _header(
+        self,
+        audio_format: AudioFormat,
+        frames: int,
+        sequence: int,
+        timestamp: int,
+        flags: int = 0,
+    ) -> bytes:
+        return self.FRAME_HEADER.pack(
+            self.FRAME_VERSION,
+            AudioFormat.CODEC_IDS[audio_format.encoding],
+            audio_format.channels,
+            flags,
+            audio_format.sample_rate,
+            frames,
+            sequence & 0xFFFFFFFF,
+            timestamp,
+        )
+
+    def _source_frame(
+        self, pcm: Union[bytes, memoryview], sequence: int, timestamp: int
+    ) -> bytes:
+        source = AudioFormat()
+        frames = len(pcm) // (2 * source.channels)
+        return b"".join((self._header(source, frames, sequence, timestamp), pcm))
+
+    def encode_sync(
+        self, pcm: Union[bytes, memoryview], sequence: int = 0, timestamp: int = 0
+    ) -> bytes:
+        if self.audio_format.is_source:
+            return self._source_frame(pcm, sequence, timestamp)
+
+        source_frames = len(pcm) // (2 * AudioFormat.SOURCE_CHANNELS)
+        rate = self.audio_format.sample_rate
+        frames = source_frames * rate // AudioFormat.SOURCE_SAMPLE_RATE
+        try:
+            result = subprocess.run(
+                self.command, input=pcm, capture_output=True, check=True
+            )
+        except (subprocess.CalledProcessError, OSError) as e:
+            stderr = getattr(e, "stderr", None)
+            logger.warning(
+                f"Audio encoding failed, sending uncompressed chunk: "
+                f"{stderr.decode(errors='replace') if stderr else e}"
+            )
+            return self._source_frame(pcm, sequence, timestamp)
+        header = self._header(self.audio_format, frames, sequence, timestamp)
+        return b"".join((header, result.stdout))
+
+    async def _encode_stream(
+        self, pcm: Union[bytes, memoryview], sequence: int, timestamp: int
+    ) -> bytes:
+        if self.stream_failed:
+            return self._source_frame(pcm, sequence, timestamp)
+        try:
+            if self.stream is None or timestamp != self.stream.end:
+                # Encoder state only carries over between contiguous chunks
+                await self.close()
+                self.stream = OpusStream(self.command, timestamp)
+                await self.stream.open()
+            starts, payload, frames, start = await self.stream.write(pcm)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Opus stream failed, sending uncompressed audio: {e}")
+            self.stream_failed = True
+            await self.close()
+            return self._source_frame(pcm, sequence, timestamp)
+
+        # Opus always decodes at 48 kHz, frames count decoded samples
+        audio_format = replace(self.audio_format, sample_rate=OpusStream.SAMPLE_RATE)
+        flags = self.FLAG_STREAM_START if starts else 0
+        header = self._header(audio_format, frames, sequence, start, flags)
+        return b"".join((header, payload))
+
+    async def encode(
+        self, pcm: Union[bytes, memoryview], sequence: int = 0, timestamp: int = 0
+    ) -> bytes:
+        if self.audio_format.is_source:
+            return self._source_frame(pcm, sequence, timestamp)
+        if self.audio_format.encoding == AudioFormat.ENCODING_OPUS:
+            return await self._encode_stream(pcm, sequence, timestamp)
+        return await asyncio.get_running_loop().run_in_executor(
+            _ENCODER_EXECUTOR, self.encode_sync, pcm, sequence, timestamp
+        )
+
+    async def close(self) -> None:
+        stream, self.stream = self.stream, None
+        if stream:
+            await stream.close()
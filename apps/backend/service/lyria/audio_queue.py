@@ -0,0 +1,108 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+
+@dataclass
+class QueuedChunk:
+    audio_data: bytes
+    seconds: float
+    gain: float
+    sequence: int = 0
+    # Music time at the chunk's start, in 48 kHz frames
+    timestamp: int = 0
+
+
+class AudioQueue:
+    """
+    Bounded queue between the Lyria receiver and the client sender of one stream.
+
+    put() never waits, so a slow client cannot stall session.receive(). When the queue is
+    full, POLICY_DROP_OLDEST discards the oldest chunk. POLICY_PAUSE keeps every chunk
+    and reports the queue as over its high watermark. The receiver then pauses
+    generation until the sender drains the queue to the low watermark.
+    """
+
+    POLICY_DROP_OLDEST = "drop_oldest"
+    POLICY_PAUSE = "pause"
+    POLICIES = (POLICY_DROP_OLDEST, POLICY_PAUSE)
+
+    def __init__(self, max_chunks: int = 8, policy: str = POLICY_PAUSE) -> None:
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown audio queue policy: {policy}")
+        self.max_chunks = max(max_chunks, 1)
+        self.low_watermark = self.max_chunks // 2
+        self.policy = policy
+        self.chunks: Deque[QueuedChunk] = deque()
+        self.buffered_seconds = 0.0
+        self.available = asyncio.Event()
+        self.space = asyncio.Event()
+        self.closed = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def above_high_watermark(self) -> bool:
+        return self.depth >= self.max_chunks
+
+    @property
+    def below_low_watermark(self) -> bool:
+        return self.depth <= self.low_watermark
+
+    def put(self, chunk: QueuedChunk) -> None:
+        if self.policy == self.POLICY_DROP_OLDEST and self.above_high_watermark:
+            dropped = self.chunks.popleft()
+            self.buffered_seconds -= dropped.seconds
+            self.dropped += 1
+
+        self.chunks.append(chunk)
+        self.buffered_seconds += chunk.seconds
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        self.available.set()
+
+    async def get(self) -> Optional[QueuedChunk]:
+        """Next chunk, or None once the queue is closed and drained"""
+        while not self.chunks:
+            if self.closed:
+                return None
+            self.available.clear()
+            await self.available.wait()
+
+        chunk = self.chunks.popleft()
+        self.buffered_seconds -= chunk.seconds
+        self.space.set()
+        return chunk
+
+    async def wait_for(self, seconds: float) -> None:
+        """Waits until seconds of audio are queued or the queue is closed"""
+        while self.buffered_seconds < seconds and not self.closed:
+            self.available.clear()
+            await self.available.wait()
+
+    async def wait_for_space(self) -> None:
+        """Waits until the queue is below its high watermark or closed"""
+        while self.above_high_watermark and not self.closed:
+            self.space.clear()
+            await self.space.wait()
+
+    def close(self) -> None:
+        self.closed = True
+        self.available.set()
+        self.space.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "buffered_seconds": round(self.buffered_seconds, 3),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "policy": self.policy,
+        }
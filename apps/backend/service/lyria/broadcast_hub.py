@@ -0,0 +1,317 @@
+import asyncio
+import shutil
+import struct
+import subprocess
+import uuid
+from typing import Dict, Optional, Set, Tuple
+from service.lyria.audio_encoder import AudioFormat
+from service.lyria.audio_queue import AudioQueue, QueuedChunk
+from service.lyria.playback_clock import PlaybackClock
+from service.redis_service import RedisService
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class SessionHub:
+    """Fans one session's stream out to the listeners connected to this node"""
+
+    def __init__(self, session_id: str, queue_chunks: int) -> None:
+        self.session_id = session_id
+        self.queue_chunks = queue_chunks
+        self.listeners: Set[AudioQueue] = set()
+        # Receives the owner's chunks from Redis while this node has listeners
+        self.subscription: Optional[asyncio.Task] = None
+        # Set while the owner's client is paused, so its silence is not mistaken for a crash
+        self.paused = False
+        # Replaced on every pause or resume, listeners wait on the one they last saw
+        self.state_changed = asyncio.Event()
+
+    def add_listener(self) -> AudioQueue:
+        # A slow listener loses its oldest chunks, it can never hold up the owner
+        queue = AudioQueue(self.queue_chunks, AudioQueue.POLICY_DROP_OLDEST)
+        self.listeners.add(queue)
+        return queue
+
+    def publish(self, chunk: QueuedChunk) -> None:
+        for queue in self.listeners:
+            queue.put(chunk)
+
+    def set_paused(self, paused: bool) -> None:
+        if paused == self.paused:
+            return
+        self.paused = paused
+        self.state_changed.set()
+        self.state_changed = asyncio.Event()
+
+    def end(self) -> None:
+        """The owner stopped: listeners drain what they have, then may take over"""
+        self.set_paused(False)
+        for queue in self.listeners:
+            queue.close()
+
+
+class BroadcastOwner:
+    """
+    The connection generating a session's music. Chunks go straight to listeners on this
+    node and through a bounded queue to Redis for the others, so a slow publish drops
+    old chunks instead of delaying ingestion. Ownership is a Redis key kept alive while
+    the stream runs.
+    """
+
+    def __init__(self, hub: "BroadcastHub", session_id: str, owner_id: str) -> None:
+        self.hub = hub
+        self.session_id = session_id
+        self.owner_id = owner_id
+        self.outbound = AudioQueue(hub.queue_chunks, AudioQueue.POLICY_DROP_OLDEST)
+        # Set when the key expired and another connection may be generating instead
+        self.lost = False
+        self.paused = False
+        self.publish_task = asyncio.create_task(self._publish())
+        self.refresh_task = asyncio.create_task(self._keep_ownership())
+
+    def publish(self, chunk: QueuedChunk) -> None:
+        if self.lost:
+            return
+        hub = self.hub.sessions.get(self.session_id)
+        if hub:
+            hub.publish(chunk)
+        self.outbound.put(chunk)
+
+    async def _publish(self) -> None:
+        while True:
+            chunk = await self.outbound.get()
+            if chunk is None:
+                break
+            try:
+                await self.hub.redis_service.publish_broadcast(
+                    self.session_id, await self.hub.encode(chunk)
+                )
+            except Exception as e:
+                logger.warning(f"Failed to broadcast chunk {chunk.sequence}: {e}")
+
+    async def set_paused(self, paused: bool) -> None:
+        """Tells listeners the owner's client paused or resumed playback"""
+        self.paused = paused
+        hub = self.hub.sessions.get(self.session_id)
+        if hub:
+            hub.set_paused(paused)
+        await self._publish_state()
+
+    async def _publish_state(self) -> None:
+        if self.lost:
+            return
+        kind = self.hub.KIND_PAUSED if self.paused else self.hub.KIND_PLAYING
+        try:
+            await self.hub.redis_service.publish_broadcast(
+                self.session_id, self.hub.encode_state(kind)
+            )
+        except Exception as e:
+            logger.warning(f"Failed to broadcast playback state: {e}")
+
+    async def _keep_ownership(self) -> None:
+        while True:
+            await asyncio.sleep(self.hub.owner_ttl / 3)
+            if self.paused:
+                # Listeners that joined during the pause learn of it too
+                await self._publish_state()
+            if not await self.hub.redis_service.refresh_broadcast(
+                self.session_id, self.owner_id, self.hub.owner_ttl
+            ):
+                # Keep playing to this client but stop competing with the new owner
+                logger.warning(
+                    "Lost broadcast ownership of session %s", self.session_id
+                )
+                self.lost = True
+                self.outbound.close()
+                return
+
+    async def close(self) -> None:
+        self.refresh_task.cancel()
+        self.outbound.close()
+        if self.lost:
+            return
+        try:
+            await asyncio.wait_for(self.publish_task, self.hub.owner_ttl)
+            await self.hub.redis_service.publish_broadcast(
+                self.session_id, await self.hub.encode(None)
+            )
+        except Exception as e:
+            logger.warning(f"Failed to announce end of broadcast: {e}")
+        await self.hub.redis_service.release_broadcast(self.session_id, self.owner_id)
+        hub = self.hub.sessions.get(self.session_id)
+        if hub:
+            hub.end()
+        logger.info("Broadcast of session %s ended", self.session_id)
+
+
+class BroadcastHub:
+    """
+    One Lyria stream per session however many connections play it. The first connection
+    claims the session with SET NX and generates; later ones, on any node, listen to the
+    chunks it publishes on the session's Redis channel. When the owner leaves or goes
+    quiet for OWNER_TTL, a listener claims the session and continues generating. A paused
+    owner keeps its claim and says so, its listeners wait instead of taking over.
+
+    Chunks cross Redis as FLAC, which every listening node decodes back to PCM once for
+    all its listeners. Without ffmpeg, or when a chunk fails to encode, it goes as PCM.
+    """
+
+    OWNER_TTL = 15
+    QUEUE_CHUNKS = 8
+    # Longest wait, in owner TTLs, on an owner that is silent but still holds its claim
+    MAX_QUIET_TTLS = 8
+    # kind, audio codec, publishing node, sequence, timestamp in 48 kHz frames, gain
+    FRAME_HEADER = struct.Struct("<BB16sIQf")
+    KIND_CHUNK = 0
+    KIND_END = 1
+    KIND_PAUSED = 2
+    KIND_PLAYING = 3
+    CODEC_PCM = 0
+    CODEC_FLAC = 1
+
+    def __init__(
+        self,
+        redis_service: RedisService,
+        owner_ttl: int = OWNER_TTL,
+        queue_chunks: int = QUEUE_CHUNKS,
+        compress: bool = True,
+    ) -> None:
+        self.redis_service = redis_service
+        self.owner_ttl = owner_ttl
+        self.queue_chunks = queue_chunks
+        self.codec = (
+            self.CODEC_FLAC if compress and shutil.which("ffmpeg") else self.CODEC_PCM
+        )
+        # Frames this node published are already delivered locally
+        self.node_id = uuid.uuid4().bytes
+        self.sessions: Dict[str, SessionHub] = {}
+
+    def session(self, session_id: str) -> SessionHub:
+        if session_id not in self.sessions:
+            self.sessions[session_id] = SessionHub(session_id, self.queue_chunks)
+        return self.sessions[session_id]
+
+    async def claim(self, session_id: str) -> Optional[BroadcastOwner]:
+        """A BroadcastOwner when this connection should generate the session's music"""
+        owner_id = uuid.uuid4().hex
+        if not await self.redis_service.claim_broadcast(
+            session_id, owner_id, self.owner_ttl
+        ):
+            return None
+        logger.info("Claimed broadcast of session %s", session_id)
+        return BroadcastOwner(self, session_id, owner_id)
+
+    async def owned(self, session_id: str) -> bool:
+        return await self.redis_service.broadcast_owned(session_id)
+
+    def listen(self, session_id: str) -> AudioQueue:
+        hub = self.session(session_id)
+        queue = hub.add_listener()
+        if hub.subscription is None or hub.subscription.done():
+            hub.subscription = asyncio.create_task(self._subscribe(hub))
+        return queue
+
+    def leave(self, session_id: str, queue: AudioQueue) -> None:
+        hub = self.sessions.get(session_id)
+        if hub is None:
+            return
+        hub.listeners.discard(queue)
+        if not hub.listeners:
+            if hub.subscription:
+                hub.subscription.cancel()
+            del self.sessions[session_id]
+
+    async def _subscribe(self, hub: SessionHub) -> None:
+        try:
+            async for payload in self.redis_service.subscribe_broadcast(hub.session_id):
+                try:
+                    kind, node_id, chunk = await self.decode(payload, self.node_id)
+                except (subprocess.CalledProcessError, OSError, struct.error) as e:
+                    logger.warning(f"Dropped undecodable broadcast chunk: {e}")
+                    continue
+                if node_id == self.node_id:
+                    continue
+                if kind == self.KIND_END:
+                    hub.end()
+                elif kind == self.KIND_CHUNK:
+                    hub.publish(chunk)
+                else:
+                    hub.set_paused(kind == self.KIND_PAUSED)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Broadcast subscription for {hub.session_id} failed: {e}")
+
+    @staticmethod
+    def _ffmpeg(data: bytes, decode: bool = False) -> bytes:
+        pcm = ["-f", "s16le", "-ar", str(AudioFormat.SOURCE_SAMPLE_RATE)]
+        pcm += ["-ac", str(AudioFormat.SOURCE_CHANNELS)]
+        command = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+        if decode:
+            command += ["-f", "flac", "-i", "pipe:0", *pcm, "pipe:1"]
+        else:
+            command += [*pcm, "-i", "pipe:0", "-c:a", "flac", "-f", "flac", "pipe:1"]
+        return subprocess.run(
+            command, input=data, capture_output=True, check=True
+        ).stdout
+
+    def encode_state(self, kind: int) -> bytes:
+        return self.FRAME_HEADER.pack(kind, self.CODEC_PCM, self.node_id, 0, 0, 0.0)
+
+    async def encode(self, chunk: Optional[QueuedChunk]) -> bytes:
+        if chunk is None:
+            return self.encode_state(self.KIND_END)
+        codec, audio_data = self.codec, chunk.audio_data
+        if codec == self.CODEC_FLAC:
+            try:
+                audio_data = await asyncio.to_thread(
+                    self._ffmpeg, bytes(chunk.audio_data)
+                )
+            except (subprocess.CalledProcessError, OSError) as e:
+                logger.warning(f"Broadcast encoding failed, publishing PCM: {e}")
+                codec, audio_data = self.CODEC_PCM, chunk.audio_data
+        return (
+            self.FRAME_HEADER.pack(
+                self.KIND_CHUNK,
+                codec,
+                self.node_id,
+                chunk.sequence,
+                chunk.timestamp,
+                chunk.gain,
+            )
+            + audio_data
+        )
+
+    async def decode(
+        self, payload: bytes, skip_node: Optional[bytes] = None
+    ) -> Tuple[int, bytes, Optional[QueuedChunk]]:
+        """
+        The frame's kind, publishing node and chunk. The chunk is None for state frames
+        and for those published by skip_node, which are not worth decoding.
+        """
+        kind, codec, node_id, sequence, timestamp, gain = self.FRAME_HEADER.unpack_from(
+            payload
+        )
+        if kind != self.KIND_CHUNK or node_id == skip_node:
+            return kind, node_id, None
+        audio_data = payload[self.FRAME_HEADER.size :]
+        if codec == self.CODEC_FLAC:
+            audio_data = await asyncio.to_thread(self._ffmpeg, audio_data, True)
+        seconds = (
+            len(audio_data) // PlaybackClock.FRAME_BYTES / PlaybackClock.SAMPLE_RATE
+        )
+        return (
+            kind,
+            node_id,
+            QueuedChunk(audio_data, seconds, gain, sequence, timestamp),
+        )
+
+    async def close(self) -> None:
+        tasks = [hub.subscription for hub in self.sessions.values() if hub.subscription]
+        for hub in self.sessions.values():
+            hub.end()
+        self.sessions.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,94 @@
+import numpy as np
+
+
+class GainStage:
+    """
+    Per-session gain for int16 PCM, computed in preallocated float32 and int16 buffers.
+    A gain change ramps linearly per frame instead of jumping at the block boundary.
+
+    process() returns a memoryview of the stage's output buffer, which is overwritten by
+    the next call; send it before processing the next chunk.
+    """
+
+    SAMPLE_RATE = 48000
+    CHANNELS = 2
+    RAMP_SECONDS = 0.5
+
+    def __init__(self, gain: float = 1.0, ramp_seconds: float = RAMP_SECONDS) -> None:
+        self.gain = float(gain)
+        self.ramp_start = self.gain
+        self.ramp_frames = max(int(ramp_seconds * self.SAMPLE_RATE), 1)
+        self.ramp_position = self.ramp_frames
+        # Fraction of the ramp reached after each frame, shared by every ramp
+        self.ramp_shape = np.arange(1, self.ramp_frames + 1, dtype=np.float32)
+        self.ramp_shape /= self.ramp_frames
+        self.scratch = np.empty(0, dtype=np.float32)
+        self.output = np.empty(0, dtype=np.int16)
+        self.frame_gains = np.empty(0, dtype=np.float32)
+
+    @property
+    def ramping(self) -> bool:
+        return self.ramp_position < self.ramp_frames
+
+    def set_gain(self, gain: float) -> None:
+        """Jumps to gain, as when restoring a checkpoint"""
+        self.gain = self.ramp_start = float(gain)
+        self.ramp_position = self.ramp_frames
+
+    def ramp_to(self, gain: float) -> None:
+        gain = float(gain)
+        if gain == self.gain:
+            return
+        self.ramp_start = self.current_gain()
+        self.gain = gain
+        self.ramp_position = 0
+
+    def current_gain(self) -> float:
+        if not self.ramping:
+            return self.gain
+        fraction = self.ramp_position / self.ramp_frames
+        return self.ramp_start + (self.gain - self.ramp_start) * fraction
+
+    def _reserve(self, samples: int) -> None:
+        if samples > len(self.scratch):
+            self.scratch = np.empty(samples, dtype=np.float32)
+            self.output = np.empty(samples, dtype=np.int16)
+            self.frame_gains = np.empty(samples // self.CHANNELS, dtype=np.float32)
+
+    def process(self, audio_data: bytes) -> memoryview:
+        if self.gain == 1.0 and not self.ramping:
+            return memoryview(audio_data)
+
+        samples = np.frombuffer(audio_data, dtype=np.int16)
+        count = len(samples)
+        self._reserve(count)
+        scratch = self.scratch[:count]
+        frames, remainder = divmod(count, self.CHANNELS)
+
+        if self.ramping and not remainder:
+            ramp = min(frames, self.ramp_frames - self.ramp_position)
+            gains = self.frame_gains[:frames]
+            np.multiply(
+                self.ramp_shape[self.ramp_position : self.ramp_position + ramp],
+                np.float32(self.gain - self.ramp_start),
+                out=gains[:ramp],
+            )
+            gains[:ramp] += np.float32(self.ramp_start)
+            gains[ramp:] = self.gain
+            self.ramp_position += ramp
+            # One strided pass per channel beats broadcasting gains over interleaved frames
+            for channel in range(self.CHANNELS):
+                np.multiply(
+                    samples[channel :: self.CHANNELS],
+                    gains,
+                    out=scratch[channel :: self.CHANNELS],
+                )
+        else:
+            # A chunk that is not whole frames cannot be ramped; finish at the target
+            self.ramp_position = self.ramp_frames
+            np.multiply(samples, np.float32(self.gain), out=scratch)
+
+        np.clip(scratch, -32768, 32767, out=scratch)
+        output = self.output[:count]
+        np.copyto(output, scratch, casting="unsafe")
+        return memoryview(output).cast("B")
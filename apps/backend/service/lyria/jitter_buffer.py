@@ -0,0 +1,96 @@
+import time
+from typing import Callable, Optional
+
+
+class JitterBuffer:
+    """
+    Sizes the audio held back before a stream starts playing. Two things are tracked:
+    - jitter in Lyria chunk arrivals: the RFC 3550 estimator, arrival spacing against media
+      spacing, smoothed by 1/16.
+    - client send completion: mean and deviation of how long send_bytes takes per chunk,
+      smoothed as in RFC 6298.
+    A well-connected client gets no prebuffer; jittery or slow ones get a few seconds.
+    Streams start from the running estimate of the ones before them on this node, since
+    nothing is measured until audio arrives.
+    """
+
+    MIN_PREBUFFER = 0.0
+    # Seed on a node that has not finished measuring a stream, the 1 s clients always
+    # prebuffered before the target adapted
+    DEFAULT_PREBUFFER = 1.0
+    MAX_PREBUFFER = 6.0
+    # Deviations covered, as in TCP's RTO = SRTT + 4 * RTTVAR
+    DEVIATIONS = 4.0
+    JITTER_GAIN = 1 / 16
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    NODE_GAIN = 1 / 4
+    # Running estimate across the streams measured on this node
+    node_target: Optional[float] = None
+
+    def __init__(
+        self,
+        initial: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.initial = initial if initial is not None else self.node_seed()
+        self.clock = clock
+        self.arrival_jitter = 0.0
+        self.last_arrival: Optional[float] = None
+        self.last_chunk_seconds = 0.0
+        self.send_mean = 0.0
+        self.send_deviation = 0.0
+        self.arrivals = 0
+        self.sends = 0
+
+    def chunk_arrived(self, seconds: float) -> None:
+        now = self.clock()
+        if self.last_arrival is not None:
+            transit = (now - self.last_arrival) - self.last_chunk_seconds
+            self.arrival_jitter += (
+                abs(transit) - self.arrival_jitter
+            ) * self.JITTER_GAIN
+        self.last_arrival = now
+        self.last_chunk_seconds = seconds
+        self.arrivals += 1
+
+    def chunk_sent(self, send_seconds: float) -> None:
+        if self.sends == 0:
+            self.send_mean = send_seconds
+            self.send_deviation = send_seconds / 2
+        else:
+            error = send_seconds - self.send_mean
+            self.send_deviation += (abs(error) - self.send_deviation) * self.BETA
+            self.send_mean += error * self.ALPHA
+        self.sends += 1
+
+    @classmethod
+    def node_seed(cls) -> float:
+        return cls.DEFAULT_PREBUFFER if cls.node_target is None else cls.node_target
+
+    @property
+    def measured(self) -> bool:
+        return self.arrivals >= 2 or self.sends > 0
+
+    def settle(self) -> None:
+        """Folds this stream's measured target into the node-wide estimate"""
+        if not self.measured:
+            return
+        cls = type(self)
+        if cls.node_target is None:
+            cls.node_target = self.target
+        else:
+            cls.node_target += (self.target - cls.node_target) * self.NODE_GAIN
+
+    @property
+    def target(self) -> float:
+        """Seconds of audio to queue before the first chunk goes out"""
+        # Until something is measured, fall back on the carried over or node-wide estimate
+        if not self.measured:
+            return self.initial
+        measured = (
+            self.DEVIATIONS * self.arrival_jitter
+            + self.send_mean
+            + self.DEVIATIONS * self.send_deviation
+        )
+        return min(max(measured, self.MIN_PREBUFFER), self.MAX_PREBUFFER)
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+from google import genai
+from google.genai import types
+from google.genai.live_music import AsyncMusicSession
+from models.lyria_config import LyriaConfig
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+LYRIA_MODEL = "models/lyria-realtime-exp"
+
+
+async def prime_session(session: AsyncMusicSession, lyria_config: LyriaConfig) -> None:
+    """Sends a block's prompt and generation config to a Lyria session"""
+    await session.set_weighted_prompts(
+        prompts=[
+            types.WeightedPrompt(text=lyria_config.prompt, weight=lyria_config.weight)
+        ]
+    )
+    await session.set_music_generation_config(
+        config=types.LiveMusicGenerationConfig(
+            bpm=lyria_config.bpm, scale=lyria_config.get_lyria_scale()
+        )
+    )
+
+
+@dataclass
+class PrewarmedSession:
+    session: AsyncMusicSession
+    # Closing the stack closes the Lyria connection
+    stack: AsyncExitStack
+    lyria_config: LyriaConfig
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class LyriaSessionPool:
+    """
+    Process-wide GenAI client plus speculatively opened Lyria sessions, keyed by the
+    session they were primed for. A connection is opened and primed with the first block
+    as soon as a session is likely to play. LyriaService takes it on start, and unused
+    connections are closed after IDLE_TTL seconds.
+    """
+
+    IDLE_TTL = 30.0
+    MAX_SESSIONS = 32
+
+    def __init__(
+        self,
+        idle_ttl: float = IDLE_TTL,
+        max_sessions: int = MAX_SESSIONS,
+        enabled: bool = True,
+    ) -> None:
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.enabled = enabled
+        self._client: Optional[genai.Client] = None
+        self.warming: Dict[str, asyncio.Task] = {}
+        self.expiry_tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def client(self) -> genai.Client:
+        if self._client is None:
+            if not os.getenv("GOOGLE_API_KEY"):
+                raise ValueError("GOOGLE_API_KEY not found in environment variables")
+            self._client = genai.Client(
+                api_key=os.getenv("GOOGLE_API_KEY"),
+                http_options={"api_version": "v1alpha"},
+            )
+        return self._client
+
+    def prewarm(self, session_id: str, lyria_config: LyriaConfig) -> None:
+        """Starts opening a primed connection for session_id unless one exists"""
+        if not self.enabled or session_id in self.warming:
+            return
+        if len(self.warming) >= self.max_sessions:
+            logger.info("Lyria pre-warm pool is full, skipping %s", session_id)
+            return
+
+        self.warming[session_id] = asyncio.create_task(
+            self._warm(session_id, lyria_config)
+        )
+
+    async def _warm(
+        self, session_id: str, lyria_config: LyriaConfig
+    ) -> Optional[PrewarmedSession]:
+        stack = AsyncExitStack()
+        try:
+            session = await stack.enter_async_context(
+                self.client.aio.live.music.connect(model=LYRIA_MODEL)
+            )
+            await prime_session(session, lyria_config)
+        except asyncio.CancelledError:
+            await self._close(stack)
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to pre-warm Lyria session {session_id}: {e}")
+            await self._close(stack)
+            if self.warming.get(session_id) is asyncio.current_task():
+                del self.warming[session_id]
+            return None
+
+        logger.info("Pre-warmed Lyria session for %s", session_id)
+        prewarmed = PrewarmedSession(session, stack, lyria_config)
+        expiry = asyncio.create_task(self._expire(session_id, prewarmed))
+        self.expiry_tasks.add(expiry)
+        expiry.add_done_callback(self.expiry_tasks.discard)
+        return prewarmed
+
+    async def _expire(self, session_id: str, prewarmed: PrewarmedSession) -> None:
+        await asyncio.sleep(self.idle_ttl)
+        task = self.warming.get(session_id)
+        if task is None or not task.done() or task.result() is not prewarmed:
+            return
+        del self.warming[session_id]
+        logger.info("Closing idle pre-warmed Lyria session for %s", session_id)
+        await self._close(prewarmed.stack)
+
+    async def take(self, session_id: str) -> Optional[PrewarmedSession]:
+        """The primed connection for session_id, waiting for one still opening"""
+        task = self.warming.pop(session_id, None)
+        if task is None:
+            self.misses += 1
+            return None
+
+        await asyncio.wait({task})
+        prewarmed = None if task.cancelled() else task.result()
+        if prewarmed is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return prewarmed
+
+    @staticmethod
+    async def _close(stack: AsyncExitStack) -> None:
+        try:
+            await stack.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing pre-warmed Lyria session: {e}")
+
+    async def close(self) -> None:
+        tasks = list(self.warming.values())
+        self.warming.clear()
+        for expiry in list(self.expiry_tasks):
+            expiry.cancel()
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, PrewarmedSession):
+                await self._close(result.stack)
@@ -1,44 +1,127 @@
 import os
 import asyncio
-import numpy as np
+import time
+import uuid
+from contextlib import asynccontextmanager
 from google import genai
-from google.genai import types
 from google.genai.live_music import AsyncMusicSession
 from fastapi import WebSocket, WebSocketDisconnect
 from dotenv import load_dotenv
 from models.llm_response import LLMResponse
 from models.lyria_config import LyriaConfig
+from service.lyria.audio_encoder import AudioEncoder, AudioFormat
+from service.lyria.audio_queue import AudioQueue, QueuedChunk
+from service.lyria.broadcast_hub import BroadcastHub, BroadcastOwner
+from service.lyria.gain_stage import GainStage
+from service.lyria.jitter_buffer import JitterBuffer
+from service.lyria.lyria_pool import LYRIA_MODEL, LyriaSessionPool, prime_session
+from service.lyria.playback_clock import PlaybackClock, TransitionLatency
+from service.lyria.playback_timeline import PlaybackTimeline
+from service.lyria.soundtrack_cache import SoundtrackCache, SoundtrackRecorder
+from service.redis_service import RedisService
 from shared.commands import Commands
 from shared.logging import get_logger
 import json
+from typing import Any, AsyncIterator, Dict, Optional
 
 load_dotenv()
 logger = get_logger(__name__)
 
 
 class LyriaService:
-    def __init__(self, user_websocket: WebSocket, llm_response: LLMResponse) -> None:
+    def __init__(
+        self,
+        user_websocket: WebSocket,
+        llm_response: LLMResponse,
+        session_id: Optional[str] = None,
+        redis_service: Optional[RedisService] = None,
+        block_count: Optional[int] = None,
+        resume_token: Optional[str] = None,
+        audio_format: Optional[AudioFormat] = None,
+        lyria_pool: Optional[LyriaSessionPool] = None,
+        soundtrack_cache: Optional[SoundtrackCache] = None,
+        broadcast_hub: Optional[BroadcastHub] = None,
+    ) -> None:
         logger.info("Initializing LyriaService")
         self.user_websocket = user_websocket
-        self.model = "models/lyria-realtime-exp"
-        self.BUFFER_SECONDS = 1.0
+        self.model = LYRIA_MODEL
         self.HEARTBEAT_INTERVAL = 10.0
         self.HEARTBEAT_TIMEOUT = 30.0
+        self.BLOCK_PREFETCH_INTERVAL = 4.0
+        self.BLOCK_PREFETCH_HORIZON = 20.0
+        self.BLOCK_PREFETCH_COUNT = 3
+        self.CHECKPOINT_INTERVAL = 5.0
+        self.CHECKPOINT_TTL = 1800
+        self.JITTER_ANNOUNCE_STEP = 0.25
+        self.AUDIO_QUEUE_CHUNKS = int(os.getenv("LYRIA_AUDIO_QUEUE_CHUNKS", "8"))
+        self.AUDIO_QUEUE_POLICY = os.getenv(
+            "LYRIA_AUDIO_QUEUE_POLICY", AudioQueue.POLICY_PAUSE
+        )
+        # Cached audio is replayed at most this far ahead of the client's playback
+        self.REPLAY_LEAD = float(os.getenv("SOUNDTRACK_REPLAY_LEAD", "10"))
+        self.REPLAY_CHUNK_SECONDS = 2.0
 
+        # gain is the current block's target; the sender's stage ramps between targets
         self.gain = 0.3
+        self.gain_stage = GainStage(self.gain)
+        # Without a negotiated format chunks go out as unframed 48 kHz stereo PCM
+        self.encoder = AudioEncoder(audio_format) if audio_format else None
 
-        if not os.getenv("GOOGLE_API_KEY"):
-            raise ValueError("GOOGLE_API_KEY not found in environment variables")
-        self.client = genai.Client(
-            api_key=os.getenv("GOOGLE_API_KEY"), http_options={"api_version": "v1alpha"}
-        )
-        self.config = types.LiveMusicGenerationConfig()
+        # The pool shares one GenAI client across sessions and may hold a primed connection
+        self.lyria_pool = lyria_pool
+        if lyria_pool:
+            self.client = lyria_pool.client
+        else:
+            if not os.getenv("GOOGLE_API_KEY"):
+                raise ValueError("GOOGLE_API_KEY not found in environment variables")
+            self.client = genai.Client(
+                api_key=os.getenv("GOOGLE_API_KEY"),
+                http_options={"api_version": "v1alpha"},
+            )
 
         self.llm_response = llm_response
-        self.elapsed_music_time = 0.0
+        self.session_id = session_id
+        self.redis_service = redis_service
+        # Blocks are loaded lazily: block_count is the stored total when known
+        self.block_count = block_count
+        self.timeline = PlaybackTimeline(self.llm_response.master_plan.musical_blocks)
+        self.prefetch_task: Optional[asyncio.Task] = None
+        # Music time comes from the PCM samples streamed, not a fixed duration per chunk
+        self.clock = PlaybackClock()
+        self.transition_latency = TransitionLatency()
+        self.last_chunk_seconds = 0.0
+        # End of the last chunk handed to the client; the clock runs ahead by the queue
+        self.sent_position = 0.0
+        self.active_block_index = 0
+        # Playback state is checkpointed under this token so a reconnect can resume it
+        self.resume_token = resume_token or uuid.uuid4().hex
+        self.last_checkpoint: Optional[Dict[str, Any]] = None
+        self.last_block_prefetch_time = float("-inf")
         self.last_heartbeat_time = asyncio.get_event_loop().time()
         self.heartbeat_received = True
         self.session_active = True
+        # Decouples Lyria ingestion from client sends
+        self.audio_queue = AudioQueue(self.AUDIO_QUEUE_CHUNKS, self.AUDIO_QUEUE_POLICY)
+        # Paused to let the client catch up; user_paused is the client's own PAUSE
+        self.generation_paused = False
+        self.user_paused = False
+        # Wakes a cache replay waiting on the client's playback
+        self.play_state_changed = asyncio.Event()
+        # Sizes the prebuffer from measured arrival and send jitter, seeded node-wide
+        self.jitter_buffer = JitterBuffer()
+        self.audio_sequence = 0
+        self.announced_jitter_target: Optional[float] = None
+        # Already rendered audio is replayed from here, new audio is recorded into it
+        self.soundtrack_cache = soundtrack_cache
+        self.recorder: Optional[SoundtrackRecorder] = None
+        # None while replaying from the cache, before a Lyria session is open
+        self.music_session: Optional[AsyncMusicSession] = None
+        # Connections to one session share the stream of whichever of them owns it
+        self.broadcast_hub = broadcast_hub
+        self.broadcast: Optional[BroadcastOwner] = None
+        self.broadcast_role: Optional[str] = None
+        # Last playback state of the owner announced to a listener
+        self.broadcast_state = "playing"
 
         self.current_config = self.llm_response.master_plan.musical_blocks[
             0
@@ -46,24 +129,137 @@ class LyriaService:
 
         logger.info("LyriaService initialized successfully")
 
-    def _apply_audio_gain(self, audio_data: bytes) -> bytes:
-        if self.gain == 1.0:
-            return audio_data
-            
+    @property
+    def block_offset(self) -> int:
+        """Index of the first block still held in llm_response"""
+        return self.timeline.offset
+
+    @property
+    def elapsed_music_time(self) -> float:
+        return self.clock.elapsed
+
+    @elapsed_music_time.setter
+    def elapsed_music_time(self, seconds: float) -> None:
+        self.clock.seek(seconds)
+
+    def _transition_lead(self) -> float:
+        # Changes can only be sent between chunks: send at the chunk boundary closest to
+        # the planned time minus Lyria's measured response latency
+        return self.transition_latency.estimate + self.last_chunk_seconds / 2
+
+    def _checkpoint_state(self) -> Dict[str, Any]:
+        return {
+            "elapsed_music_time": self.sent_position,
+            "block_index": self.active_block_index,
+            "config": self.current_config.dict(),
+            "gain": self.gain,
+            "jitter_target": round(self.jitter_buffer.target, 1),
+        }
+
+    async def _write_checkpoint(self) -> None:
+        state = self._checkpoint_state()
+        if state == self.last_checkpoint:
+            return
+        try:
+            await self.redis_service.store_checkpoint(
+                self.session_id, self.resume_token, state, ttl=self.CHECKPOINT_TTL
+            )
+            self.last_checkpoint = state
+        except Exception as e:
+            logger.warning(f"Failed to write playback checkpoint: {e}")
+
+    async def _checkpoint_writer(self) -> None:
+        """Write-behind: at most one Redis write per interval, skipped when nothing changed"""
+        if not self.redis_service or not self.session_id:
+            return
+        logger.info("Checkpoint writer started")
+        try:
+            while self.session_active:
+                await asyncio.sleep(self.CHECKPOINT_INTERVAL)
+                await self._write_checkpoint()
+        finally:
+            logger.info("Checkpoint writer ended")
+
+    async def _load_blocks_from(self, block_index: int) -> None:
+        if self.block_offset <= block_index < self.timeline.end_index:
+            return
+        if not self.redis_service or not self.session_id:
+            return
+
+        window = await self.redis_service.fetch_blocks(
+            self.session_id, block_index, self.BLOCK_PREFETCH_COUNT
+        )
+        if window is None or not window.musical_blocks:
+            return
+
+        self.block_count = window.block_count
+        self.llm_response.analysis_complete = window.analysis_complete
+        self.llm_response.analysis_error = window.analysis_error
+        self.llm_response.master_plan.musical_blocks = [
+            self.redis_service._dict_to_music_block(block)
+            for block in window.musical_blocks
+        ]
+        self.timeline.reset(self.llm_response.master_plan.musical_blocks, block_index)
+
+    async def resume(
+        self, checkpoint: Optional[Dict[str, Any]], position: Optional[float] = None
+    ) -> None:
+        """
+        Restores playback from a checkpoint. position is how much audio the client already
+        holds; generation continues from there so nothing it has heard is streamed again.
+        """
+        if checkpoint:
+            self.elapsed_music_time = float(checkpoint["elapsed_music_time"])
+            self.active_block_index = int(checkpoint["block_index"])
+            self.current_config = LyriaConfig(**checkpoint["config"])
+            self.gain = float(checkpoint["gain"])
+            # A reconnecting client starts with the prebuffer its last stream settled on
+            jitter_target = checkpoint.get("jitter_target")
+            self.jitter_buffer = JitterBuffer(
+                initial=float(jitter_target) if jitter_target is not None else None
+            )
+            self.last_checkpoint = checkpoint
+            try:
+                await self._load_blocks_from(self.active_block_index)
+            except Exception as e:
+                logger.warning(f"Failed to load blocks for resumed playback: {e}")
+
+        if position is not None:
+            self.elapsed_music_time = max(float(position), 0.0)
+        if checkpoint or position is not None:
+            # Nothing has been sent on this connection yet
+            self.sent_position = self.elapsed_music_time
+
+        # The client may hold audio past the last checkpoint; continue with the block playing there
+        cursor = self.timeline.find(self.elapsed_music_time)
+        if cursor is None:
+            cursor = min(
+                max(self.active_block_index - self.block_offset, 0),
+                max(len(self.timeline.blocks) - 1, 0),
+            )
+        elif self.block_offset + cursor != self.active_block_index:
+            block = self.timeline.blocks[cursor]
+            self.active_block_index = self.block_offset + cursor
+            self.current_config = block.lyria_config
+            self.gain = block.gain
+        self.timeline.seek(cursor)
+        self.timeline.drop_played()
+        logger.info(
+            "Resuming playback at %.2f seconds in block %d",
+            self.elapsed_music_time,
+            self.active_block_index,
+        )
+
+    def _apply_audio_gain(self, audio_data: bytes) -> memoryview:
         try:
-            audio_array = np.frombuffer(audio_data, dtype=np.int16)
-            
-            adjusted_array = audio_array.astype(np.float32) * self.gain
-            
-            adjusted_array = np.clip(adjusted_array, -32768, 32767).astype(np.int16)
-            
-            return adjusted_array.tobytes()
-            
+            return self.gain_stage.process(audio_data)
         except Exception as e:
-            logger.warning(f"Failed to apply audio gain: {e}. Returning original audio.")
-            return audio_data
+            logger.warning(
+                f"Failed to apply audio gain: {e}. Returning original audio."
+            )
+            return memoryview(audio_data)
 
-    async def _proxy_commands_to_lyria(self, session: AsyncMusicSession) -> None:
+    async def _proxy_commands_to_lyria(self) -> None:
         logger.info("Command loop started. Waiting for commands from client.")
         try:
             while self.session_active:
@@ -76,16 +272,45 @@ class LyriaService:
 
                     logger.info("Processing commands")
 
+                    session = self.music_session
                     if command.get(Commands.COMMAND):
-                        if command[Commands.COMMAND] == Commands.PLAY:
-                            await session.play()
-                            logger.info("Sent PLAY command to Lyria session")
+                        if (
+                            command[Commands.COMMAND] in (Commands.PLAY, Commands.PAUSE)
+                            and self.broadcast_role == "listener"
+                        ):
+                            await self._reject_control(command[Commands.COMMAND])
+                        elif command[Commands.COMMAND] == Commands.PLAY:
+                            self.user_paused = False
+                            self.play_state_changed.set()
+                            if session is None:
+                                # Replaying or still connecting, Lyria starts playing
+                                logger.info("Client resumed playback")
+                            elif (
+                                self.generation_paused
+                                and not self.audio_queue.below_low_watermark
+                            ):
+                                # The send loop resumes once the client catches up
+                                logger.info("Client is still behind, deferring PLAY")
+                            else:
+                                self.generation_paused = False
+                                await session.play()
+                                logger.info("Sent PLAY command to Lyria session")
+                            if self.broadcast:
+                                await self.broadcast.set_paused(False)
                         elif command[Commands.COMMAND] == Commands.PAUSE:
-                            await session.pause()
-                            logger.info("Sent PAUSE command to Lyria session")
+                            self.user_paused = True
+                            self.play_state_changed.set()
+                            if session is None:
+                                logger.info("Client paused playback")
+                            else:
+                                await session.pause()
+                                logger.info("Sent PAUSE command to Lyria session")
+                            if self.broadcast:
+                                await self.broadcast.set_paused(True)
                         elif command[Commands.COMMAND] == Commands.STOP:
-                            await session.stop()
-                            logger.info("Sent STOP command to Lyria session")
+                            if session:
+                                await session.stop()
+                                logger.info("Sent STOP command to Lyria session")
                             self.session_active = False
                             break
                         elif command[Commands.COMMAND] == Commands.HEARTBEAT_ACK:
@@ -102,54 +327,132 @@ class LyriaService:
             logger.error(f"UNEXPECTED command loop error: {e}", exc_info=True)
             self.session_active = False
         finally:
+            # A replay waiting on a paused client must see the session end
+            self.play_state_changed.set()
             logger.info("Command loop has fully ended.")
 
+    def _has_unloaded_blocks(self) -> bool:
+        if self.block_count is not None and self.timeline.end_index < self.block_count:
+            return True
+        return (
+            not self.llm_response.analysis_complete
+            and not self.llm_response.analysis_error
+        )
+
+    def _schedule_block_prefetch(self) -> None:
+        if (
+            self.timeline.planned_until - self.elapsed_music_time
+            > self.BLOCK_PREFETCH_HORIZON
+            or self.elapsed_music_time - self.last_block_prefetch_time
+            < self.BLOCK_PREFETCH_INTERVAL
+            or not self.redis_service
+            or not self.session_id
+            or (self.prefetch_task and not self.prefetch_task.done())
+            or not self._has_unloaded_blocks()
+        ):
+            return
+
+        self.last_block_prefetch_time = self.elapsed_music_time
+        self.timeline.drop_played()
+        # Runs beside the audio loop so a slow Redis read never delays a chunk
+        self.prefetch_task = asyncio.create_task(self._prefetch_musical_blocks())
+
+    async def _prefetch_musical_blocks(self) -> None:
+        start_index = self.timeline.end_index
+        try:
+            window = await self.redis_service.fetch_blocks(
+                self.session_id, start_index, self.BLOCK_PREFETCH_COUNT
+            )
+        except Exception as e:
+            logger.warning(f"Failed to prefetch musical blocks: {e}")
+            return
+
+        if window is None:
+            return
+
+        self.block_count = window.block_count
+        self.llm_response.analysis_complete = window.analysis_complete
+        self.llm_response.analysis_error = window.analysis_error
+        if window.analysis_error:
+            await self._announce_analysis_error()
+        if not window.musical_blocks:
+            return
+
+        self.timeline.extend(
+            [
+                self.redis_service._dict_to_music_block(block)
+                for block in window.musical_blocks
+            ]
+        )
+        logger.info(
+            "Prefetched musical blocks %d-%d of %d",
+            start_index,
+            start_index + len(window.musical_blocks) - 1,
+            window.block_count,
+        )
+
+        try:
+            await self.user_websocket.send_text(
+                json.dumps(
+                    {
+                        "type": "musical_blocks",
+                        "start_index": start_index,
+                        "data": {
+                            "musical_blocks": window.musical_blocks,
+                            "scene_analysis": window.scene_analysis,
+                            "block_count": window.block_count,
+                        },
+                    }
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Failed to send prefetched blocks to client: {e}")
+
+    async def _announce_analysis_error(self) -> None:
+        """Tells the client that no more blocks are coming, the music ends with the plan"""
+        logger.warning(
+            "Analysis of session %s failed: %s",
+            self.session_id,
+            self.llm_response.analysis_error,
+        )
+        try:
+            await self.user_websocket.send_text(
+                json.dumps(
+                    {"type": "analysis", "error": self.llm_response.analysis_error}
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Failed to send analysis error to client: {e}")
+
     async def _check_for_music_update(self, session: AsyncMusicSession) -> None:
-        for i, segment in enumerate(self.llm_response.master_plan.musical_blocks):
-            end = segment.time_range.get("end", float("inf"))
-            if (
-                self.elapsed_music_time <= end
-                and float(end) - self.elapsed_music_time <= 3
-            ):
-                if i + 1 < len(self.llm_response.master_plan.musical_blocks):
-                    logger.info(
-                        "Music update needed. Elapsed time: %.2f, Segment end time: %.2f",
-                        self.elapsed_music_time,
-                        end,
-                    )
-                    music_block = self.llm_response.master_plan.musical_blocks[i + 1]
-                    new_config = music_block.lyria_config
-                    update_config = False
-                    if self.current_config.bpm != new_config.bpm:
-                        self.config.bpm = new_config.bpm
-                        update_config = True
-                        logger.info("Updated BPM to %d", self.config.bpm)
-                    if self.current_config.scale != new_config.scale:
-                        self.config.scale = new_config.get_lyria_scale()
-                        update_config = True
-                        logger.info("Updated Scale to %s", self.config.scale.name)
-                    if update_config:
-                        await session.set_music_generation_config(config=self.config)
-                        await session.reset_context()
-                        logger.info("Injected new configuration and reset context")
-
-                    prompt_text = new_config.prompt
-                    weight = new_config.weight
-
-                    await session.set_weighted_prompts(
-                        prompts=[
-                            types.WeightedPrompt(
-                                text=prompt_text,
-                                weight=weight,
-                            )
-                        ]
-                    )
+        self._schedule_block_prefetch()
 
-                    self.gain = music_block.gain
+        cue = self.timeline.advance(self.elapsed_music_time, self._transition_lead())
+        if cue is None:
+            return
 
-                    self.current_config = new_config
-                else:
-                    return
+        logger.info(
+            "Music update needed. Elapsed time: %.2f, switching to block %d with %.2fs lead",
+            self.elapsed_music_time,
+            cue.index,
+            self._transition_lead(),
+        )
+        self.transition_latency.sent()
+        if cue.config_changed:
+            await session.set_music_generation_config(config=cue.config)
+            await session.reset_context()
+            logger.info(
+                "Injected BPM %d, scale %s and reset context",
+                cue.config.bpm,
+                cue.config.scale.name if cue.config.scale else "unset",
+            )
+
+        await session.set_weighted_prompts(prompts=cue.prompts)
+
+        # Chunks carry the gain they were generated under, the sender ramps from there
+        self.gain = cue.block.gain
+        self.current_config = cue.block.lyria_config
+        self.active_block_index = cue.index
 
     async def _heartbeat_monitor(self) -> None:
         logger.info("Heartbeat monitor started")
@@ -181,34 +484,52 @@ class LyriaService:
         finally:
             logger.info("Heartbeat monitor ended")
 
-    async def _proxy_audio_to_client(self, session: AsyncMusicSession) -> None:
-        logger.info("Audio proxy loop started. Streaming audio to client.")
+    async def _receive_audio_from_lyria(self, session: AsyncMusicSession) -> None:
+        logger.info("Audio receive loop started. Queueing audio from Lyria.")
+        self.music_session = session
         try:
-            chunks_count = 0
-            first_chunk_sent = False
             async for message in session.receive():
                 if not self.session_active:
                     break
-                    
-                chunks_count += 1
-                if chunks_count == 1:
-                    await asyncio.sleep(self.BUFFER_SECONDS)
+
                 if message.server_content and message.server_content.audio_chunks:
                     audio_data = message.server_content.audio_chunks[0].data
                     if audio_data:
-                        if not first_chunk_sent:
-                            await self.user_websocket.send_text(Commands.PLAYING)
-                            logger.info("Sent playing message to client")
-                            first_chunk_sent = True
-                        
-                        adjusted_audio_data = self._apply_audio_gain(audio_data)
-                        await self.user_websocket.send_bytes(adjusted_audio_data)
-                        self.elapsed_music_time += 2  # 2 seconds are sent in each chunk
-                        logger.info(
-                            "Sent audio chunk to client with gain applied (%.1fx), total elapsed music time: %.2f seconds",
-                            self.gain,
+                        latency = self.transition_latency.chunk_received()
+                        if latency is not None:
+                            logger.info(
+                                "Lyria responded to transition in %.2fs, estimate now %.2fs",
+                                latency,
+                                self.transition_latency.estimate,
+                            )
+                        timestamp = self.clock.frames
+                        self.last_chunk_seconds = self.clock.advance(len(audio_data))
+                        self.jitter_buffer.chunk_arrived(self.last_chunk_seconds)
+                        self._queue_chunk(
+                            QueuedChunk(
+                                audio_data,
+                                self.last_chunk_seconds,
+                                self.gain,
+                                self.audio_sequence,
+                                timestamp,
+                            )
+                        )
+                        self.audio_sequence += 1
+                        if self.recorder:
+                            await self._record_chunk(audio_data, timestamp)
+                        logger.debug(
+                            "Queued audio chunk, total elapsed music time: %.2f seconds, queue %s",
                             self.elapsed_music_time,
+                            self.audio_queue.stats(),
                         )
+                        if (
+                            self.audio_queue.policy == AudioQueue.POLICY_PAUSE
+                            and self.audio_queue.above_high_watermark
+                            and not self.generation_paused
+                        ):
+                            logger.info("Client is behind, pausing generation")
+                            self.generation_paused = True
+                            await session.pause()
                         await self._check_for_music_update(session)
                     else:
                         logger.info("Received audio chunk with no data.")
@@ -216,78 +537,432 @@ class LyriaService:
                     logger.info("Prompt was filtered out: %s", message.filtered_prompt)
                 else:
                     logger.info("Unknown error occurred with message: %s", message)
-                await asyncio.sleep(10**-12)
-        except WebSocketDisconnect as e:
-            logger.info(f"Client disconnected (audio loop): {e}")
-            self.session_active = False
         except Exception as e:
-            logger.error(f"UNEXPECTED audio loop error: {e}", exc_info=True)
+            logger.error(f"UNEXPECTED audio receive error: {e}", exc_info=True)
             self.session_active = False
         finally:
-            logger.info("Audio loop has fully ended.")
+            self.audio_queue.close()
+            logger.info("Audio receive loop has fully ended.")
 
-    async def start_session(self) -> None:
-        logger.info("Starting Lyria session with config: %s", self.current_config)
-        try:
-            self.config.bpm = self.current_config.bpm
-            self.config.scale = self.current_config.get_lyria_scale()
+    def _queue_chunk(self, chunk: QueuedChunk) -> None:
+        self.audio_queue.put(chunk)
+        if self.broadcast:
+            self.broadcast.publish(chunk)
 
-            session: AsyncMusicSession
-            async with self.client.aio.live.music.connect(model=self.model) as session:
-                logger.info("Lyria session connected")
-                await session.set_weighted_prompts(
-                    prompts=[
-                        types.WeightedPrompt(
-                            text=self.current_config.prompt,
-                            weight=self.current_config.weight,
-                        )
-                    ]
-                )
-                await session.set_music_generation_config(config=self.config)
+    async def _reject_control(self, command: str) -> None:
+        logger.info(
+            "Listener sent %s, only the broadcast owner controls playback", command
+        )
+        await self.user_websocket.send_text(
+            json.dumps(
+                {
+                    "type": "broadcast",
+                    "error": "Only the session owner can control playback",
+                }
+            )
+        )
+
+    async def _announce_broadcast_role(self, role: str) -> None:
+        self.broadcast_role = role
+        await self.user_websocket.send_text(
+            json.dumps(
+                {"type": "broadcast", "role": role, "position": self.elapsed_music_time}
+            )
+        )
+
+    async def _announce_broadcast_state(self, state: str) -> None:
+        """Tells a listener why the owner's music stopped, or that it is back"""
+        if state == self.broadcast_state:
+            return
+        self.broadcast_state = state
+        await self.user_websocket.send_text(
+            json.dumps({"type": "broadcast", "state": state})
+        )
+
+    async def _join_broadcast(self) -> bool:
+        """
+        Listens to the session's owner until this connection claims the stream itself.
+        An owner that went silent but keeps its claim is waited on for longer each time
+        instead of being polled. False when the client left while listening.
+        """
+        listened = False
+        went_quiet = False
+        quiet_timeout = self.broadcast_hub.owner_ttl
+        while self.session_active:
+            try:
+                self.broadcast = await self.broadcast_hub.claim(self.session_id)
+            except Exception as e:
+                logger.warning(f"Failed to claim broadcast, generating unshared: {e}")
+                return True
 
-                logger.info("Playing Lyria session")
-                await session.play()
+            if self.broadcast:
+                if listened:
+                    # Take over generation from the last chunk this client received
+                    await self.resume(None)
+                await self._announce_broadcast_role("owner")
+                return True
 
-                logger.info("Starting send, receive, and heartbeat tasks")
-                send_task = None
-                receive_task = None
-                heartbeat_task = None
+            if went_quiet:
+                # The owner sent nothing for a whole wait yet still holds its claim
+                await self._announce_broadcast_state("stalled")
+                quiet_timeout = min(
+                    quiet_timeout * 2,
+                    self.broadcast_hub.owner_ttl * self.broadcast_hub.MAX_QUIET_TTLS,
+                )
+            else:
+                quiet_timeout = self.broadcast_hub.owner_ttl
+            listened = True
+            went_quiet = await self._follow_broadcast(quiet_timeout)
+        return False
+
+    async def _follow_broadcast(self, quiet_timeout: float) -> bool:
+        """
+        Queues the owner's chunks until it stops, or stays quiet for quiet_timeout while
+        not paused. True when it went quiet without sending a chunk.
+        """
+        queue = self.broadcast_hub.listen(self.session_id)
+        hub = self.broadcast_hub.session(self.session_id)
+        logger.info("Listening to the broadcast of session %s", self.session_id)
+        self.broadcast_role = "listener"
+        announced = False
+        received = False
+        try:
+            while self.session_active:
+                if hub.paused:
+                    await self._announce_broadcast_state("paused")
+                state_changed = asyncio.create_task(hub.state_changed.wait())
+                next_chunk = asyncio.create_task(queue.get())
                 try:
-                    send_task = asyncio.create_task(
-                        self._proxy_commands_to_lyria(session)
+                    await asyncio.wait(
+                        (state_changed, next_chunk),
+                        timeout=quiet_timeout,
+                        return_when=asyncio.FIRST_COMPLETED,
                     )
-                    receive_task = asyncio.create_task(
-                        self._proxy_audio_to_client(session)
+                finally:
+                    state_changed.cancel()
+                    next_chunk.cancel()
+                if not next_chunk.done():
+                    if state_changed.done():
+                        continue
+                    if hub.paused and await self.broadcast_hub.owned(self.session_id):
+                        # A paused owner is silent on purpose, keep waiting
+                        continue
+                    logger.info("Broadcast owner went quiet, trying to take over")
+                    return not received
+                chunk = next_chunk.result()
+                if chunk is None:
+                    logger.info("Broadcast owner left, trying to take over")
+                    return False
+                received = True
+                if not hub.paused:
+                    await self._announce_broadcast_state("playing")
+
+                # Late joiners start at the owner's position
+                self.clock.seek(chunk.timestamp / PlaybackClock.SAMPLE_RATE)
+                if not announced:
+                    await self._announce_broadcast_role("listener")
+                    announced = True
+                await self.audio_queue.wait_for_space()
+                seconds = self.clock.advance(len(chunk.audio_data))
+                self.audio_queue.put(
+                    QueuedChunk(
+                        chunk.audio_data,
+                        seconds,
+                        chunk.gain,
+                        self.audio_sequence,
+                        chunk.timestamp,
                     )
-                    heartbeat_task = asyncio.create_task(
-                        self._heartbeat_monitor()
+                )
+                self.audio_sequence += 1
+                self._schedule_block_prefetch()
+        finally:
+            self.broadcast_hub.leave(self.session_id, queue)
+
+    async def _record_chunk(self, audio_data: bytes, timestamp: int) -> None:
+        try:
+            recording = await asyncio.to_thread(
+                self.recorder.write,
+                audio_data,
+                timestamp,
+                self.active_block_index,
+                self.gain,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record soundtrack: {e}")
+            recording = False
+
+        # Everything planned has been rendered once the clock passes the last block
+        complete = (
+            recording
+            and not self._has_unloaded_blocks()
+            and self.elapsed_music_time >= self.timeline.planned_until
+        )
+        if not recording or complete:
+            await self._close_recorder(complete)
+
+    async def _close_recorder(self, complete: bool = False) -> None:
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return
+        try:
+            await asyncio.to_thread(recorder.close, complete)
+        except Exception as e:
+            logger.warning(f"Failed to close soundtrack recording: {e}")
+
+    def _cached_frames(self) -> int:
+        if not self.soundtrack_cache or not self.session_id:
+            return 0
+        try:
+            return self.soundtrack_cache.rendered_frames(self.session_id)
+        except Exception as e:
+            logger.warning(f"Failed to read soundtrack cache: {e}")
+            return 0
+
+    async def _replay_cached_audio(self) -> None:
+        """Queues the already rendered audio from the client's position onwards"""
+        segments = self.soundtrack_cache.segments(self.session_id)
+        start_frame = self.clock.frames
+        chunk_frames = int(self.REPLAY_CHUNK_SECONDS * PlaybackClock.SAMPLE_RATE)
+        # Seconds the client has played since the replay started, held while it is paused
+        played = 0.0
+        last_tick = time.monotonic()
+        logger.info(
+            "Replaying cached soundtrack from %.2f to %.2f seconds",
+            self.elapsed_music_time,
+            segments[-1].end / PlaybackClock.SAMPLE_RATE,
+        )
+        for segment in segments:
+            position = max(segment.start, start_frame)
+            while position < segment.end and self.session_active:
+                frames = min(chunk_frames, segment.end - position)
+                audio_data = await asyncio.to_thread(
+                    self.soundtrack_cache.read_frames,
+                    self.session_id,
+                    segment,
+                    position,
+                    frames,
+                )
+                # The client only needs REPLAY_LEAD seconds ahead of what it has played
+                queued = (position - start_frame) / PlaybackClock.SAMPLE_RATE
+                while self.session_active:
+                    now = time.monotonic()
+                    if not self.user_paused:
+                        played += now - last_tick
+                    last_tick = now
+                    ahead = queued - played - self.REPLAY_LEAD
+                    if ahead <= 0:
+                        break
+                    self.play_state_changed.clear()
+                    try:
+                        await asyncio.wait_for(
+                            self.play_state_changed.wait(),
+                            None if self.user_paused else ahead,
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                if not self.session_active:
+                    break
+                await self.audio_queue.wait_for_space()
+
+                timestamp = self.clock.frames
+                seconds = self.clock.advance(len(audio_data))
+                self._queue_chunk(
+                    QueuedChunk(
+                        audio_data,
+                        seconds,
+                        segment.gain,
+                        self.audio_sequence,
+                        timestamp,
                     )
+                )
+                self.audio_sequence += 1
+                position += frames
+                self._schedule_block_prefetch()
 
-                    await asyncio.gather(
-                        send_task, receive_task, heartbeat_task, return_exceptions=True
+    async def _produce_audio(self) -> None:
+        """Fills the audio queue: cached audio first, then live generation from Lyria"""
+        try:
+            if self.broadcast_hub and self.session_id:
+                if not await self._join_broadcast():
+                    return
+
+            if self._cached_frames() > self.clock.frames:
+                await self._replay_cached_audio()
+                if not self.session_active or self.soundtrack_cache.is_complete(
+                    self.session_id
+                ):
+                    logger.info("Soundtrack served from cache without Lyria")
+                    return
+                # Continue live in the block playing where the rendered audio ends
+                await self.resume(None)
+
+            if self.soundtrack_cache and self.session_id:
+                self.recorder = self.soundtrack_cache.recorder(
+                    self.session_id, self.clock.frames
+                )
+
+            session: AsyncMusicSession
+            async with self._music_session() as session:
+                # A client that paused during the replay stays paused
+                if not self.user_paused:
+                    logger.info("Playing Lyria session")
+                    await session.play()
+                await self._receive_audio_from_lyria(session)
+        finally:
+            self.music_session = None
+            self.audio_queue.close()
+            await self._close_recorder()
+            if self.broadcast:
+                # Hands the stream over to a listener, if any is left
+                await self.broadcast.close()
+                self.broadcast = None
+
+    async def _announce_jitter_target(self) -> None:
+        """Tells the client how much audio to hold before resuming after an underrun"""
+        target = round(self.jitter_buffer.target, 1)
+        if (
+            self.announced_jitter_target is not None
+            and abs(target - self.announced_jitter_target) < self.JITTER_ANNOUNCE_STEP
+        ):
+            return
+        self.announced_jitter_target = target
+        await self.user_websocket.send_text(
+            json.dumps({"type": "jitter_buffer", "target": target})
+        )
+
+    async def _send_audio_to_client(self) -> None:
+        logger.info("Audio send loop started. Streaming audio to client.")
+        try:
+            self.gain_stage.set_gain(self.gain)
+            prebuffer = self.jitter_buffer.target
+            logger.info("Prebuffering %.2f seconds of audio", prebuffer)
+            await self.audio_queue.wait_for(prebuffer)
+            first_chunk_sent = False
+            while self.session_active:
+                chunk = await self.audio_queue.get()
+                if chunk is None:
+                    break
+
+                if not first_chunk_sent:
+                    await self.user_websocket.send_text(Commands.PLAYING)
+                    logger.info("Sent playing message to client")
+                    first_chunk_sent = True
+
+                self.gain_stage.ramp_to(chunk.gain)
+                adjusted_audio_data = self._apply_audio_gain(chunk.audio_data)
+                if self.encoder:
+                    adjusted_audio_data = await self.encoder.encode(
+                        adjusted_audio_data, chunk.sequence, chunk.timestamp
                     )
-                except Exception as e:
-                    logger.error("Error in session tasks: %s", e)
-                    self.session_active = False
-                    if send_task and not send_task.done():
-                        send_task.cancel()
-                    if receive_task and not receive_task.done():
-                        receive_task.cancel()
-                    if heartbeat_task and not heartbeat_task.done():
-                        heartbeat_task.cancel()
-                    if send_task and receive_task and heartbeat_task:
-                        await asyncio.gather(
-                            send_task, receive_task, heartbeat_task, return_exceptions=True
-                        )
-                finally:
-                    self.session_active = False
-                    if send_task and not send_task.done():
+                send_started = time.monotonic()
+                await self.user_websocket.send_bytes(adjusted_audio_data)
+                self.jitter_buffer.chunk_sent(time.monotonic() - send_started)
+                self.sent_position = (
+                    chunk.timestamp / PlaybackClock.SAMPLE_RATE + chunk.seconds
+                )
+                await self._announce_jitter_target()
+
+                if (
+                    self.generation_paused
+                    and not self.user_paused
+                    and self.audio_queue.below_low_watermark
+                    and self.music_session
+                ):
+                    logger.info("Client caught up, resuming generation")
+                    self.generation_paused = False
+                    await self.music_session.play()
+        except WebSocketDisconnect as e:
+            logger.info(f"Client disconnected (audio loop): {e}")
+            self.session_active = False
+        except Exception as e:
+            logger.error(f"UNEXPECTED audio send error: {e}", exc_info=True)
+            self.session_active = False
+        finally:
+            self.jitter_buffer.settle()
+            if self.encoder:
+                await self.encoder.close()
+            logger.info(
+                "Audio send loop has fully ended. Queue: %s", self.audio_queue.stats()
+            )
+
+    @asynccontextmanager
+    async def _music_session(self) -> AsyncIterator[AsyncMusicSession]:
+        """A primed Lyria session, reusing the pre-warmed connection when there is one"""
+        prewarmed = None
+        if self.lyria_pool and self.session_id:
+            prewarmed = await self.lyria_pool.take(self.session_id)
+
+        if prewarmed is None:
+            async with self.client.aio.live.music.connect(model=self.model) as session:
+                logger.info("Lyria session connected")
+                await prime_session(session, self.current_config)
+                yield session
+            return
+
+        async with prewarmed.stack:
+            logger.info("Using pre-warmed Lyria session")
+            # A resumed stream may be in a different block than the one primed
+            if prewarmed.lyria_config != self.current_config:
+                await prime_session(prewarmed.session, self.current_config)
+            yield prewarmed.session
+
+    async def start_session(self) -> None:
+        logger.info("Starting Lyria session with config: %s", self.current_config)
+        try:
+            if self.redis_service and self.session_id:
+                await self.user_websocket.send_text(
+                    json.dumps({"type": "resume_token", "token": self.resume_token})
+                )
+
+            logger.info("Starting send, produce, and heartbeat tasks")
+            send_task = None
+            produce_task = None
+            audio_send_task = None
+            heartbeat_task = None
+            checkpoint_task = asyncio.create_task(self._checkpoint_writer())
+            try:
+                send_task = asyncio.create_task(self._proxy_commands_to_lyria())
+                produce_task = asyncio.create_task(self._produce_audio())
+                audio_send_task = asyncio.create_task(self._send_audio_to_client())
+                # Once nothing more can be sent there is no point producing
+                audio_send_task.add_done_callback(lambda _: produce_task.cancel())
+                heartbeat_task = asyncio.create_task(self._heartbeat_monitor())
+
+                def stop_on_failure(task: asyncio.Task) -> None:
+                    # Without Lyria there is nothing to wait for from the client
+                    if not task.cancelled() and task.exception():
+                        self.session_active = False
                         send_task.cancel()
-                    if receive_task and not receive_task.done():
-                        receive_task.cancel()
-                    if heartbeat_task and not heartbeat_task.done():
                         heartbeat_task.cancel()
-                    logger.info("Lyria session tasks cleaned up")
+
+                produce_task.add_done_callback(stop_on_failure)
+
+                await asyncio.gather(
+                    send_task,
+                    produce_task,
+                    audio_send_task,
+                    heartbeat_task,
+                    return_exceptions=True,
+                )
+                if not produce_task.cancelled() and produce_task.exception():
+                    raise produce_task.exception()
+            finally:
+                self.session_active = False
+                if send_task and not send_task.done():
+                    send_task.cancel()
+                if produce_task and not produce_task.done():
+                    produce_task.cancel()
+                if audio_send_task and not audio_send_task.done():
+                    audio_send_task.cancel()
+                if heartbeat_task and not heartbeat_task.done():
+                    heartbeat_task.cancel()
+                if self.prefetch_task and not self.prefetch_task.done():
+                    self.prefetch_task.cancel()
+                checkpoint_task.cancel()
+                # Final flush so a reconnect resumes from the last chunk sent
+                if self.redis_service and self.session_id:
+                    await self._write_checkpoint()
+                logger.info("Lyria session tasks cleaned up")
 
         except Exception as e:
             logger.error("Error in Lyria session: %s", e, exc_info=True)
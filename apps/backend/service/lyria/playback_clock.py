@@ -0,0 +1,78 @@
+import time
+from typing import Callable, Optional
+
+
+class PlaybackClock:
+    """Music time counted from the PCM samples actually streamed (48 kHz stereo int16)"""
+
+    SAMPLE_RATE = 48000
+    CHANNELS = 2
+    SAMPLE_WIDTH = 2
+    FRAME_BYTES = CHANNELS * SAMPLE_WIDTH
+
+    def __init__(self) -> None:
+        self.frames = 0
+        # Bytes of a frame split across two chunks, counted once the frame completes
+        self.partial_bytes = 0
+
+    @property
+    def elapsed(self) -> float:
+        return self.frames / self.SAMPLE_RATE
+
+    def advance(self, byte_count: int) -> float:
+        """Counts a chunk of PCM bytes, returning its duration in seconds"""
+        total = self.partial_bytes + byte_count
+        frames, self.partial_bytes = divmod(total, self.FRAME_BYTES)
+        self.frames += frames
+        return frames / self.SAMPLE_RATE
+
+    def seek(self, seconds: float) -> None:
+        self.frames = round(max(seconds, 0.0) * self.SAMPLE_RATE)
+        self.partial_bytes = 0
+
+
+class TransitionLatency:
+    """
+    Running estimate of how long Lyria takes to make a prompt or config change audible,
+    measured from sending the change to the next audio chunk arriving. Mean and deviation
+    are smoothed like TCP's RTT estimator so one slow response does not swing the lead.
+    """
+
+    ALPHA = 0.25
+    BETA = 0.25
+    DEVIATIONS = 2.0
+    MAX_LATENCY = 8.0
+
+    def __init__(
+        self,
+        initial: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.clock = clock
+        self.mean = initial
+        self.deviation = 0.0
+        self.samples = 0
+        self.sent_at: Optional[float] = None
+
+    @property
+    def estimate(self) -> float:
+        return min(self.mean + self.DEVIATIONS * self.deviation, self.MAX_LATENCY)
+
+    def sent(self) -> None:
+        self.sent_at = self.clock()
+
+    def chunk_received(self) -> Optional[float]:
+        """Records the latency of the pending change, if any, and returns it"""
+        if self.sent_at is None:
+            return None
+
+        latency = min(self.clock() - self.sent_at, self.MAX_LATENCY)
+        self.sent_at = None
+        if self.samples == 0:
+            self.mean = latency
+            self.deviation = latency / 2
+        else:
+            self.deviation += self.BETA * (abs(latency - self.mean) - self.deviation)
+            self.mean += self.ALPHA * (latency - self.mean)
+        self.samples += 1
+        return latency
@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import numpy as np
+from google.genai import types
+from models.llm_response import MusicBlocks
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class BlockCue:
+    """Everything needed to switch Lyria to a block, built when the block is compiled"""
+
+    index: int
+    block: MusicBlocks
+    prompts: List[types.WeightedPrompt]
+    config: types.LiveMusicGenerationConfig
+    config_changed: bool
+
+
+class PlaybackTimeline:
+    """
+    Musical blocks compiled once for playback: boundaries in arrays, the Lyria prompts and
+    config of every block prebuilt, and a cursor on the playing block that only moves
+    forward. advance() is a single comparison until the next transition is due.
+    """
+
+    # Default seconds before a block boundary that the next block's prompts are sent
+    TRANSITION_LEAD = 3.0
+
+    def __init__(
+        self, blocks: List[MusicBlocks], offset: int = 0, cursor: int = 0
+    ) -> None:
+        self.reset(blocks, offset, cursor)
+
+    def reset(self, blocks: List[MusicBlocks], offset: int = 0, cursor: int = 0):
+        # blocks is kept by reference so the caller's list stays in sync with the timeline
+        self.blocks = blocks
+        self.offset = offset
+        self.cursor = min(cursor, max(len(blocks) - 1, 0))
+        self.starts = np.empty(0)
+        self.ends = np.empty(0)
+        self.prompts: List[List[types.WeightedPrompt]] = []
+        self.configs: List[types.LiveMusicGenerationConfig] = []
+        self.config_keys: List[Tuple[int, str]] = []
+        self._compile(blocks)
+        self._arm()
+
+    def _compile(self, blocks: List[MusicBlocks]) -> None:
+        self.starts = np.concatenate(
+            (
+                self.starts,
+                np.fromiter(
+                    (float(b.time_range.get("start", 0.0)) for b in blocks),
+                    dtype=np.float64,
+                    count=len(blocks),
+                ),
+            )
+        )
+        self.ends = np.concatenate(
+            (
+                self.ends,
+                np.fromiter(
+                    (float(b.time_range.get("end", np.inf)) for b in blocks),
+                    dtype=np.float64,
+                    count=len(blocks),
+                ),
+            )
+        )
+        for block in blocks:
+            lyria_config = block.lyria_config
+            try:
+                scale = lyria_config.get_lyria_scale()
+            except ValueError as e:
+                # One bad block keeps the scale before it rather than failing the plan
+                scale = self.configs[-1].scale if self.configs else None
+                logger.warning(f"{e}, keeping the previous scale")
+            self.prompts.append(
+                [
+                    types.WeightedPrompt(
+                        text=lyria_config.prompt, weight=lyria_config.weight
+                    )
+                ]
+            )
+            self.configs.append(
+                types.LiveMusicGenerationConfig(bpm=lyria_config.bpm, scale=scale)
+            )
+            self.config_keys.append((lyria_config.bpm, scale.name if scale else ""))
+
+    def _arm(self) -> None:
+        if self.cursor + 1 < len(self.blocks):
+            self.next_boundary = float(self.ends[self.cursor])
+        else:
+            self.next_boundary = np.inf
+
+    @property
+    def end_index(self) -> int:
+        """Absolute index one past the last loaded block"""
+        return self.offset + len(self.blocks)
+
+    @property
+    def planned_until(self) -> float:
+        return float(self.ends[-1]) if len(self.ends) else 0.0
+
+    def extend(self, blocks: List[MusicBlocks]) -> None:
+        self.blocks.extend(blocks)
+        self._compile(blocks)
+        self._arm()
+
+    def cue(self, cursor: int, previous: Optional[int] = None) -> BlockCue:
+        return BlockCue(
+            index=self.offset + cursor,
+            block=self.blocks[cursor],
+            prompts=self.prompts[cursor],
+            config=self.configs[cursor],
+            config_changed=previous is None
+            or self.config_keys[previous] != self.config_keys[cursor],
+        )
+
+    def advance(
+        self, elapsed: float, lead: float = TRANSITION_LEAD
+    ) -> Optional[BlockCue]:
+        """Cue for the block to switch to once elapsed is within lead of its start"""
+        if elapsed + lead < self.next_boundary:
+            return None
+
+        previous = self.cursor
+        # Several boundaries can pass at once after a long stall; only the last one plays
+        while (
+            self.cursor + 1 < len(self.blocks)
+            and elapsed + lead >= self.ends[self.cursor]
+        ):
+            self.cursor += 1
+        self._arm()
+        return self.cue(self.cursor, previous)
+
+    def find(self, elapsed: float) -> Optional[int]:
+        """Relative index of the loaded block playing at elapsed"""
+        i = int(np.searchsorted(self.starts, elapsed, side="right")) - 1
+        if 0 <= i < len(self.blocks) and elapsed < self.ends[i]:
+            return i
+        return None
+
+    def seek(self, cursor: int) -> None:
+        self.cursor = cursor
+        self._arm()
+
+    def drop_played(self) -> int:
+        """Forgets the blocks before the cursor, returning how many were dropped"""
+        played = self.cursor
+        if played:
+            del self.blocks[:played]
+            self.starts = self.starts[played:]
+            self.ends = self.ends[played:]
+            del self.prompts[:played]
+            del self.configs[:played]
+            del self.config_keys[:played]
+            self.offset += played
+            self.cursor = 0
+        return played
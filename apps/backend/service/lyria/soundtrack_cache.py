@@ -0,0 +1,366 @@
+import fcntl
+import json
+import os
+import re
+import shutil
+import struct
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+from service.lyria.playback_clock import PlaybackClock
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+_BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+@dataclass
+class Segment:
+    """A run of rendered audio from one block, stored as raw 48 kHz stereo int16 PCM"""
+
+    block_index: int
+    # Music time of the first frame, in 48 kHz frames
+    start: int
+    frames: int
+    # Gain the block played at; cached PCM is stored before gain like Lyria's output
+    gain: float
+
+    @property
+    def end(self) -> int:
+        return self.start + self.frames
+
+    @property
+    def filename(self) -> str:
+        return f"{self.start:012d}-{self.block_index}.pcm"
+
+
+def parse_byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    First and last byte of a single-range Range header. None means serve the whole body:
+    multiple ranges and malformed headers are ignored as RFC 9110 allows. Raises
+    ValueError when the range cannot be satisfied.
+    """
+    match = _BYTE_RANGE.match(header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+
+    first, last = match.group(1), match.group(2)
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, end
+
+
+class SoundtrackRecorder:
+    """
+    Appends one live stream's audio to the cache. Audio is written to the open segment
+    and only becomes visible to readers once the segment is committed to the manifest:
+    on a block or gain change, after SEGMENT_SECONDS, or on close.
+    """
+
+    def __init__(
+        self,
+        cache: "SoundtrackCache",
+        session_id: str,
+        start_frame: int,
+        max_segment_frames: int,
+        lock_fd: int,
+    ) -> None:
+        self.cache = cache
+        self.session_id = session_id
+        self.end_frame = start_frame
+        self.max_segment_frames = max_segment_frames
+        self.segment: Optional[Segment] = None
+        self.file: Optional[BinaryIO] = None
+        self.partial = b""
+        self.active = True
+        # Holds the session's writer lock until the recorder closes
+        self.lock_fd = lock_fd
+
+    def write(self, pcm: bytes, timestamp: int, block_index: int, gain: float) -> bool:
+        """Records a chunk starting at timestamp, returns False once recording stopped"""
+        if not self.active:
+            return False
+        if timestamp != self.end_frame:
+            # Only an unbroken run extends the rendered prefix
+            logger.info(
+                "Soundtrack for %s skipped from frame %d to %d, recording stopped",
+                self.session_id,
+                self.end_frame,
+                timestamp,
+            )
+            self.close()
+            return False
+
+        if self.segment and (
+            self.segment.block_index != block_index
+            or self.segment.gain != gain
+            or self.segment.frames >= self.max_segment_frames
+        ):
+            self._commit()
+        if self.segment is None:
+            self.segment = Segment(block_index, self.end_frame, 0, gain)
+            self.file = open(
+                self.cache.session_dir(self.session_id) / self.segment.filename, "wb"
+            )
+
+        # Lyria chunks may split a frame; hold the remainder for the next chunk
+        data = self.partial + bytes(pcm)
+        whole = len(data) - len(data) % PlaybackClock.FRAME_BYTES
+        self.partial = data[whole:]
+        self.file.write(data[:whole])
+        frames = whole // PlaybackClock.FRAME_BYTES
+        self.segment.frames += frames
+        self.end_frame += frames
+        return True
+
+    def _commit(self) -> None:
+        if self.file:
+            self.file.close()
+            self.file = None
+        if self.segment and self.segment.frames:
+            self.cache.commit(self.session_id, self.segment)
+        self.segment = None
+
+    def close(self, complete: bool = False) -> None:
+        if not self.active:
+            return
+        self.active = False
+        try:
+            self._commit()
+            if complete:
+                self.cache.mark_complete(self.session_id)
+        finally:
+            self.cache.release_lock(self.session_id, self.lock_fd)
+
+
+class SoundtrackCache:
+    """
+    Render-once store for session soundtracks on local disk, one directory per session:
+    PCM segment files keyed by start frame and block, plus a manifest of the committed
+    ones. Only the unbroken run from frame 0 is served, over HTTP as WAV or replayed on
+    the music WebSocket; live generation picks up where it ends.
+
+    The root may be shared between nodes. A recorder holds an exclusive flock on its
+    session's lock file, so the manifest only ever has one writer. The kernel drops the
+    lock with the process holding it, a crashed writer never leaves it behind.
+    """
+
+    SEGMENT_SECONDS = 30.0
+    TTL = 24 * 3600
+    MANIFEST = "manifest.json"
+    LOCK = "recording.lock"
+    WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
+    def __init__(
+        self,
+        root: str,
+        ttl: float = TTL,
+        segment_seconds: float = SEGMENT_SECONDS,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.ttl = ttl
+        self.max_segment_frames = int(segment_seconds * PlaybackClock.SAMPLE_RATE)
+        # Sessions with a live recorder in this process, others may hold locks elsewhere
+        self.recording: Set[str] = set()
+        os.makedirs(self.root, exist_ok=True)
+
+    def session_dir(self, session_id: str) -> Path:
+        if not _SESSION_ID.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        return Path(self.root) / session_id
+
+    def manifest(self, session_id: str) -> Dict[str, Any]:
+        try:
+            with open(self.session_dir(session_id) / self.MANIFEST) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"segments": [], "complete": False}
+
+    def _write_manifest(self, session_id: str, manifest: Dict[str, Any]) -> None:
+        path = self.session_dir(session_id) / self.MANIFEST
+        temp = path.with_suffix(".tmp")
+        with open(temp, "w") as f:
+            json.dump(manifest, f)
+        # Readers only ever see a complete manifest
+        os.replace(temp, path)
+
+    def _lock_path(self, session_id: str) -> Path:
+        return self.session_dir(session_id) / self.LOCK
+
+    @staticmethod
+    def _try_lock(path: Path) -> Optional[int]:
+        """Descriptor holding an exclusive lock on path, None while another holds it"""
+        fd = os.open(path, os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def release_lock(self, session_id: str, lock_fd: int) -> None:
+        self.recording.discard(session_id)
+        # The file stays, removing it would let a new writer lock a different inode
+        os.close(lock_fd)
+
+    def segments(self, session_id: str) -> List[Segment]:
+        """Committed segments forming the unbroken rendered run from frame 0"""
+        segments = []
+        end = 0
+        for entry in self.manifest(session_id)["segments"]:
+            segment = Segment(**entry)
+            if segment.start != end:
+                break
+            segments.append(segment)
+            end = segment.end
+        return segments
+
+    def rendered_frames(self, session_id: str) -> int:
+        segments = self.segments(session_id)
+        return segments[-1].end if segments else 0
+
+    def is_complete(self, session_id: str) -> bool:
+        return bool(self.manifest(session_id).get("complete"))
+
+    def recorder(
+        self, session_id: str, start_frame: int
+    ) -> Optional[SoundtrackRecorder]:
+        """A recorder when a stream starting at start_frame extends the rendered run"""
+        if session_id in self.recording or self.is_complete(session_id):
+            return None
+        if start_frame != self.rendered_frames(session_id):
+            return None
+
+        self.prune()
+        os.makedirs(self.session_dir(session_id), exist_ok=True)
+        lock_fd = self._try_lock(self._lock_path(session_id))
+        if lock_fd is None:
+            logger.info("Soundtrack for %s is being recorded elsewhere", session_id)
+            return None
+        # The previous writer may have extended the run before releasing the lock
+        if self.is_complete(session_id) or start_frame != self.rendered_frames(
+            session_id
+        ):
+            os.close(lock_fd)
+            return None
+
+        self.recording.add(session_id)
+        logger.info(
+            "Recording soundtrack for %s from frame %d", session_id, start_frame
+        )
+        return SoundtrackRecorder(
+            self, session_id, start_frame, self.max_segment_frames, lock_fd
+        )
+
+    # Manifest updates only come from the recorder holding the session's lock
+    def commit(self, session_id: str, segment: Segment) -> None:
+        manifest = self.manifest(session_id)
+        manifest["segments"].append(asdict(segment))
+        self._write_manifest(session_id, manifest)
+
+    def mark_complete(self, session_id: str) -> None:
+        manifest = self.manifest(session_id)
+        manifest["complete"] = True
+        self._write_manifest(session_id, manifest)
+        logger.info("Soundtrack for %s fully rendered", session_id)
+
+    def read_frames(
+        self, session_id: str, segment: Segment, start: int, frames: int
+    ) -> bytes:
+        with open(self.session_dir(session_id) / segment.filename, "rb") as f:
+            f.seek((start - segment.start) * PlaybackClock.FRAME_BYTES)
+            return f.read(frames * PlaybackClock.FRAME_BYTES)
+
+    @classmethod
+    def wav_header(cls, data_bytes: int) -> bytes:
+        rate = PlaybackClock.SAMPLE_RATE
+        frame = PlaybackClock.FRAME_BYTES
+        return cls.WAV_HEADER.pack(
+            b"RIFF",
+            36 + data_bytes,
+            b"WAVE",
+            b"fmt ",
+            16,
+            1,
+            PlaybackClock.CHANNELS,
+            rate,
+            rate * frame,
+            frame,
+            PlaybackClock.SAMPLE_WIDTH * 8,
+            b"data",
+            data_bytes,
+        )
+
+    @classmethod
+    def wav_size(cls, segments: List[Segment]) -> int:
+        frames = segments[-1].end if segments else 0
+        return cls.WAV_HEADER.size + frames * PlaybackClock.FRAME_BYTES
+
+    def iter_wav(
+        self,
+        session_id: str,
+        segments: List[Segment],
+        first: int,
+        last: int,
+        chunk_size: int = 64 * 1024,
+    ) -> Iterator[bytes]:
+        """Bytes first..last inclusive of the segments rendered as one WAV file"""
+        header = self.wav_header(self.wav_size(segments) - self.WAV_HEADER.size)
+        position = first
+        if position < len(header):
+            yield header[position : last + 1]
+            position = len(header)
+
+        offset = len(header)
+        for segment in segments:
+            size = segment.frames * PlaybackClock.FRAME_BYTES
+            if position > last:
+                return
+            if position >= offset + size:
+                offset += size
+                continue
+            with open(self.session_dir(session_id) / segment.filename, "rb") as f:
+                f.seek(position - offset)
+                remaining = min(offset + size, last + 1) - position
+                while remaining > 0:
+                    data = f.read(min(chunk_size, remaining))
+                    if not data:
+                        return
+                    yield data
+                    position += len(data)
+                    remaining -= len(data)
+            offset += size
+
+    def prune(self) -> None:
+        """Removes soundtracks not written to within ttl"""
+        cutoff = time.time() - self.ttl
+        for session_id in os.listdir(self.root):
+            if session_id in self.recording:
+                continue
+            path = os.path.join(self.root, session_id)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                # Skips soundtracks another node is still recording
+                lock_fd = self._try_lock(Path(path) / self.LOCK)
+                if lock_fd is None:
+                    continue
+                try:
+                    shutil.rmtree(path)
+                finally:
+                    os.close(lock_fd)
+                logger.info("Pruned cached soundtrack %s", session_id)
+            except OSError as e:
+                logger.warning(f"Failed to prune cached soundtrack {session_id}: {e}")
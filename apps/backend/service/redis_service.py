@@ -1,39 +1,252 @@
-import json
-import uuid
 import asyncio
-import redis
-from typing import Optional, Dict, Any
+import uuid
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import cached_property
+import orjson
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import PubSub
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.cluster import LoadBalancingStrategy
+from redis.exceptions import ResponseError
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Optional,
+    Dict,
+    Any,
+    List,
+    Set,
+    Union,
+)
 from models.llm_response import LLMResponse, MasterPlan, MusicBlocks
 from models.lyria_config import LyriaConfig
+from service.session_cache import SessionCache
+from service.session_codec import SessionCodec
 from shared.logging import get_logger
 
 logger = get_logger(__name__)
 
 
+class SessionPayload:
+    """Stored session as JSON bytes, parsed into an LLMResponse only when first used"""
+
+    def __init__(
+        self,
+        body: bytes,
+        to_llm_response: Callable[[Dict[str, Any]], LLMResponse],
+        block_count: Optional[int] = None,
+    ):
+        self.body = body
+        self._to_llm_response = to_llm_response
+        # Total stored blocks when the body only holds the first ones, None when it holds them all
+        self.block_count = block_count
+
+    def message(self, message_type: str) -> str:
+        """WebSocket message with the stored session as data, built without re-encoding it"""
+        return f'{{"type":"{message_type}","data":{self.body.decode("utf-8")}}}'
+
+    @cached_property
+    def data(self) -> Dict[str, Any]:
+        return orjson.loads(self.body)
+
+    @cached_property
+    def llm_response(self) -> LLMResponse:
+        return self._to_llm_response(self.data)
+
+    def copy(self) -> "SessionPayload":
+        """Payload sharing the body and parsed blocks, with block lists of its own for playback to mutate"""
+        payload = SessionPayload(self.body, self._to_llm_response, self.block_count)
+        llm_response = self.llm_response
+        payload.llm_response = LLMResponse(
+            scene_analysis=list(llm_response.scene_analysis),
+            master_plan=MasterPlan(
+                global_context=llm_response.master_plan.global_context,
+                musical_blocks=list(llm_response.master_plan.musical_blocks),
+            ),
+            analysis_complete=llm_response.analysis_complete,
+            analysis_error=llm_response.analysis_error,
+        )
+        return payload
+
+
+@dataclass
+class SessionWindow:
+    start_index: int
+    musical_blocks: List[Dict[str, Any]]
+    scene_analysis: List[dict]
+    block_count: int
+    analysis_complete: bool
+    analysis_error: Optional[str] = None
+
+
 class RedisService:
+    # blob stores the whole session in one value, hash stores meta, every block and the
+    # scenes starting inside each block as separate fields of one hash
+    LAYOUT_BLOB = "blob"
+    LAYOUT_HASH = "hash"
+    LAYOUTS = (LAYOUT_BLOB, LAYOUT_HASH)
+    # Every node drops its near-cached copy of a session id published here
+    INVALIDATION_CHANNEL = "session-invalidate"
+    INVALIDATION_RETRY_SECONDS = 1.0
+    # Broadcast messages held per listener before its oldest are dropped
+    BROADCAST_BUFFER = 32
+    # Extend or delete the broadcast owner key only while it still holds our owner id
+    REFRESH_OWNER_SCRIPT = """
+    if redis.call("GET", KEYS[1]) == ARGV[1] then
+        return redis.call("EXPIRE", KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    RELEASE_OWNER_SCRIPT = """
+    if redis.call("GET", KEYS[1]) == ARGV[1] then
+        return redis.call("DEL", KEYS[1])
+    end
+    return 0
+    """
+
     def __init__(
-        self, redis_url: str = "redis://localhost:6379", session_ttl: int = 3600
+        self,
+        redis_url: str = "redis://localhost:6379",
+        session_ttl: int = 3600,
+        max_connections: int = 50,
+        pool_timeout: float = 5.0,
+        socket_timeout: float = 5.0,
+        socket_connect_timeout: float = 2.0,
+        health_check_interval: int = 30,
+        compress_threshold: int = 4096,
+        layout: str = LAYOUT_BLOB,
+        initial_blocks: int = 3,
+        near_cache_size: int = 256,
+        cluster: bool = False,
+        replica_reads: bool = False,
+        replica_url: Optional[str] = None,
+        replica_fallback: bool = True,
+        retry_attempts: int = 3,
+        retry_backoff_cap: float = 1.0,
     ):
+        if layout not in self.LAYOUTS:
+            raise ValueError(
+                f"Unknown session layout '{layout}', expected one of {self.LAYOUTS}"
+            )
+
         self.redis_url = redis_url
-        self.redis_client: Optional[redis.Redis] = None
+        self.redis_client: Optional[Union[Redis, RedisCluster]] = None
+        self.connection_pool: Optional[BlockingConnectionPool] = None
+        # Optional replica client used for session reads on connect
+        self.read_client: Optional[Union[Redis, RedisCluster]] = None
+        self.read_pool: Optional[BlockingConnectionPool] = None
+        self.cluster = cluster
+        self.replica_reads = replica_reads
+        self.replica_url = replica_url
+        self.replica_fallback = replica_fallback
+        self.retry_attempts = retry_attempts
+        self.retry_backoff_cap = retry_backoff_cap
         self.session_prefix = "session:"
+        self.checkpoint_prefix = "checkpoint:"
+        self.broadcast_prefix = "broadcast:"
         self.session_ttl = session_ttl
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self.socket_timeout = socket_timeout
+        self.socket_connect_timeout = socket_connect_timeout
+        self.health_check_interval = health_check_interval
+        self.codec = SessionCodec(compress_threshold=compress_threshold)
+        self.layout = layout
+        self.initial_blocks = initial_blocks
+        self.session_cache = SessionCache(max_entries=near_cache_size)
+        self.invalidation_task: Optional[asyncio.Task] = None
+        # Sessions are near-cached only while invalidations can reach this node
+        self.invalidation_listening = False
+        # One pub/sub connection per node, multiplexing the broadcast channels it listens to
+        self.broadcast_subscriber: Optional[Redis] = None
+        self.broadcast_pubsub: Optional[PubSub] = None
+        self.broadcast_reader: Optional[asyncio.Task] = None
+        self.broadcast_listeners: Dict[str, Set[asyncio.Queue]] = {}
+        self.broadcast_lock = asyncio.Lock()
+
+    def _retry(self) -> Retry:
+        # Connection and timeout errors are retried with backoff, which also rides out
+        # a primary failover while the cluster promotes a replica
+        return Retry(
+            ExponentialBackoff(cap=self.retry_backoff_cap, base=0.05),
+            self.retry_attempts,
+        )
+
+    def _connection_kwargs(self) -> Dict[str, Any]:
+        return {
+            "socket_timeout": self.socket_timeout,
+            "socket_connect_timeout": self.socket_connect_timeout,
+            "health_check_interval": self.health_check_interval,
+            "retry": self._retry(),
+        }
+
+    def _blocking_pool(self, url: str) -> BlockingConnectionPool:
+        # Blocking pool: callers wait up to pool_timeout for a free connection
+        # instead of failing when all max_connections are in use
+        return BlockingConnectionPool.from_url(
+            url,
+            max_connections=self.max_connections,
+            timeout=self.pool_timeout,
+            **self._connection_kwargs(),
+        )
 
     async def connect(self):
         try:
-            self.redis_client = redis.from_url(
-                self.redis_url, encoding="utf-8", decode_responses=True
+            if self.cluster:
+                self.redis_client = RedisCluster.from_url(
+                    self.redis_url,
+                    max_connections=self.max_connections,
+                    **self._connection_kwargs(),
+                )
+                if self.replica_reads:
+                    self.read_client = RedisCluster.from_url(
+                        self.redis_url,
+                        max_connections=self.max_connections,
+                        load_balancing_strategy=LoadBalancingStrategy.ROUND_ROBIN_REPLICAS,
+                        **self._connection_kwargs(),
+                    )
+            else:
+                self.connection_pool = self._blocking_pool(self.redis_url)
+                self.redis_client = Redis(connection_pool=self.connection_pool)
+                if self.replica_reads and self.replica_url:
+                    self.read_pool = self._blocking_pool(self.replica_url)
+                    self.read_client = Redis(connection_pool=self.read_pool)
+            await self.redis_client.ping()
+            if self.session_cache.enabled:
+                self.invalidation_task = asyncio.create_task(
+                    self._listen_for_invalidations()
+                )
+            logger.info(
+                f"Successfully connected to Redis {'cluster' if self.cluster else 'server'} "
+                f"(pool of {self.max_connections} connections"
+                f"{', replica reads' if self.read_client else ''})"
             )
-            if self.redis_client:
-                await asyncio.to_thread(self.redis_client.ping)
-            logger.info("Successfully connected to Redis")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
             raise
 
     async def disconnect(self):
+        if self.invalidation_task:
+            self.invalidation_task.cancel()
+            await asyncio.gather(self.invalidation_task, return_exceptions=True)
+            self.invalidation_task = None
+        if self.broadcast_reader:
+            self.broadcast_reader.cancel()
+            await asyncio.gather(self.broadcast_reader, return_exceptions=True)
+            self.broadcast_reader = None
+        await self._close_broadcast_subscriber()
+        if self.read_client:
+            await self.read_client.aclose()
+        if self.read_pool:
+            await self.read_pool.aclose()
         if self.redis_client:
-            await asyncio.to_thread(self.redis_client.close)
+            await self.redis_client.aclose()
+        if self.connection_pool:
+            await self.connection_pool.aclose()
             logger.info("Redis connection closed")
 
     async def store_session(self, llm_response: LLMResponse) -> str:
@@ -45,14 +258,19 @@ class RedisService:
 
         try:
             session_id = str(uuid.uuid4())
-            session_key = f"{self.session_prefix}{session_id}"
+            session_key = self._session_key(session_id)
 
             session_data = self._llm_response_to_dict(llm_response)
 
-            await asyncio.to_thread(
-                self.redis_client.setex,
-                session_key, self.session_ttl, json.dumps(session_data)
-            )
+            if self.layout == self.LAYOUT_HASH:
+                async with self.redis_client.pipeline(transaction=True) as pipe:
+                    pipe.hset(session_key, mapping=self._hash_fields(session_data))
+                    pipe.expire(session_key, self.session_ttl)
+                    await pipe.execute()
+            else:
+                await self.redis_client.setex(
+                    session_key, self.session_ttl, self.codec.encode(session_data)
+                )
 
             logger.info(f"Session {session_id} stored successfully")
             return session_id
@@ -61,7 +279,10 @@ class RedisService:
             logger.error(f"Failed to store session: {e}")
             raise
 
-    async def get_session(self, session_id: str) -> Optional[LLMResponse]:
+    async def fetch_session(
+        self, session_id: str, extend_ttl: Optional[int] = None
+    ) -> Optional[SessionPayload]:
+        """Session for a new connection; with the hash layout only the first initial_blocks blocks are read"""
         if not self.redis_client:
             await self.connect()
 
@@ -69,23 +290,139 @@ class RedisService:
             raise RuntimeError("Failed to establish Redis connection")
 
         try:
-            session_key = f"{self.session_prefix}{session_id}"
-            session_data = await asyncio.to_thread(self.redis_client.get, session_key)
+            session_key = self._session_key(session_id)
+
+            cached = self.session_cache.get(session_id)
+            if cached is not None:
+                # Only the TTL round trip remains; the body is neither transferred nor parsed
+                if extend_ttl:
+                    if not await self.redis_client.expire(session_key, extend_ttl):
+                        self.session_cache.invalidate(session_id)
+                        logger.warning(f"Session {session_id} not found")
+                        return None
+                    self.session_cache.extend(session_id, extend_ttl)
+                logger.info(f"Session {session_id} served from near-cache")
+                return cached.copy()
 
-            if session_data is None:
+            if self.read_client is not None:
+                session = await self._fetch_session_from_replica(
+                    session_id, session_key, extend_ttl
+                )
+            else:
+                session = await self._by_layout(
+                    lambda: self._fetch_blob_session(session_key, extend_ttl),
+                    lambda: self._fetch_hash_session(session_key, extend_ttl),
+                )
+
+            if session is None:
                 logger.warning(f"Session {session_id} not found")
                 return None
 
-            data_dict = json.loads(str(session_data))
-            llm_response = self._dict_to_llm_response(data_dict)
-
             logger.info(f"Session {session_id} retrieved successfully")
-            return llm_response
+            # Cached only with a TTL we just set, so the entry never outlives the key
+            if extend_ttl and self.invalidation_listening:
+                self.session_cache.put(session_id, session, extend_ttl)
+                return session.copy()
+            return session
+
+        except Exception as e:
+            logger.error(f"Failed to retrieve session {session_id}: {e}")
+            raise
+
+    async def _fetch_session_from_replica(
+        self, session_id: str, session_key: str, extend_ttl: Optional[int]
+    ) -> Optional[SessionPayload]:
+        """
+        Reads the session from a replica while the primary extends its TTL. A replica miss
+        for a key the primary has means replication lag, e.g. a session stored moments ago,
+        so it is read again from the primary to keep read-your-writes.
+        """
+        replica_read = self._by_layout(
+            lambda: self._fetch_blob_session(session_key, None, self.read_client),
+            lambda: self._fetch_hash_session(session_key, None, self.read_client),
+        )
+        primary_check = (
+            self.redis_client.expire(session_key, extend_ttl)
+            if extend_ttl
+            else self.redis_client.exists(session_key)
+        )
+        session, exists = await asyncio.gather(
+            replica_read, primary_check, return_exceptions=True
+        )
+
+        if isinstance(exists, Exception):
+            raise exists
+        if not exists:
+            return None
+        if isinstance(session, Exception):
+            if not self.replica_fallback:
+                raise session
+            logger.warning(f"Replica read failed, reading from primary: {session}")
+            session = None
+        if session is None:
+            logger.info(
+                f"Session {session_id} not on replica yet, reading from primary"
+            )
+            session = await self._by_layout(
+                lambda: self._fetch_blob_session(session_key, None),
+                lambda: self._fetch_hash_session(session_key, None),
+            )
+        return session
+
+    async def get_session(
+        self, session_id: str, extend_ttl: Optional[int] = None
+    ) -> Optional[LLMResponse]:
+        """Whole session with every stored block, whatever the layout"""
+        if not self.redis_client:
+            await self.connect()
+
+        if not self.redis_client:
+            raise RuntimeError("Failed to establish Redis connection")
+
+        try:
+            session_key = self._session_key(session_id)
+
+            data = await self._by_layout(
+                lambda: self._read_blob_session(session_key, extend_ttl),
+                lambda: self._read_hash_session(session_key, extend_ttl),
+            )
+
+            if data is None:
+                logger.warning(f"Session {session_id} not found")
+                return None
+
+            return self._dict_to_llm_response(data)
 
         except Exception as e:
             logger.error(f"Failed to retrieve session {session_id}: {e}")
             raise
 
+    async def fetch_blocks(
+        self, session_id: str, start_index: int, count: int
+    ) -> Optional[SessionWindow]:
+        """Musical blocks start_index..start_index+count-1 and the scenes starting inside them"""
+        if not self.redis_client:
+            await self.connect()
+
+        if not self.redis_client:
+            raise RuntimeError("Failed to establish Redis connection")
+
+        try:
+            session_key = self._session_key(session_id)
+
+            window = await self._by_layout(
+                lambda: self._fetch_blob_blocks(session_key, start_index, count),
+                lambda: self._fetch_hash_blocks(session_key, start_index, count),
+            )
+
+            if window is None:
+                logger.warning(f"Session {session_id} not found for block fetch")
+            return window
+
+        except Exception as e:
+            logger.error(f"Failed to fetch blocks for session {session_id}: {e}")
+            raise
+
     async def delete_session(self, session_id: str) -> bool:
         if not self.redis_client:
             await self.connect()
@@ -94,8 +431,9 @@ class RedisService:
             raise RuntimeError("Failed to establish Redis connection")
 
         try:
-            session_key = f"{self.session_prefix}{session_id}"
-            deleted = await asyncio.to_thread(self.redis_client.delete, session_key)
+            session_key = self._session_key(session_id)
+            deleted = await self.redis_client.delete(session_key)
+            await self._invalidate(session_id)
 
             if deleted:
                 logger.info(f"Session {session_id} deleted successfully")
@@ -116,12 +454,13 @@ class RedisService:
             raise RuntimeError("Failed to establish Redis connection")
 
         try:
-            session_key = f"{self.session_prefix}{session_id}"
+            session_key = self._session_key(session_id)
             ttl = ttl or self.session_ttl
 
-            exists = await asyncio.to_thread(self.redis_client.expire, session_key, ttl)
+            exists = await self.redis_client.expire(session_key, ttl)
 
             if exists:
+                self.session_cache.extend(session_id, ttl)
                 logger.info(f"Session {session_id} TTL extended to {ttl} seconds")
                 return True
             else:
@@ -132,47 +471,625 @@ class RedisService:
             logger.error(f"Failed to extend session {session_id} TTL: {e}")
             raise
 
+    async def store_checkpoint(
+        self, session_id: str, resume_token: str, state: Dict[str, Any], ttl: int
+    ) -> None:
+        if not self.redis_client:
+            await self.connect()
+
+        if not self.redis_client:
+            raise RuntimeError("Failed to establish Redis connection")
+
+        try:
+            await self.redis_client.set(
+                self._checkpoint_key(session_id, resume_token),
+                self.codec.encode(state),
+                ex=ttl,
+            )
+            logger.debug(f"Stored playback checkpoint for session {session_id}")
+
+        except Exception as e:
+            logger.error(f"Failed to store checkpoint for session {session_id}: {e}")
+            raise
+
+    async def get_checkpoint(
+        self, session_id: str, resume_token: str
+    ) -> Optional[Dict[str, Any]]:
+        if not self.redis_client:
+            await self.connect()
+
+        if not self.redis_client:
+            raise RuntimeError("Failed to establish Redis connection")
+
+        try:
+            state = await self.redis_client.get(
+                self._checkpoint_key(session_id, resume_token)
+            )
+
+            if state is None:
+                logger.warning(f"No playback checkpoint for session {session_id}")
+                return None
+
+            return self.codec.decode(state)
+
+        except Exception as e:
+            logger.error(f"Failed to retrieve checkpoint for session {session_id}: {e}")
+            raise
+
+    async def claim_broadcast(self, session_id: str, owner_id: str, ttl: int) -> bool:
+        """Takes ownership of a session's music stream unless another connection holds it"""
+        if not self.redis_client:
+            await self.connect()
+
+        try:
+            return bool(
+                await self.redis_client.set(
+                    self._broadcast_owner_key(session_id), owner_id, nx=True, ex=ttl
+                )
+            )
+        except Exception as e:
+            logger.error(f"Failed to claim broadcast for session {session_id}: {e}")
+            raise
+
+    async def refresh_broadcast(self, session_id: str, owner_id: str, ttl: int) -> bool:
+        """Extends ownership, False when it expired and another connection took over"""
+        try:
+            return bool(
+                await self.redis_client.eval(
+                    self.REFRESH_OWNER_SCRIPT,
+                    1,
+                    self._broadcast_owner_key(session_id),
+                    owner_id,
+                    ttl,
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Failed to refresh broadcast for session {session_id}: {e}")
+            return False
+
+    async def release_broadcast(self, session_id: str, owner_id: str) -> None:
+        try:
+            await self.redis_client.eval(
+                self.RELEASE_OWNER_SCRIPT,
+                1,
+                self._broadcast_owner_key(session_id),
+                owner_id,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to release broadcast for session {session_id}: {e}")
+
+    async def broadcast_owned(self, session_id: str) -> bool:
+        if not self.redis_client:
+            await self.connect()
+        return bool(
+            await self.redis_client.exists(self._broadcast_owner_key(session_id))
+        )
+
+    async def publish_broadcast(self, session_id: str, payload: bytes) -> None:
+        await self.redis_client.publish(self._broadcast_channel(session_id), payload)
+
+    async def subscribe_broadcast(self, session_id: str) -> AsyncIterator[bytes]:
+        """
+        Messages published to a session's broadcast channel, until the caller stops.
+        Every channel this node listens to shares one pub/sub connection.
+        """
+        channel = self._broadcast_channel(session_id)
+        messages: asyncio.Queue = asyncio.Queue(self.BROADCAST_BUFFER)
+        await self._join_broadcast_channel(channel, messages)
+        try:
+            while True:
+                message = await messages.get()
+                if isinstance(message, Exception):
+                    raise message
+                yield message
+        finally:
+            await self._leave_broadcast_channel(channel, messages)
+
+    async def _join_broadcast_channel(
+        self, channel: str, messages: asyncio.Queue
+    ) -> None:
+        async with self.broadcast_lock:
+            if self.broadcast_pubsub is None:
+                self.broadcast_subscriber = self._subscriber_client()
+                self.broadcast_pubsub = self.broadcast_subscriber.pubsub(
+                    ignore_subscribe_messages=True
+                )
+            if channel not in self.broadcast_listeners:
+                await self.broadcast_pubsub.subscribe(channel)
+                self.broadcast_listeners[channel] = set()
+            self.broadcast_listeners[channel].add(messages)
+            if self.broadcast_reader is None or self.broadcast_reader.done():
+                self.broadcast_reader = asyncio.create_task(
+                    self._read_broadcasts(self.broadcast_pubsub)
+                )
+
+    async def _leave_broadcast_channel(
+        self, channel: str, messages: asyncio.Queue
+    ) -> None:
+        async with self.broadcast_lock:
+            listeners = self.broadcast_listeners.get(channel)
+            if listeners is None:
+                return
+            listeners.discard(messages)
+            if listeners:
+                return
+            del self.broadcast_listeners[channel]
+            try:
+                await self.broadcast_pubsub.unsubscribe(channel)
+            except Exception as e:
+                logger.warning(f"Failed to unsubscribe from {channel}: {e}")
+
+    async def _read_broadcasts(self, pubsub) -> None:
+        """Hands each broadcast message to the listeners of its channel"""
+        try:
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=None
+                )
+                if message is None:
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode("utf-8")
+                for messages in self.broadcast_listeners.get(channel, ()):
+                    if messages.full():
+                        # A listener that fell behind loses its oldest chunks
+                        messages.get_nowait()
+                    messages.put_nowait(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Broadcast subscription failed: {e}")
+            async with self.broadcast_lock:
+                for listeners in self.broadcast_listeners.values():
+                    for messages in listeners:
+                        messages.put_nowait(e)
+                self.broadcast_listeners.clear()
+                await self._close_broadcast_subscriber()
+
+    async def _close_broadcast_subscriber(self) -> None:
+        pubsub, self.broadcast_pubsub = self.broadcast_pubsub, None
+        subscriber, self.broadcast_subscriber = self.broadcast_subscriber, None
+        if pubsub:
+            await pubsub.aclose()
+        if subscriber:
+            await subscriber.aclose()
+
+    def _key_tag(self, session_id: str) -> str:
+        # In a cluster the braces make every key of a session hash to the same slot
+        return f"{{{session_id}}}" if self.cluster else session_id
+
+    def _session_key(self, session_id: str) -> str:
+        return f"{self.session_prefix}{self._key_tag(session_id)}"
+
+    def _checkpoint_key(self, session_id: str, resume_token: str) -> str:
+        return f"{self.checkpoint_prefix}{self._key_tag(session_id)}:{resume_token}"
+
+    def _broadcast_owner_key(self, session_id: str) -> str:
+        return f"{self.broadcast_prefix}{self._key_tag(session_id)}:owner"
+
+    def _broadcast_channel(self, session_id: str) -> str:
+        return f"{self.broadcast_prefix}{session_id}"
+
+    async def append_musical_blocks(
+        self,
+        session_id: str,
+        musical_blocks: List[MusicBlocks],
+        scene_analysis: List[dict],
+        analysis_complete: bool = True,
+        analysis_error: Optional[str] = None,
+    ) -> bool:
+        if not self.redis_client:
+            await self.connect()
+
+        if not self.redis_client:
+            raise RuntimeError("Failed to establish Redis connection")
+
+        try:
+            session_key = self._session_key(session_id)
+            new_blocks = [self._music_block_to_dict(block) for block in musical_blocks]
+
+            async def _append_blob(pipe) -> bool:
+                session_data = await pipe.get(session_key)
+                if session_data is None:
+                    return False
+
+                data_dict = self.codec.decode(session_data)
+                data_dict["scene_analysis"].extend(scene_analysis)
+                data_dict["master_plan"]["musical_blocks"].extend(new_blocks)
+                data_dict["analysis_complete"] = analysis_complete
+                data_dict["analysis_error"] = analysis_error
+
+                pipe.multi()
+                pipe.set(session_key, self.codec.encode(data_dict), keepttl=True)
+                return True
+
+            async def _append_hash(pipe) -> bool:
+                meta_raw = await pipe.hget(session_key, "meta")
+                if meta_raw is None:
+                    return False
+
+                meta = self.codec.decode(meta_raw)
+                offset = meta["block_count"]
+                grouped = self._group_scenes(new_blocks, scene_analysis)
+
+                scene_fields = {
+                    offset + i: scenes for i, scenes in grouped.items() if i >= 0
+                }
+
+                # Scenes starting before the first new block belong to the last stored one
+                earlier = grouped.get(-1, [])
+                target = max(offset - 1, 0)
+                if earlier or offset == 0:
+                    stored = await pipe.hget(session_key, self._scenes_field(target))
+                    scene_fields[target] = (
+                        (self.codec.decode(stored) if stored else [])
+                        + earlier
+                        + scene_fields.get(target, [])
+                    )
+
+                meta["block_count"] = offset + len(new_blocks)
+                meta["analysis_complete"] = analysis_complete
+                meta["analysis_error"] = analysis_error
+
+                fields = {"meta": self.codec.encode(meta)}
+                for i, block in enumerate(new_blocks):
+                    fields[self._block_field(offset + i)] = self.codec.encode(block)
+                for i, scenes in scene_fields.items():
+                    if scenes:
+                        fields[self._scenes_field(i)] = self.codec.encode(scenes)
+
+                pipe.multi()
+                pipe.hset(session_key, mapping=fields)
+                return True
+
+            appended = await self._by_layout(
+                lambda: self.redis_client.transaction(
+                    _append_blob, session_key, value_from_callable=True
+                ),
+                lambda: self.redis_client.transaction(
+                    _append_hash, session_key, value_from_callable=True
+                ),
+            )
+
+            if appended:
+                await self._invalidate(session_id)
+                logger.info(
+                    f"Appended {len(new_blocks)} musical blocks to session {session_id}"
+                )
+                return True
+            else:
+                logger.warning(f"Session {session_id} not found for block append")
+                return False
+
+        except Exception as e:
+            logger.error(f"Failed to append blocks to session {session_id}: {e}")
+            raise
+
+    async def _invalidate(self, session_id: str) -> None:
+        if not self.session_cache.enabled:
+            return
+        self.session_cache.invalidate(session_id)
+        try:
+            await self.redis_client.publish(self.INVALIDATION_CHANNEL, session_id)
+        except Exception as e:
+            logger.warning(
+                f"Failed to publish invalidation for session {session_id}: {e}"
+            )
+
+    def _subscriber_client(self) -> Redis:
+        """
+        Dedicated connection for the invalidation or broadcast subscriptions: no read
+        timeout, since the channels can stay idle for long, and in a cluster it is a plain client on the seed
+        node because PUBLISH reaches every node over the cluster bus.
+        """
+        return Redis.from_url(
+            self.redis_url,
+            socket_timeout=None,
+            socket_connect_timeout=self.socket_connect_timeout,
+            health_check_interval=self.health_check_interval,
+        )
+
+    async def _listen_for_invalidations(self) -> None:
+        while True:
+            subscriber = self._subscriber_client()
+            pubsub = subscriber.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                # Updates published while unsubscribed were missed, so start cold
+                self.session_cache.clear()
+                self.invalidation_listening = True
+                async for message in pubsub.listen():
+                    session_id = message["data"]
+                    if isinstance(session_id, bytes):
+                        session_id = session_id.decode("utf-8")
+                    if self.session_cache.invalidate(session_id):
+                        logger.debug(
+                            f"Near-cache entry for session {session_id} invalidated"
+                        )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Session invalidation listener failed, retrying: {e}")
+            finally:
+                self.invalidation_listening = False
+                self.session_cache.clear()
+                await pubsub.aclose()
+                await subscriber.aclose()
+            await asyncio.sleep(self.INVALIDATION_RETRY_SECONDS)
+
+    async def _by_layout(
+        self,
+        blob_call: Callable[[], Awaitable[Any]],
+        hash_call: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Runs the call for the configured layout, falling back to the other one for sessions stored before a layout switch"""
+        first, second = (
+            (hash_call, blob_call)
+            if self.layout == self.LAYOUT_HASH
+            else (blob_call, hash_call)
+        )
+        try:
+            return await first()
+        except ResponseError as e:
+            if not str(e).startswith("WRONGTYPE"):
+                raise
+            return await second()
+
+    async def _get_blob(
+        self, session_key: str, extend_ttl: Optional[int], client=None
+    ) -> Optional[bytes]:
+        client = client or self.redis_client
+        if extend_ttl:
+            return await client.getex(session_key, ex=extend_ttl)
+        return await client.get(session_key)
+
+    async def _fetch_blob_session(
+        self, session_key: str, extend_ttl: Optional[int], client=None
+    ) -> Optional[SessionPayload]:
+        session_data = await self._get_blob(session_key, extend_ttl, client)
+        if session_data is None:
+            return None
+        return SessionPayload(self.codec.body(session_data), self._dict_to_llm_response)
+
+    async def _read_blob_session(
+        self, session_key: str, extend_ttl: Optional[int]
+    ) -> Optional[Dict[str, Any]]:
+        session_data = await self._get_blob(session_key, extend_ttl)
+        return None if session_data is None else self.codec.decode(session_data)
+
+    async def _fetch_blob_blocks(
+        self, session_key: str, start_index: int, count: int
+    ) -> Optional[SessionWindow]:
+        data = await self._read_blob_session(session_key, None)
+        if data is None:
+            return None
+
+        all_blocks = data["master_plan"]["musical_blocks"]
+        grouped = self._group_scenes(all_blocks, data["scene_analysis"])
+        grouped[0] = grouped.pop(-1, []) + grouped.get(0, [])
+        end_index = min(start_index + count, len(all_blocks))
+
+        return SessionWindow(
+            start_index=start_index,
+            musical_blocks=all_blocks[start_index:end_index],
+            scene_analysis=[
+                scene
+                for i in range(start_index, end_index)
+                for scene in grouped.get(i, [])
+            ],
+            block_count=len(all_blocks),
+            analysis_complete=data.get("analysis_complete", True),
+            analysis_error=data.get("analysis_error"),
+        )
+
+    async def _fetch_hash_session(
+        self, session_key: str, extend_ttl: Optional[int], client=None
+    ) -> Optional[SessionPayload]:
+        indices = range(self.initial_blocks)
+        fields = (
+            ["meta"]
+            + [self._block_field(i) for i in indices]
+            + [self._scenes_field(i) for i in indices]
+        )
+
+        # One round trip for the first blocks and the TTL extension
+        async with (client or self.redis_client).pipeline(transaction=False) as pipe:
+            pipe.hmget(session_key, fields)
+            if extend_ttl:
+                pipe.expire(session_key, extend_ttl)
+            values = (await pipe.execute())[0]
+
+        if values[0] is None:
+            return None
+
+        meta = self.codec.decode(values[0])
+        blocks = self._leading_bodies(values[1 : 1 + self.initial_blocks])
+        scenes = self._bodies(values[1 + self.initial_blocks :][: len(blocks)])
+
+        # Stored block bodies are spliced into the message as-is instead of being parsed
+        body = orjson.dumps(
+            {
+                "scene_analysis": orjson.Fragment(self._join_arrays(scenes)),
+                "master_plan": {
+                    "global_context": meta["global_context"],
+                    "musical_blocks": [orjson.Fragment(block) for block in blocks],
+                },
+                "analysis_complete": meta["analysis_complete"],
+                "analysis_error": meta.get("analysis_error"),
+                "block_count": meta["block_count"],
+            }
+        )
+        return SessionPayload(body, self._dict_to_llm_response, meta["block_count"])
+
+    async def _read_hash_session(
+        self, session_key: str, extend_ttl: Optional[int]
+    ) -> Optional[Dict[str, Any]]:
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(session_key)
+            if extend_ttl:
+                pipe.expire(session_key, extend_ttl)
+            fields = (await pipe.execute())[0]
+
+        if not fields or b"meta" not in fields:
+            return None
+
+        meta = self.codec.decode(fields[b"meta"])
+        block_count = meta["block_count"]
+        scene_analysis = []
+        for i in range(block_count if block_count else 1):
+            scenes = fields.get(self._scenes_field(i).encode())
+            if scenes:
+                scene_analysis.extend(self.codec.decode(scenes))
+
+        return {
+            "scene_analysis": scene_analysis,
+            "master_plan": {
+                "global_context": meta["global_context"],
+                "musical_blocks": [
+                    self.codec.decode(fields[self._block_field(i).encode()])
+                    for i in range(block_count)
+                ],
+            },
+            "analysis_complete": meta["analysis_complete"],
+            "analysis_error": meta.get("analysis_error"),
+        }
+
+    async def _fetch_hash_blocks(
+        self, session_key: str, start_index: int, count: int
+    ) -> Optional[SessionWindow]:
+        indices = range(start_index, start_index + count)
+        values = await self.redis_client.hmget(
+            session_key,
+            ["meta"]
+            + [self._block_field(i) for i in indices]
+            + [self._scenes_field(i) for i in indices],
+        )
+
+        if values[0] is None:
+            return None
+
+        meta = self.codec.decode(values[0])
+        blocks = self._leading_bodies(values[1 : 1 + count])
+        scenes = self._bodies(values[1 + count :][: len(blocks)])
+
+        return SessionWindow(
+            start_index=start_index,
+            musical_blocks=[orjson.loads(block) for block in blocks],
+            scene_analysis=orjson.loads(self._join_arrays(scenes)),
+            block_count=meta["block_count"],
+            analysis_complete=meta["analysis_complete"],
+            analysis_error=meta.get("analysis_error"),
+        )
+
+    def _leading_bodies(self, values: List[Optional[bytes]]) -> List[bytes]:
+        """JSON bodies of the fields up to the first missing one"""
+        bodies = []
+        for value in values:
+            if value is None:
+                break
+            bodies.append(self.codec.body(value))
+        return bodies
+
+    def _bodies(self, values: List[Optional[bytes]]) -> List[bytes]:
+        return [self.codec.body(value) for value in values if value is not None]
+
+    @staticmethod
+    def _join_arrays(arrays: List[bytes]) -> bytes:
+        items = [array[1:-1] for array in arrays if array != b"[]"]
+        return b"[" + b",".join(items) + b"]"
+
+    @staticmethod
+    def _block_field(index: int) -> str:
+        return f"block:{index}"
+
+    @staticmethod
+    def _scenes_field(index: int) -> str:
+        return f"scenes:{index}"
+
+    @staticmethod
+    def _group_scenes(
+        blocks: List[Dict[str, Any]], scenes: List[dict]
+    ) -> Dict[int, List[dict]]:
+        """Scenes keyed by the index of the block they start in, -1 for scenes before the first block"""
+        starts = [float(block["time_range"].get("start", 0.0)) for block in blocks]
+        grouped: Dict[int, List[dict]] = {}
+        for scene in scenes:
+            index = bisect_right(starts, float(scene.get("start_time", 0.0))) - 1
+            grouped.setdefault(index, []).append(scene)
+        return grouped
+
+    def _hash_fields(self, data: Dict[str, Any]) -> Dict[str, bytes]:
+        blocks = data["master_plan"]["musical_blocks"]
+        grouped = self._group_scenes(blocks, data["scene_analysis"])
+        grouped[0] = grouped.pop(-1, []) + grouped.get(0, [])
+
+        fields = {
+            "meta": self.codec.encode(
+                {
+                    "global_context": data["master_plan"]["global_context"],
+                    "analysis_complete": data["analysis_complete"],
+                    "analysis_error": data.get("analysis_error"),
+                    "block_count": len(blocks),
+                }
+            )
+        }
+        for i, block in enumerate(blocks):
+            fields[self._block_field(i)] = self.codec.encode(block)
+        for i, scenes in grouped.items():
+            if scenes:
+                fields[self._scenes_field(i)] = self.codec.encode(scenes)
+        return fields
+
+    def _music_block_to_dict(self, block: MusicBlocks) -> Dict[str, Any]:
+        return {
+            "time_range": block.time_range,
+            "musical_direction": block.musical_direction,
+            "transition": block.transition,
+            "gain": block.gain,
+            "lyria_config": {
+                "prompt": block.lyria_config.prompt,
+                "bpm": block.lyria_config.bpm,
+                "scale": block.lyria_config.scale,
+                "weight": block.lyria_config.weight,
+            },
+        }
+
     def _llm_response_to_dict(self, llm_response: LLMResponse) -> Dict[str, Any]:
         return {
             "scene_analysis": llm_response.scene_analysis,
             "master_plan": {
                 "global_context": llm_response.master_plan.global_context,
                 "musical_blocks": [
-                    {
-                        "time_range": block.time_range,
-                        "musical_direction": block.musical_direction,
-                        "transition": block.transition,
-                        "gain": block.gain,
-                        "lyria_config": {
-                            "prompt": block.lyria_config.prompt,
-                            "bpm": block.lyria_config.bpm,
-                            "scale": block.lyria_config.scale,
-                            "weight": block.lyria_config.weight,
-                        },
-                    }
+                    self._music_block_to_dict(block)
                     for block in llm_response.master_plan.musical_blocks
                 ],
             },
+            "analysis_complete": llm_response.analysis_complete,
+            "analysis_error": llm_response.analysis_error,
         }
 
-    def _dict_to_llm_response(self, data: Dict[str, Any]) -> LLMResponse:
-        musical_blocks = []
-        for block_data in data["master_plan"]["musical_blocks"]:
-            lyria_config = LyriaConfig(
-                prompt=block_data["lyria_config"]["prompt"],
-                bpm=block_data["lyria_config"]["bpm"],
-                scale=block_data["lyria_config"]["scale"],
-                weight=block_data["lyria_config"]["weight"],
-            )
+    def _dict_to_music_block(self, block_data: Dict[str, Any]) -> MusicBlocks:
+        lyria_config = LyriaConfig(
+            prompt=block_data["lyria_config"]["prompt"],
+            bpm=block_data["lyria_config"]["bpm"],
+            scale=block_data["lyria_config"]["scale"],
+            weight=block_data["lyria_config"]["weight"],
+        )
 
-            music_block = MusicBlocks(
-                time_range=block_data["time_range"],
-                musical_direction=block_data["musical_direction"],
-                transition=block_data["transition"],
-                gain=block_data["gain"],
-                lyria_config=lyria_config,
-            )
-            musical_blocks.append(music_block)
+        return MusicBlocks(
+            time_range=block_data["time_range"],
+            musical_direction=block_data["musical_direction"],
+            transition=block_data["transition"],
+            gain=block_data["gain"],
+            lyria_config=lyria_config,
+        )
+
+    def _dict_to_llm_response(self, data: Dict[str, Any]) -> LLMResponse:
+        musical_blocks = [
+            self._dict_to_music_block(block_data)
+            for block_data in data["master_plan"]["musical_blocks"]
+        ]
 
         master_plan = MasterPlan(
             global_context=data["master_plan"]["global_context"],
@@ -182,4 +1099,6 @@ class RedisService:
         return LLMResponse(
             scene_analysis=data["scene_analysis"],
             master_plan=master_plan,
+            analysis_complete=data.get("analysis_complete", True),
+            analysis_error=data.get("analysis_error"),
         )
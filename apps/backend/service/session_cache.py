@@ -0,0 +1,59 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+
+class SessionCache:
+    """Bounded LRU of parsed sessions, each entry expiring with the Redis TTL it was read under"""
+
+    def __init__(
+        self, max_entries: int = 256, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_entries = max_entries
+        self.clock = clock
+        self.entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, session_id: str) -> Optional[Any]:
+        entry = self.entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self.entries[session_id]
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(session_id)
+        self.hits += 1
+        return value
+
+    def put(self, session_id: str, value: Any, ttl: float) -> None:
+        if not self.enabled:
+            return
+
+        self.entries[session_id] = (self.clock() + ttl, value)
+        self.entries.move_to_end(session_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def extend(self, session_id: str, ttl: float) -> None:
+        entry = self.entries.get(session_id)
+        if entry is not None:
+            self.entries[session_id] = (self.clock() + ttl, entry[1])
+
+    def invalidate(self, session_id: str) -> bool:
+        return self.entries.pop(session_id, None) is not None
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,72 @@
+from typing import Any, Dict, Union
+import orjson
+from shared.logging import get_logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = get_logger(__name__)
+
+
+class SessionCodec:
+    """
+    Binary session format: MAGIC, schema version byte, flags byte, then the orjson body,
+    zstd compressed when FLAG_ZSTD is set. Values starting with "{" are legacy JSON sessions.
+    """
+
+    MAGIC = b"TS"
+    SCHEMA_VERSION = 1
+    FLAG_ZSTD = 0x01
+    HEADER_SIZE = len(MAGIC) + 2
+
+    def __init__(self, compress_threshold: int = 4096, compression_level: int = 3):
+        self.compress_threshold = compress_threshold
+        self.compression_level = compression_level
+        if compress_threshold > 0 and zstandard is None:
+            logger.info("zstandard not installed, sessions are stored uncompressed")
+
+    def encode(self, data: Dict[str, Any]) -> bytes:
+        body = orjson.dumps(data)
+        flags = 0
+
+        if zstandard is not None and 0 < self.compress_threshold <= len(body):
+            compressed = zstandard.ZstdCompressor(
+                level=self.compression_level
+            ).compress(body)
+            if len(compressed) < len(body):
+                body = compressed
+                flags |= self.FLAG_ZSTD
+
+        return self.MAGIC + bytes((self.SCHEMA_VERSION, flags)) + body
+
+    def decode(self, raw: Union[bytes, str]) -> Dict[str, Any]:
+        return orjson.loads(self.body(raw))
+
+    def body(self, raw: Union[bytes, str]) -> bytes:
+        """JSON bytes of the stored session, without parsing them"""
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+
+        if raw[:1] == b"{":
+            return raw
+
+        if raw[: len(self.MAGIC)] != self.MAGIC or len(raw) < self.HEADER_SIZE:
+            raise ValueError("Unrecognized session encoding")
+
+        version, flags = raw[len(self.MAGIC)], raw[len(self.MAGIC) + 1]
+        if version > self.SCHEMA_VERSION:
+            raise ValueError(
+                f"Session schema version {version} is newer than supported {self.SCHEMA_VERSION}"
+            )
+
+        body = raw[self.HEADER_SIZE :]
+        if flags & self.FLAG_ZSTD:
+            if zstandard is None:
+                raise ValueError(
+                    "Session is zstd compressed but zstandard is not installed"
+                )
+            body = zstandard.ZstdDecompressor().decompress(body)
+
+        return body
@@ -0,0 +1,233 @@
+import asyncio
+import struct
+import subprocess
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from service.lyria.audio_encoder import (
+    AudioEncoder,
+    AudioFormat,
+    OggPacketReader,
+    opus_packet_frames,
+)
+
+PCM = b"\x01\x00" * 2 * 4800
+OPUS_HEAD = b"OpusHead" + struct.pack("<BBHIhB", 1, 2, 312, 48000, 0, 0)
+# TOC of a 20 ms fullband CELT frame
+OPUS_PACKET = b"\xf8" + b"\x00" * 10
+
+
+@pytest.fixture
+def ffmpeg_available():
+    with patch(
+        "service.lyria.audio_encoder.shutil.which", return_value="/usr/bin/ffmpeg"
+    ):
+        yield
+
+
+def _header(frame):
+    return AudioEncoder.FRAME_HEADER.unpack_from(frame)
+
+
+def _ogg_page(packets):
+    lacing = []
+    for packet in packets:
+        lacing += [255] * (len(packet) // 255) + [len(packet) % 255]
+    header = OggPacketReader.PAGE_HEADER.pack(b"OggS", 0, 0, 0, 1, 0, 0, len(lacing))
+    return header + bytes(lacing) + b"".join(packets)
+
+
+def _payload_packets(frame):
+    payload = frame[AudioEncoder.FRAME_HEADER.size :]
+    packets = []
+    while payload:
+        (length,) = struct.unpack_from("<H", payload)
+        packets.append(payload[2 : 2 + length])
+        payload = payload[2 + length :]
+    return packets
+
+
+class FakeFfmpeg:
+    """Stands in for the Opus ffmpeg: one 20 ms packet per 960 frames written"""
+
+    def __init__(self):
+        self.stdout = asyncio.StreamReader()
+        self.stdout.feed_data(_ogg_page([OPUS_HEAD, b"OpusTags"]))
+        self.stdin = MagicMock()
+        self.stdin.write = self._write
+        self.stdin.drain = AsyncMock()
+        self.stdin.close = self.stdout.feed_eof
+        self.returncode = None
+        self.pending = 0
+
+    def _write(self, pcm):
+        self.pending += len(pcm) // 4
+        packets = [OPUS_PACKET] * (self.pending // 960)
+        self.pending %= 960
+        self.stdout.feed_data(_ogg_page(packets))
+
+    async def wait(self):
+        self.returncode = 0
+        return 0
+
+    def kill(self):
+        pass
+
+
+class TestAudioFormat:
+
+    def test_negotiates_requested_format(self, ffmpeg_available):
+        audio_format = AudioFormat.negotiate(
+            {"encoding": "OPUS", "sample_rate": 24000, "channels": 1}
+        )
+
+        assert audio_format == AudioFormat("opus", 24000, 1, 64000)
+
+    def test_unsupported_values_fall_back_to_source(self, ffmpeg_available):
+        audio_format = AudioFormat.negotiate(
+            {"encoding": "mp3", "sample_rate": 44100, "channels": 6}
+        )
+
+        assert audio_format.is_source
+
+    def test_invalid_numbers_fall_back_to_source(self, ffmpeg_available):
+        audio_format = AudioFormat.negotiate({"encoding": "flac", "sample_rate": "x"})
+
+        assert audio_format == AudioFormat("flac")
+
+    def test_bitrate_is_clamped(self, ffmpeg_available):
+        assert AudioFormat.negotiate({"bitrate": 1}).bitrate == 16000
+        assert AudioFormat.negotiate({"bitrate": 10**7}).bitrate == 256000
+
+    def test_without_ffmpeg_only_source_pcm(self):
+        with patch("service.lyria.audio_encoder.shutil.which", return_value=None):
+            audio_format = AudioFormat.negotiate({"encoding": "opus"})
+
+        assert audio_format == AudioFormat()
+
+
+class TestAudioEncoder:
+
+    def test_source_pcm_is_framed_without_ffmpeg(self):
+        encoder = AudioEncoder(AudioFormat())
+
+        with patch("service.lyria.audio_encoder.subprocess.run") as run:
+            frame = asyncio.run(
+                encoder.encode(memoryview(PCM), sequence=3, timestamp=96000)
+            )
+
+        run.assert_not_called()
+        assert _header(frame) == (3, 0, 2, 0, 48000, 4800, 3, 96000)
+        assert frame[AudioEncoder.FRAME_HEADER.size :] == PCM
+
+    def test_ffmpeg_command_for_opus(self):
+        encoder = AudioEncoder(AudioFormat("opus", 24000, 1, 32000))
+
+        command = encoder.command
+        assert command[command.index("-i") + 1] == "pipe:0"
+        assert command[command.index("-c:a") + 1] == "libopus"
+        assert command[command.index("-b:a") + 1] == "32000"
+        assert command[-3:] == ["-f", "ogg", "pipe:1"]
+        assert "24000" in command and "1" in command
+
+    def test_encoded_frame_reports_output_frames(self):
+        encoder = AudioEncoder(AudioFormat("flac", 16000, 1))
+        result = MagicMock(stdout=b"fLaC-data")
+
+        with patch(
+            "service.lyria.audio_encoder.subprocess.run", return_value=result
+        ) as run:
+            frame = asyncio.run(encoder.encode(PCM, sequence=7, timestamp=4800))
+
+        assert run.call_args.kwargs["input"] == PCM
+        assert _header(frame) == (3, 2, 1, 0, 16000, 1600, 7, 4800)
+        assert frame[AudioEncoder.FRAME_HEADER.size :] == b"fLaC-data"
+
+    def test_encoding_failure_sends_source_pcm(self):
+        encoder = AudioEncoder(AudioFormat("flac"))
+        error = subprocess.CalledProcessError(1, "ffmpeg", stderr=b"boom")
+
+        with patch("service.lyria.audio_encoder.subprocess.run", side_effect=error):
+            frame = encoder.encode_sync(PCM)
+
+        assert _header(frame)[1] == 0
+        assert frame[AudioEncoder.FRAME_HEADER.size :] == PCM
+
+
+class TestOpusStream:
+
+    @pytest.mark.parametrize(
+        "packet,frames",
+        [(b"\xf8", 960), (b"\x18", 2880), (b"\x79", 1920), (b"\xfb\x03", 2880)],
+    )
+    def test_packet_duration_from_toc(self, packet, frames):
+        assert opus_packet_frames(packet) == frames
+
+    def test_ogg_packets_split_across_pages_and_reads(self):
+        reader = OggPacketReader()
+        long_packet = bytes(range(256)) * 2
+        first = OggPacketReader.PAGE_HEADER.pack(b"OggS", 0, 0, 0, 1, 0, 0, 2)
+        first += bytes([255, 255]) + long_packet[:510]
+        data = first + _ogg_page([long_packet[510:], b"next"])
+
+        packets = reader.feed(data[:40]) + reader.feed(data[40:])
+
+        assert packets == [long_packet, b"next"]
+
+    def test_one_encoder_spans_contiguous_chunks(self):
+        encoder = AudioEncoder(AudioFormat("opus"))
+
+        async def run():
+            with patch(
+                "service.lyria.audio_encoder.asyncio.create_subprocess_exec",
+                AsyncMock(side_effect=lambda *a, **k: FakeFfmpeg()),
+            ) as spawn:
+                first = await encoder.encode(PCM, sequence=0, timestamp=96000)
+                second = await encoder.encode(PCM, sequence=1, timestamp=100800)
+                await encoder.close()
+            return spawn, first, second
+
+        spawn, first, second = asyncio.run(run())
+
+        spawn.assert_awaited_once()
+        assert _header(first) == (3, 1, 2, 1, 48000, 4800, 0, 96000)
+        assert _payload_packets(first) == [OPUS_HEAD] + [OPUS_PACKET] * 5
+        # Later chunks continue the stream, placed after the encoder's pre-skip
+        assert _header(second) == (3, 1, 2, 0, 48000, 4800, 1, 96000 + 4800 - 312)
+        assert _payload_packets(second) == [OPUS_PACKET] * 5
+
+    def test_gap_starts_a_new_stream(self):
+        encoder = AudioEncoder(AudioFormat("opus"))
+
+        async def run():
+            with patch(
+                "service.lyria.audio_encoder.asyncio.create_subprocess_exec",
+                AsyncMock(side_effect=lambda *a, **k: FakeFfmpeg()),
+            ) as spawn:
+                await encoder.encode(PCM, sequence=0, timestamp=0)
+                frame = await encoder.encode(PCM, sequence=2, timestamp=9600)
+                await encoder.close()
+            return spawn, frame
+
+        spawn, frame = asyncio.run(run())
+
+        assert spawn.await_count == 2
+        assert _header(frame)[3] == AudioEncoder.FLAG_STREAM_START
+        assert _header(frame)[7] == 9600
+
+    def test_stream_failure_falls_back_to_pcm(self):
+        encoder = AudioEncoder(AudioFormat("opus"))
+
+        async def run():
+            with patch(
+                "service.lyria.audio_encoder.asyncio.create_subprocess_exec",
+                AsyncMock(side_effect=FileNotFoundError("ffmpeg")),
+            ) as spawn:
+                first = await encoder.encode(PCM, sequence=0, timestamp=0)
+                second = await encoder.encode(PCM, sequence=1, timestamp=4800)
+            return spawn, first, second
+
+        spawn, first, second = asyncio.run(run())
+
+        spawn.assert_awaited_once()
+        assert _header(first)[1] == _header(second)[1] == 0
+        assert second[AudioEncoder.FRAME_HEADER.size :] == PCM
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from service.lyria.audio_queue import AudioQueue, QueuedChunk
+
+
+def _chunk(i, seconds=2.0):
+    return QueuedChunk(bytes([i]), seconds, 1.0)
+
+
+class TestAudioQueue:
+
+    def test_rejects_unknown_policy(self):
+        with pytest.raises(ValueError):
+            AudioQueue(policy="block")
+
+    def test_drop_oldest_keeps_newest_chunks(self):
+        queue = AudioQueue(max_chunks=2, policy=AudioQueue.POLICY_DROP_OLDEST)
+
+        for i in range(4):
+            queue.put(_chunk(i))
+
+        assert [c.audio_data for c in queue.chunks] == [b"\x02", b"\x03"]
+        assert queue.dropped == 2
+        assert queue.buffered_seconds == 4.0
+        assert queue.stats()["enqueued"] == 4
+
+    def test_pause_policy_keeps_every_chunk(self):
+        queue = AudioQueue(max_chunks=2, policy=AudioQueue.POLICY_PAUSE)
+
+        for i in range(3):
+            queue.put(_chunk(i))
+
+        assert queue.depth == 3
+        assert queue.above_high_watermark
+        assert queue.dropped == 0
+        assert queue.max_depth == 3
+
+    def test_get_waits_for_put(self):
+        async def run():
+            queue = AudioQueue()
+            getter = asyncio.create_task(queue.get())
+            await asyncio.sleep(0)
+            assert not getter.done()
+
+            queue.put(_chunk(1))
+            return await getter
+
+        assert asyncio.run(run()).audio_data == b"\x01"
+
+    def test_close_drains_then_returns_none(self):
+        async def run():
+            queue = AudioQueue()
+            queue.put(_chunk(1))
+            queue.close()
+            return [await queue.get(), await queue.get()]
+
+        first, second = asyncio.run(run())
+        assert first.audio_data == b"\x01"
+        assert second is None
+
+    def test_wait_for_buffered_seconds(self):
+        async def run():
+            queue = AudioQueue()
+            waiter = asyncio.create_task(queue.wait_for(3.0))
+            queue.put(_chunk(1))
+            await asyncio.sleep(0)
+            assert not waiter.done()
+
+            queue.put(_chunk(2))
+            await asyncio.wait_for(waiter, 1)
+            return queue.buffered_seconds
+
+        assert asyncio.run(run()) == 4.0
+
+    def test_wait_for_space_until_a_chunk_is_taken(self):
+        async def run():
+            queue = AudioQueue(max_chunks=1)
+            queue.put(_chunk(0))
+            waiter = asyncio.create_task(queue.wait_for_space())
+            await asyncio.sleep(0)
+            assert not waiter.done()
+            await queue.get()
+            await asyncio.wait_for(waiter, 1)
+
+        asyncio.run(run())
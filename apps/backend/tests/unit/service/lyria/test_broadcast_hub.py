@@ -0,0 +1,178 @@
+import asyncio
+import subprocess
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from service.lyria.audio_queue import QueuedChunk
+from service.lyria.broadcast_hub import BroadcastHub
+from service.redis_service import RedisService
+
+
+def _chunk(sequence, timestamp=0):
+    return QueuedChunk(b"\x01" * 48000 * 4, 1.0, 0.5, sequence, timestamp)
+
+
+class FakeChannel:
+    """In-memory stand-in for a session's Redis channel"""
+
+    def __init__(self):
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, session_id):
+        while True:
+            yield await self.messages.get()
+
+
+@pytest.fixture
+def redis_service():
+    service = MagicMock(spec=RedisService)
+    service.claim_broadcast = AsyncMock(return_value=True)
+    service.refresh_broadcast = AsyncMock(return_value=True)
+    service.release_broadcast = AsyncMock()
+    service.publish_broadcast = AsyncMock()
+    return service
+
+
+class TestBroadcastHub:
+
+    def test_frames_round_trip(self, redis_service):
+        hub = BroadcastHub(redis_service, compress=False)
+
+        async def run():
+            decoded = await hub.decode(await hub.encode(_chunk(3, 96000)))
+            return decoded, await hub.decode(await hub.encode(None))
+
+        (kind, node_id, chunk), (end_kind, _, end) = asyncio.run(run())
+
+        assert (kind, end_kind) == (BroadcastHub.KIND_CHUNK, BroadcastHub.KIND_END)
+        assert node_id == hub.node_id
+        assert (chunk.sequence, chunk.timestamp, chunk.gain) == (3, 96000, 0.5)
+        assert chunk.seconds == 1.0
+        assert end is None
+
+    def test_chunks_cross_redis_as_flac(self, redis_service):
+        pcm = _chunk(0).audio_data
+
+        def ffmpeg(command, input, **kwargs):
+            encoding = "flac" in command[command.index("-i") + 1 :]
+            return MagicMock(stdout=b"fLaC" if encoding else pcm)
+
+        with patch("service.lyria.broadcast_hub.shutil.which", return_value="ffmpeg"):
+            hub = BroadcastHub(redis_service)
+
+        async def run():
+            payload = await hub.encode(_chunk(0))
+            return payload, await hub.decode(payload)
+
+        with patch("service.lyria.broadcast_hub.subprocess.run", side_effect=ffmpeg):
+            payload, (_, _, chunk) = asyncio.run(run())
+
+        assert payload[BroadcastHub.FRAME_HEADER.size :] == b"fLaC"
+        assert chunk.audio_data == pcm and chunk.seconds == 1.0
+
+    def test_failed_encode_publishes_pcm(self, redis_service):
+        error = subprocess.CalledProcessError(1, "ffmpeg")
+        with patch("service.lyria.broadcast_hub.shutil.which", return_value="ffmpeg"):
+            hub = BroadcastHub(redis_service)
+
+        with patch("service.lyria.broadcast_hub.subprocess.run", side_effect=error):
+            payload = asyncio.run(hub.encode(_chunk(0)))
+
+        _, _, chunk = asyncio.run(hub.decode(payload))
+        assert chunk.audio_data == _chunk(0).audio_data
+
+    def test_second_connection_does_not_own(self, redis_service):
+        redis_service.claim_broadcast = AsyncMock(side_effect=[True, False])
+        hub = BroadcastHub(redis_service)
+
+        async def run():
+            owner = await hub.claim("abc")
+            other = await hub.claim("abc")
+            await owner.close()
+            return owner, other
+
+        owner, other = asyncio.run(run())
+
+        assert owner is not None and other is None
+        redis_service.release_broadcast.assert_awaited_once_with("abc", owner.owner_id)
+
+    def test_owner_reaches_local_and_remote_listeners(self, redis_service):
+        channel = FakeChannel()
+        redis_service.subscribe_broadcast = channel.subscribe
+        hub = BroadcastHub(redis_service)
+
+        async def run():
+            listener = hub.listen("abc")
+            owner = await hub.claim("abc")
+            owner.publish(_chunk(0))
+            await owner.close()
+            return listener
+
+        listener = asyncio.run(run())
+
+        assert [c.sequence for c in listener.chunks] == [0]
+        assert listener.closed
+        payloads = [c.args[1] for c in redis_service.publish_broadcast.await_args_list]
+        decoded = [asyncio.run(hub.decode(payload))[2] for payload in payloads]
+        assert decoded[0].sequence == 0 and decoded[1] is None
+
+    def test_listeners_receive_other_nodes_and_skip_their_own(self, redis_service):
+        channel = FakeChannel()
+        redis_service.subscribe_broadcast = channel.subscribe
+        hub = BroadcastHub(redis_service)
+        remote = BroadcastHub(redis_service)
+
+        async def run():
+            listener = hub.listen("abc")
+            channel.messages.put_nowait(await hub.encode(_chunk(0)))
+            channel.messages.put_nowait(await remote.encode(_chunk(1, 48000)))
+            channel.messages.put_nowait(await remote.encode(None))
+            chunks = []
+            while (chunk := await listener.get()) is not None:
+                chunks.append(chunk)
+            hub.leave("abc", listener)
+            return chunks
+
+        chunks = asyncio.run(run())
+
+        assert [c.timestamp for c in chunks] == [48000]
+        assert hub.sessions == {}
+
+    def test_lost_ownership_stops_publishing(self, redis_service):
+        redis_service.refresh_broadcast = AsyncMock(return_value=False)
+        hub = BroadcastHub(redis_service, owner_ttl=0)
+
+        async def run():
+            owner = await hub.claim("abc")
+            await asyncio.sleep(0.01)
+            owner.publish(_chunk(0))
+            await owner.close()
+            return owner
+
+        owner = asyncio.run(run())
+
+        assert owner.lost
+        redis_service.publish_broadcast.assert_not_called()
+        redis_service.release_broadcast.assert_not_called()
+
+    def test_paused_owner_tells_other_nodes(self, redis_service):
+        channel = FakeChannel()
+        redis_service.subscribe_broadcast = channel.subscribe
+        hub = BroadcastHub(redis_service, compress=False)
+        remote = BroadcastHub(redis_service, compress=False)
+
+        async def run():
+            owner = await remote.claim("abc")
+            await owner.set_paused(True)
+            listener = hub.listen("abc")
+            for call in redis_service.publish_broadcast.await_args_list:
+                channel.messages.put_nowait(call.args[1])
+            await asyncio.sleep(0.01)
+            paused = hub.sessions["abc"].paused
+            channel.messages.put_nowait(await remote.encode(None))
+            await listener.get()
+            owner.refresh_task.cancel()
+            return paused, hub.sessions["abc"].paused
+
+        paused, after_end = asyncio.run(run())
+
+        assert paused and not after_end
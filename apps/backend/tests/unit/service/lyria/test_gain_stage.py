@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from service.lyria.gain_stage import GainStage
+
+
+def _pcm(frames, value=1000):
+    return np.full(frames * 2, value, dtype=np.int16).tobytes()
+
+
+def _samples(view):
+    return np.frombuffer(view, dtype=np.int16).copy()
+
+
+class TestGainStage:
+
+    def test_unity_gain_passes_input_through(self):
+        stage = GainStage(1.0)
+        data = _pcm(4)
+
+        view = stage.process(data)
+
+        assert view.obj is data
+
+    def test_constant_gain_matches_scaled_samples(self):
+        stage = GainStage(0.5)
+
+        samples = _samples(stage.process(_pcm(480, 1001)))
+
+        assert samples.tolist() == [500] * 960
+
+    def test_clips_to_int16_range(self):
+        stage = GainStage(4.0)
+
+        samples = _samples(stage.process(_pcm(2, 20000) + _pcm(2, -20000)))
+
+        assert samples.tolist() == [32767] * 4 + [-32768] * 4
+
+    def test_buffers_are_reused_between_chunks(self):
+        stage = GainStage(0.5)
+        stage.process(_pcm(480))
+        output = stage.output
+
+        stage.process(_pcm(240))
+
+        assert stage.output is output
+
+    def test_ramp_spreads_gain_change_across_frames(self):
+        stage = GainStage(1.0, ramp_seconds=100 / GainStage.SAMPLE_RATE)
+        stage.ramp_to(0.0)
+
+        first = _samples(stage.process(_pcm(60, 10000))).reshape(-1, 2)
+        second = _samples(stage.process(_pcm(60, 10000))).reshape(-1, 2)
+
+        assert (first[:, 0] == first[:, 1]).all()
+        assert (np.diff(first[:, 0]) < 0).all()
+        assert first[0, 0] == 9900
+        assert second[39, 0] == 0
+        assert (second[40:] == 0).all()
+        assert not stage.ramping
+
+    def test_ramp_restarts_from_current_gain(self):
+        stage = GainStage(1.0, ramp_seconds=100 / GainStage.SAMPLE_RATE)
+        stage.ramp_to(0.0)
+        stage.process(_pcm(50))
+
+        stage.ramp_to(1.0)
+
+        assert stage.ramp_start == pytest.approx(0.5)
+        assert stage.current_gain() == pytest.approx(0.5)
+
+    def test_set_gain_skips_ramp(self):
+        stage = GainStage(1.0)
+
+        stage.set_gain(0.25)
+
+        assert not stage.ramping
+        assert _samples(stage.process(_pcm(1, 400))).tolist() == [100, 100]
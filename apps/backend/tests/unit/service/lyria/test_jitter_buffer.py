@@ -0,0 +1,94 @@
+import pytest
+from unittest.mock import patch
+from service.lyria.jitter_buffer import JitterBuffer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def fresh_node():
+    with patch.object(JitterBuffer, "node_target", None):
+        yield
+
+
+class TestJitterBuffer:
+
+    def test_initial_target_until_measured(self, clock):
+        jitter = JitterBuffer(initial=2.5, clock=clock)
+
+        jitter.chunk_arrived(2.0)
+
+        assert jitter.target == 2.5
+
+    def test_steady_fast_client_needs_no_prebuffer(self, clock):
+        jitter = JitterBuffer(initial=3.0, clock=clock)
+
+        for _ in range(20):
+            jitter.chunk_arrived(2.0)
+            jitter.chunk_sent(0.001)
+            clock.now += 2.0
+
+        assert jitter.arrival_jitter == 0.0
+        assert jitter.target < 0.01
+
+    def test_jittery_arrivals_grow_target(self, clock):
+        jitter = JitterBuffer(clock=clock)
+
+        for i in range(40):
+            jitter.chunk_arrived(2.0)
+            jitter.chunk_sent(0.001)
+            clock.now += 1.0 if i % 2 else 3.0
+
+        assert jitter.arrival_jitter == pytest.approx(1.0, abs=0.1)
+        assert jitter.target == pytest.approx(4.0, abs=0.5)
+
+    def test_slow_sends_grow_target(self, clock):
+        jitter = JitterBuffer(clock=clock)
+
+        for send in (0.2, 1.5, 0.3, 1.2):
+            jitter.chunk_sent(send)
+
+        assert jitter.target > 1.5
+
+    def test_target_is_capped(self, clock):
+        jitter = JitterBuffer(clock=clock)
+
+        jitter.chunk_sent(30.0)
+
+        assert jitter.target == JitterBuffer.MAX_PREBUFFER
+
+    def test_fresh_node_seeds_default_prebuffer(self, clock):
+        jitter = JitterBuffer(clock=clock)
+
+        assert jitter.target == JitterBuffer.DEFAULT_PREBUFFER == 1.0
+
+    def test_measured_streams_seed_the_next_one(self, clock):
+        for send in (0.5, 1.5):
+            jitter = JitterBuffer(clock=clock)
+            jitter.chunk_sent(send)
+            jitter.settle()
+
+        first = 0.5 + 4 * 0.25
+        second = 1.5 + 4 * 0.75
+        assert JitterBuffer.node_target == pytest.approx(
+            first + (second - first) * JitterBuffer.NODE_GAIN
+        )
+        assert JitterBuffer(clock=clock).target == JitterBuffer.node_target
+
+    def test_unmeasured_stream_leaves_node_estimate(self, clock):
+        JitterBuffer.node_target = 1.0
+
+        JitterBuffer(initial=5.0, clock=clock).settle()
+
+        assert JitterBuffer.node_target == 1.0
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+from models.lyria_config import LyriaConfig
+from service.lyria.lyria_pool import LyriaSessionPool
+
+
+@pytest.fixture
+def lyria_config():
+    return LyriaConfig(prompt="piano", bpm=90, scale="C_MAJOR_A_MINOR", weight=1.0)
+
+
+class FakeLyria:
+    """Stands in for client.aio.live.music.connect, recording opened and closed sessions"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.opened = []
+        self.closed = []
+
+    @asynccontextmanager
+    async def connect(self, model):
+        if self.fail:
+            raise ConnectionError("unavailable")
+        session = AsyncMock()
+        self.opened.append(session)
+        try:
+            yield session
+        finally:
+            self.closed.append(session)
+
+
+def make_pool(lyria, **kwargs):
+    pool = LyriaSessionPool(**kwargs)
+    pool._client = MagicMock()
+    pool._client.aio.live.music.connect = lyria.connect
+    return pool
+
+
+class TestLyriaSessionPool:
+
+    def test_client_is_created_once(self):
+        pool = LyriaSessionPool()
+
+        with patch.dict("os.environ", {"GOOGLE_API_KEY": "test"}), patch(
+            "service.lyria.lyria_pool.genai.Client"
+        ) as client:
+            assert pool.client is pool.client
+
+        client.assert_called_once()
+
+    def test_take_returns_primed_session(self, lyria_config):
+        lyria = FakeLyria()
+        pool = make_pool(lyria)
+
+        async def run():
+            pool.prewarm("abc", lyria_config)
+            pool.prewarm("abc", lyria_config)
+            return await pool.take("abc")
+
+        prewarmed = asyncio.run(run())
+
+        assert len(lyria.opened) == 1
+        assert prewarmed.session is lyria.opened[0]
+        prewarmed.session.set_weighted_prompts.assert_awaited_once()
+        prewarmed.session.set_music_generation_config.assert_awaited_once()
+        assert prewarmed.lyria_config == lyria_config
+        assert pool.hits == 1
+
+    def test_take_without_prewarm_misses(self):
+        pool = make_pool(FakeLyria())
+
+        assert asyncio.run(pool.take("abc")) is None
+        assert pool.misses == 1
+
+    def test_failed_warm_misses(self, lyria_config):
+        pool = make_pool(FakeLyria(fail=True))
+
+        async def run():
+            pool.prewarm("abc", lyria_config)
+            return await pool.take("abc")
+
+        assert asyncio.run(run()) is None
+        assert pool.warming == {}
+
+    def test_idle_session_expires(self, lyria_config):
+        lyria = FakeLyria()
+        pool = make_pool(lyria, idle_ttl=0.01)
+
+        async def run():
+            pool.prewarm("abc", lyria_config)
+            await asyncio.sleep(0.05)
+            return await pool.take("abc")
+
+        assert asyncio.run(run()) is None
+        assert lyria.closed == lyria.opened
+
+    def test_disabled_pool_does_not_connect(self, lyria_config):
+        lyria = FakeLyria()
+        pool = make_pool(lyria, enabled=False)
+
+        async def run():
+            pool.prewarm("abc", lyria_config)
+            return await pool.take("abc")
+
+        assert asyncio.run(run()) is None
+        assert lyria.opened == []
+
+    def test_close_closes_idle_sessions(self, lyria_config):
+        lyria = FakeLyria()
+        pool = make_pool(lyria)
+
+        async def run():
+            pool.prewarm("abc", lyria_config)
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            await pool.close()
+
+        asyncio.run(run())
+
+        assert lyria.closed == lyria.opened
+        assert pool.warming == {}
@@ -0,0 +1,663 @@
+import asyncio
+import json
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import WebSocketDisconnect
+from models.llm_response import LLMResponse, MasterPlan, MusicBlocks
+from models.lyria_config import LyriaConfig
+from service.lyria.audio_queue import AudioQueue, QueuedChunk
+from service.lyria.broadcast_hub import BroadcastHub
+from service.lyria.jitter_buffer import JitterBuffer
+from service.lyria.lyria_service import LyriaService
+from service.lyria.soundtrack_cache import SoundtrackCache
+from service.redis_service import RedisService, SessionWindow
+from shared.commands import Commands
+
+
+def _block(start, end, prompt):
+    return MusicBlocks(
+        time_range={"start": start, "end": end},
+        musical_direction=prompt,
+        transition="Cut",
+        gain=0.5,
+        lyria_config=LyriaConfig(
+            prompt=prompt, bpm=90, scale="C_MAJOR_A_MINOR", weight=1.0
+        ),
+    )
+
+
+@pytest.fixture
+def llm_response():
+    return LLMResponse(
+        scene_analysis=[],
+        master_plan=MasterPlan(
+            global_context="Noir",
+            musical_blocks=[_block(0, 10, "piano"), _block(10, 20, "strings")],
+        ),
+    )
+
+
+@pytest.fixture(autouse=True)
+def fresh_node():
+    with patch.object(JitterBuffer, "node_target", None):
+        yield
+
+
+@pytest.fixture
+def redis_service():
+    service = MagicMock(spec=RedisService)
+    service._dict_to_music_block = RedisService()._dict_to_music_block
+    return service
+
+
+def make_service(llm_response, redis_service, **kwargs):
+    async def build():
+        with patch.dict("os.environ", {"GOOGLE_API_KEY": "test"}), patch(
+            "service.lyria.lyria_service.genai.Client"
+        ):
+            return LyriaService(
+                MagicMock(),
+                llm_response,
+                session_id="abc",
+                redis_service=redis_service,
+                **kwargs,
+            )
+
+    return asyncio.run(build())
+
+
+class TestPlaybackCheckpoints:
+
+    def test_checkpoint_written_only_when_state_changes(
+        self, llm_response, redis_service
+    ):
+        service = make_service(llm_response, redis_service)
+
+        asyncio.run(service._write_checkpoint())
+        asyncio.run(service._write_checkpoint())
+        # Queued audio the client has not been sent yet is not checkpointed
+        service.elapsed_music_time = 10.0
+        service.sent_position = 2.0
+        asyncio.run(service._write_checkpoint())
+
+        assert redis_service.store_checkpoint.await_count == 2
+        _, token, state = redis_service.store_checkpoint.await_args.args
+        assert token == service.resume_token
+        assert state["elapsed_music_time"] == 2.0
+        assert state["config"]["prompt"] == "piano"
+
+    def test_resume_restores_checkpointed_state(self, llm_response, redis_service):
+        service = make_service(llm_response, redis_service, resume_token="token")
+        checkpoint = {
+            "elapsed_music_time": 12.0,
+            "block_index": 1,
+            "config": {
+                "prompt": "strings",
+                "bpm": 90,
+                "scale": "C_MAJOR_A_MINOR",
+                "weight": 1.0,
+            },
+            "gain": 0.7,
+        }
+
+        asyncio.run(service.resume(checkpoint))
+
+        assert service.resume_token == "token"
+        assert service.elapsed_music_time == 12.0
+        assert service._checkpoint_state()["elapsed_music_time"] == 12.0
+        assert service.current_config.prompt == "strings"
+        assert service.gain == 0.7
+        assert service.block_offset == 1
+
+    def test_client_position_moves_to_block_playing_there(
+        self, llm_response, redis_service
+    ):
+        service = make_service(llm_response, redis_service)
+
+        asyncio.run(service.resume(None, position=14.0))
+
+        assert service.elapsed_music_time == 14.0
+        assert service.active_block_index == 1
+        assert service.current_config.prompt == "strings"
+
+    def test_resume_loads_blocks_outside_the_initial_window(
+        self, llm_response, redis_service
+    ):
+        service = make_service(llm_response, redis_service, block_count=5)
+        redis_service.fetch_blocks = AsyncMock(
+            return_value=SessionWindow(
+                start_index=4,
+                musical_blocks=[
+                    RedisService()._music_block_to_dict(_block(40, 50, "choir"))
+                ],
+                scene_analysis=[],
+                block_count=5,
+                analysis_complete=True,
+            )
+        )
+        checkpoint = {
+            "elapsed_music_time": 42.0,
+            "block_index": 4,
+            "config": {
+                "prompt": "choir",
+                "bpm": 90,
+                "scale": "C_MAJOR_A_MINOR",
+                "weight": 1.0,
+            },
+            "gain": 0.5,
+        }
+
+        asyncio.run(service.resume(checkpoint))
+
+        redis_service.fetch_blocks.assert_awaited_once_with(
+            "abc", 4, service.BLOCK_PREFETCH_COUNT
+        )
+        assert service.block_offset == 4
+        assert [
+            b.lyria_config.prompt
+            for b in service.llm_response.master_plan.musical_blocks
+        ] == ["choir"]
+
+    def test_failed_analysis_stops_prefetching_and_tells_the_client(
+        self, llm_response, redis_service
+    ):
+        llm_response.analysis_complete = False
+        service = make_service(llm_response, redis_service, block_count=2)
+        service.user_websocket.send_text = AsyncMock()
+        redis_service.fetch_blocks = AsyncMock(
+            return_value=SessionWindow(
+                start_index=2,
+                musical_blocks=[],
+                scene_analysis=[],
+                block_count=2,
+                analysis_complete=False,
+                analysis_error="Analysis failed",
+            )
+        )
+        assert service._has_unloaded_blocks()
+
+        asyncio.run(service._prefetch_musical_blocks())
+
+        assert not service._has_unloaded_blocks()
+        service.user_websocket.send_text.assert_awaited_once_with(
+            json.dumps({"type": "analysis", "error": "Analysis failed"})
+        )
+
+
+class TestAdaptiveTransitions:
+
+    def test_transition_sent_within_measured_latency(self, llm_response, redis_service):
+        service = make_service(llm_response, redis_service)
+        session = AsyncMock()
+        service.transition_latency.mean = 0.5
+        service.last_chunk_seconds = service.clock.advance(48000 * 4 * 2)
+        service.elapsed_music_time = 8.0
+
+        asyncio.run(service._check_for_music_update(session))
+        session.set_weighted_prompts.assert_not_called()
+
+        service.elapsed_music_time = 8.6
+        asyncio.run(service._check_for_music_update(session))
+
+        session.set_weighted_prompts.assert_awaited_once()
+        assert service.active_block_index == 1
+        assert service.transition_latency.sent_at is not None
+
+
+def _audio_message(seconds=2.0):
+    message = MagicMock()
+    message.server_content.audio_chunks = [
+        MagicMock(data=b"\x00" * int(48000 * 4 * seconds))
+    ]
+    return message
+
+
+class FakeMusicSession:
+    def __init__(self, messages):
+        self.messages = messages
+        self.pause = AsyncMock()
+        self.play = AsyncMock()
+        self.set_weighted_prompts = AsyncMock()
+        self.set_music_generation_config = AsyncMock()
+        self.reset_context = AsyncMock()
+
+    async def receive(self):
+        for message in self.messages:
+            yield message
+
+
+class TestAudioQueueing:
+
+    def test_slow_client_pauses_then_resumes_generation(
+        self, llm_response, redis_service
+    ):
+        service = make_service(llm_response, redis_service)
+        service.audio_queue = AudioQueue(max_chunks=2)
+        session = FakeMusicSession([_audio_message() for _ in range(3)])
+        sent = []
+
+        async def slow_send(data):
+            await asyncio.sleep(0.01)
+            sent.append(bytes(data))
+
+        service.user_websocket.send_bytes = slow_send
+        service.user_websocket.send_text = AsyncMock()
+
+        async def run():
+            await asyncio.gather(
+                service._receive_audio_from_lyria(session),
+                service._send_audio_to_client(),
+            )
+
+        asyncio.run(run())
+
+        assert len(sent) == 3
+        session.pause.assert_awaited_once()
+        session.play.assert_awaited_once()
+        assert not service.generation_paused
+        assert service.elapsed_music_time == 6.0
+        assert service.sent_position == 6.0
+
+    def test_draining_queue_does_not_undo_a_user_pause(
+        self, llm_response, redis_service
+    ):
+        service = make_service(llm_response, redis_service)
+        service.music_session = FakeMusicSession([])
+        service.user_websocket.send_bytes = AsyncMock()
+        service.user_websocket.send_text = AsyncMock()
+        service.user_websocket.receive_text = AsyncMock(
+            side_effect=[json.dumps({"command": Commands.PAUSE}), WebSocketDisconnect()]
+        )
+        service.generation_paused = True
+        service.audio_queue.put(QueuedChunk(b"\x00" * 4 * 4800, 0.1, 0.5, 0, 0))
+        service.audio_queue.close()
+
+        async def run():
+            await service._proxy_commands_to_lyria()
+            service.session_active = True
+            await service._send_audio_to_client()
+
+        asyncio.run(run())
+
+        assert service.user_paused and service.generation_paused
+        service.user_websocket.send_bytes.assert_awaited_once()
+        service.music_session.play.assert_not_called()
+
+    def test_play_resumes_generation_once_the_queue_drained(
+        self, llm_response, redis_service
+    ):
+        service = make_service(llm_response, redis_service)
+        service.music_session = FakeMusicSession([])
+        service.music_session.stop = AsyncMock()
+        service.generation_paused = True
+        service.user_paused = True
+        service.user_websocket.receive_text = AsyncMock(
+            side_effect=[
+                json.dumps({"command": Commands.PLAY}),
+                json.dumps({"command": Commands.STOP}),
+            ]
+        )
+
+        asyncio.run(service._proxy_commands_to_lyria())
+
+        service.music_session.play.assert_awaited_once()
+        assert not service.generation_paused and not service.user_paused
+
+    def test_chunks_keep_the_gain_they_were_generated_with(
+        self, llm_response, redis_service
+    ):
+        service = make_service(llm_response, redis_service)
+        session = FakeMusicSession([_audio_message(), _audio_message()])
+        service.user_websocket.send_bytes = AsyncMock()
+        service.user_websocket.send_text = AsyncMock()
+        service.gain = 1.0
+        service.elapsed_music_time = 6.0
+
+        asyncio.run(service._receive_audio_from_lyria(session))
+
+        gains = [chunk.gain for chunk in service.audio_queue.chunks]
+        assert gains == [1.0, 0.5]
+
+    def test_chunks_are_numbered_with_media_timestamps(
+        self, llm_response, redis_service
+    ):
+        service = make_service(llm_response, redis_service)
+        session = FakeMusicSession([_audio_message(), _audio_message(1.0)])
+        service.elapsed_music_time = 4.0
+
+        asyncio.run(service._receive_audio_from_lyria(session))
+
+        chunks = list(service.audio_queue.chunks)
+        assert [c.sequence for c in chunks] == [0, 1]
+        assert [c.timestamp for c in chunks] == [4 * 48000, 6 * 48000]
+
+    def test_resume_carries_prebuffer_over(self, llm_response, redis_service):
+        service = make_service(llm_response, redis_service, resume_token="token")
+        checkpoint = {
+            "elapsed_music_time": 2.0,
+            "block_index": 0,
+            "config": llm_response.master_plan.musical_blocks[0].lyria_config.dict(),
+            "gain": 0.5,
+            "jitter_target": 2.5,
+        }
+
+        asyncio.run(service.resume(checkpoint))
+
+        assert service.jitter_buffer.target == 2.5
+        assert service._checkpoint_state()["jitter_target"] == 2.5
+
+    def test_new_stream_prebuffers_the_node_estimate(self, llm_response, redis_service):
+        JitterBuffer.node_target = 1.5
+
+        service = make_service(llm_response, redis_service)
+
+        assert service.jitter_buffer.target == 1.5
+
+    def test_finished_stream_updates_the_node_estimate(
+        self, llm_response, redis_service
+    ):
+        service = make_service(llm_response, redis_service)
+        service.audio_queue.put(QueuedChunk(b"\x00\x00" * 4800, 0.05, 1.0, 0, 0))
+        service.audio_queue.close()
+        service.user_websocket.send_text = AsyncMock()
+        service.user_websocket.send_bytes = AsyncMock()
+
+        asyncio.run(service._send_audio_to_client())
+
+        assert JitterBuffer.node_target == service.jitter_buffer.target
+
+
+class TestPrewarmedSessions:
+
+    def _pool(self, prewarmed):
+        pool = MagicMock()
+        pool.client = MagicMock()
+        pool.take = AsyncMock(return_value=prewarmed)
+        return pool
+
+    def _prewarmed(self, lyria_config):
+        prewarmed = MagicMock()
+        prewarmed.session = AsyncMock()
+        prewarmed.stack = AsyncMock()
+        prewarmed.lyria_config = lyria_config
+        return prewarmed
+
+    def _open(self, service):
+        async def run():
+            async with service._music_session() as session:
+                return session
+
+        return asyncio.run(run())
+
+    def test_uses_shared_client_and_primed_session(self, llm_response, redis_service):
+        config = llm_response.master_plan.musical_blocks[0].lyria_config
+        prewarmed = self._prewarmed(config)
+        pool = self._pool(prewarmed)
+        service = make_service(llm_response, redis_service, lyria_pool=pool)
+
+        session = self._open(service)
+
+        assert service.client is pool.client
+        assert session is prewarmed.session
+        pool.take.assert_awaited_once_with("abc")
+        session.set_weighted_prompts.assert_not_called()
+        prewarmed.stack.__aexit__.assert_awaited_once()
+
+    def test_reprimes_when_resumed_in_another_block(self, llm_response, redis_service):
+        blocks = llm_response.master_plan.musical_blocks
+        prewarmed = self._prewarmed(blocks[0].lyria_config)
+        service = make_service(
+            llm_response, redis_service, lyria_pool=self._pool(prewarmed)
+        )
+        service.current_config = blocks[1].lyria_config
+
+        session = self._open(service)
+
+        prompts = session.set_weighted_prompts.await_args.kwargs["prompts"]
+        assert prompts[0].text == "strings"
+
+
+class TestSoundtrackCache:
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return SoundtrackCache(str(tmp_path))
+
+    def _render(self, cache, seconds, complete=False):
+        recorder = cache.recorder("abc", 0)
+        recorder.write(b"\x01" * int(48000 * 4 * seconds), 0, 0, 0.5)
+        recorder.close(complete)
+
+    def _service(self, llm_response, redis_service, cache, session):
+        service = make_service(llm_response, redis_service, soundtrack_cache=cache)
+        service.REPLAY_LEAD = 60.0
+
+        @asynccontextmanager
+        async def music_session():
+            yield session
+
+        service._music_session = music_session
+        return service
+
+    def test_complete_soundtrack_is_replayed_without_lyria(
+        self, llm_response, redis_service, cache
+    ):
+        self._render(cache, 5.0, complete=True)
+        session = FakeMusicSession([])
+        service = self._service(llm_response, redis_service, cache, session)
+        service.elapsed_music_time = 1.0
+
+        asyncio.run(service._produce_audio())
+
+        chunks = list(service.audio_queue.chunks)
+        assert [c.timestamp for c in chunks] == [48000, 3 * 48000]
+        assert [c.seconds for c in chunks] == [2.0, 2.0]
+        assert chunks[0].gain == 0.5
+        assert service.audio_queue.closed
+        session.play.assert_not_called()
+
+    def test_live_generation_continues_after_cached_audio(
+        self, llm_response, redis_service, cache
+    ):
+        self._render(cache, 12.0)
+        session = FakeMusicSession([_audio_message()])
+        service = self._service(llm_response, redis_service, cache, session)
+
+        asyncio.run(service._produce_audio())
+
+        chunks = list(service.audio_queue.chunks)
+        assert chunks[-1].timestamp == 12 * 48000
+        assert [c.sequence for c in chunks] == list(range(7))
+        # Lyria is primed for the block playing where the cached audio ends
+        assert service.current_config.prompt == "strings"
+        session.play.assert_awaited_once()
+        assert cache.rendered_frames("abc") == 14 * 48000
+
+    def test_replay_holds_while_the_client_is_paused(
+        self, llm_response, redis_service, cache
+    ):
+        self._render(cache, 0.1, complete=True)
+        service = self._service(llm_response, redis_service, cache, AsyncMock())
+        service.REPLAY_LEAD = service.REPLAY_CHUNK_SECONDS = 0.02
+        service.user_paused = True
+
+        async def run():
+            produce = asyncio.create_task(service._produce_audio())
+            await asyncio.sleep(0.1)
+            held = len(service.audio_queue.chunks)
+            service.user_paused = False
+            service.play_state_changed.set()
+            await produce
+            return held
+
+        held = asyncio.run(run())
+
+        # Only the lead is queued ahead of a paused client
+        assert held == 2
+        assert len(service.audio_queue.chunks) == 5
+
+    def test_client_controls_playback_during_replay(
+        self, llm_response, redis_service, cache
+    ):
+        service = self._service(llm_response, redis_service, cache, AsyncMock())
+        service.user_websocket.send_text = AsyncMock()
+        service.user_websocket.receive_text = AsyncMock(
+            side_effect=[
+                json.dumps({"command": Commands.PAUSE}),
+                json.dumps({"command": Commands.STOP}),
+            ]
+        )
+
+        asyncio.run(service._proxy_commands_to_lyria())
+
+        assert service.user_paused
+        service.user_websocket.send_text.assert_not_called()
+
+    def test_paused_client_is_not_played_live_after_replay(
+        self, llm_response, redis_service, cache
+    ):
+        self._render(cache, 4.0)
+        session = FakeMusicSession([_audio_message()])
+        service = self._service(llm_response, redis_service, cache, session)
+        service.user_paused = True
+
+        asyncio.run(service._produce_audio())
+
+        session.play.assert_not_called()
+
+    def test_recording_completes_at_the_end_of_the_plan(
+        self, llm_response, redis_service, cache
+    ):
+        session = FakeMusicSession([_audio_message(5.0) for _ in range(4)])
+        service = self._service(llm_response, redis_service, cache, session)
+
+        asyncio.run(service._produce_audio())
+
+        assert cache.is_complete("abc")
+        segments = cache.segments("abc")
+        assert segments[-1].end == 20 * 48000
+        assert segments[-1].block_index == 1
+
+
+class TestBroadcast:
+
+    @pytest.fixture
+    def hub(self, redis_service):
+        redis_service.claim_broadcast = AsyncMock(side_effect=[False, True])
+        redis_service.refresh_broadcast = AsyncMock(return_value=True)
+        redis_service.release_broadcast = AsyncMock()
+        redis_service.publish_broadcast = AsyncMock()
+
+        async def subscribe(session_id):
+            await asyncio.Event().wait()
+            yield b""
+
+        redis_service.subscribe_broadcast = subscribe
+        return BroadcastHub(redis_service)
+
+    def _service(self, llm_response, redis_service, hub, session):
+        service = make_service(llm_response, redis_service, broadcast_hub=hub)
+        service.user_websocket.send_text = AsyncMock()
+
+        @asynccontextmanager
+        async def music_session():
+            yield session
+
+        service._music_session = music_session
+        return service
+
+    def _messages(self, service):
+        return [
+            json.loads(call.args[0])
+            for call in service.user_websocket.send_text.await_args_list
+        ]
+
+    def test_listener_takes_over_when_the_owner_leaves(
+        self, llm_response, redis_service, hub
+    ):
+        session = FakeMusicSession([_audio_message()])
+        service = self._service(llm_response, redis_service, hub, session)
+
+        async def run():
+            produce = asyncio.create_task(service._produce_audio())
+            while "abc" not in hub.sessions:
+                await asyncio.sleep(0)
+            owner_stream = hub.sessions["abc"]
+            owner_stream.publish(
+                QueuedChunk(b"\x01" * 48000 * 4 * 2, 2.0, 0.5, 7, 480000)
+            )
+            owner_stream.end()
+            await produce
+
+        asyncio.run(run())
+
+        chunks = list(service.audio_queue.chunks)
+        assert [c.timestamp for c in chunks] == [480000, 576000]
+        assert [c.sequence for c in chunks] == [0, 1]
+        roles = [(m["role"], m["position"]) for m in self._messages(service)]
+        assert roles == [("listener", 10.0), ("owner", 12.0)]
+        # Generation resumes in the block the listener had reached
+        assert service.current_config.prompt == "strings"
+        session.play.assert_awaited_once()
+        redis_service.release_broadcast.assert_awaited_once()
+
+    def test_only_the_owner_controls_playback(self, llm_response, redis_service, hub):
+        service = self._service(llm_response, redis_service, hub, AsyncMock())
+        service.broadcast_role = "listener"
+        service.user_websocket.receive_text = AsyncMock(
+            side_effect=[
+                json.dumps({"command": "PAUSE"}),
+                json.dumps({"command": "STOP"}),
+            ]
+        )
+
+        asyncio.run(service._proxy_commands_to_lyria())
+
+        assert self._messages(service) == [
+            {
+                "type": "broadcast",
+                "error": "Only the session owner can control playback",
+            }
+        ]
+        assert not service.session_active
+
+    def test_listener_waits_while_the_owner_is_paused(
+        self, llm_response, redis_service, hub
+    ):
+        redis_service.broadcast_owned = AsyncMock(return_value=True)
+        hub.owner_ttl = 0.01
+        session = FakeMusicSession([_audio_message()])
+        service = self._service(llm_response, redis_service, hub, session)
+
+        async def run():
+            produce = asyncio.create_task(service._produce_audio())
+            while "abc" not in hub.sessions:
+                await asyncio.sleep(0)
+            hub.sessions["abc"].set_paused(True)
+            await asyncio.sleep(0.1)
+            hub.sessions["abc"].end()
+            await produce
+
+        asyncio.run(run())
+
+        assert redis_service.claim_broadcast.await_count == 2
+        messages = self._messages(service)
+        assert messages[0] == {"type": "broadcast", "state": "paused"}
+        assert messages[1]["role"] == "owner"
+
+    def test_quiet_owner_is_waited_on_longer_each_time(
+        self, llm_response, redis_service, hub
+    ):
+        redis_service.claim_broadcast = AsyncMock(side_effect=[False] * 5 + [True])
+        service = self._service(llm_response, redis_service, hub, AsyncMock())
+        service.session_id = "abc"
+        service._follow_broadcast = AsyncMock(return_value=True)
+        service.resume = AsyncMock()
+
+        assert asyncio.run(service._join_broadcast())
+
+        timeouts = [c.args[0] for c in service._follow_broadcast.await_args_list]
+        assert timeouts == [15, 30, 60, 120, 120]
+        states = [m.get("state") for m in self._messages(service)]
+        assert states.count("stalled") == 1
@@ -0,0 +1,78 @@
+import pytest
+from service.lyria.playback_clock import PlaybackClock, TransitionLatency
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPlaybackClock:
+
+    def test_elapsed_follows_sample_count(self):
+        clock = PlaybackClock()
+
+        assert clock.advance(48000 * 4 * 2) == 2.0
+        assert clock.advance(48000 * 4 // 2) == 0.5
+        assert clock.elapsed == 2.5
+
+    def test_frames_split_across_chunks_count_once(self):
+        clock = PlaybackClock()
+
+        assert clock.advance(6) == 1 / 48000
+        assert clock.advance(2) == 1 / 48000
+        assert clock.frames == 2
+
+    def test_seek_resets_partial_frame(self):
+        clock = PlaybackClock()
+        clock.advance(3)
+
+        clock.seek(12.5)
+
+        assert clock.elapsed == 12.5
+        assert clock.advance(4) == 1 / 48000
+
+
+class TestTransitionLatency:
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    def test_no_sample_without_pending_change(self, clock):
+        latency = TransitionLatency(initial=1.0, clock=clock)
+
+        assert latency.chunk_received() is None
+        assert latency.estimate == 1.0
+
+    def test_first_sample_replaces_initial_guess(self, clock):
+        latency = TransitionLatency(initial=1.0, clock=clock)
+
+        latency.sent()
+        clock.now = 0.4
+
+        assert latency.chunk_received() == pytest.approx(0.4)
+        assert latency.estimate == pytest.approx(0.4 + 2 * 0.2)
+        assert latency.chunk_received() is None
+
+    def test_estimate_converges_on_steady_latency(self, clock):
+        latency = TransitionLatency(clock=clock)
+
+        for _ in range(40):
+            latency.sent()
+            clock.now += 0.6
+            latency.chunk_received()
+
+        assert latency.estimate == pytest.approx(0.6, abs=0.01)
+
+    def test_estimate_is_capped(self, clock):
+        latency = TransitionLatency(clock=clock)
+
+        latency.sent()
+        clock.now = 60.0
+        latency.chunk_received()
+
+        assert latency.estimate == TransitionLatency.MAX_LATENCY
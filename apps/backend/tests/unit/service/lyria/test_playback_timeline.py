@@ -0,0 +1,101 @@
+import pytest
+from models.llm_response import MusicBlocks
+from models.lyria_config import LyriaConfig
+from service.lyria.playback_timeline import PlaybackTimeline
+
+
+def _block(start, end, prompt, bpm=90, scale="C_MAJOR_A_MINOR"):
+    return MusicBlocks(
+        time_range={"start": start, "end": end},
+        musical_direction=prompt,
+        transition="Cut",
+        gain=0.5,
+        lyria_config=LyriaConfig(prompt=prompt, bpm=bpm, scale=scale, weight=1.0),
+    )
+
+
+@pytest.fixture
+def timeline():
+    return PlaybackTimeline(
+        [
+            _block(0, 10, "piano"),
+            _block(10, 20, "strings"),
+            _block(20, 30, "drums", bpm=120),
+        ]
+    )
+
+
+class TestPlaybackTimeline:
+
+    def test_no_cue_before_transition_lead(self, timeline):
+        assert timeline.advance(0.0) is None
+        assert timeline.advance(6.9) is None
+        assert timeline.cursor == 0
+
+    def test_each_transition_fires_once(self, timeline):
+        cue = timeline.advance(7.0)
+
+        assert cue.index == 1
+        assert cue.prompts[0].text == "strings"
+        assert not cue.config_changed
+        assert timeline.advance(8.0) is None
+        assert timeline.advance(9.9) is None
+
+        cue = timeline.advance(17.0)
+        assert cue.index == 2
+        assert cue.config_changed
+        assert cue.config.bpm == 120
+        assert timeline.advance(29.0) is None
+
+    def test_stall_skips_to_latest_block(self, timeline):
+        cue = timeline.advance(25.0)
+
+        assert cue.index == 2
+        assert timeline.cursor == 2
+
+    def test_extend_rearms_last_block(self, timeline):
+        timeline.seek(2)
+        assert timeline.advance(28.0) is None
+
+        timeline.extend([_block(30, 40, "choir")])
+
+        cue = timeline.advance(28.0)
+        assert cue.index == 3
+        assert cue.prompts[0].text == "choir"
+        assert timeline.planned_until == 40.0
+        assert timeline.end_index == 4
+
+    def test_invalid_scale_keeps_the_previous_one(self, timeline):
+        timeline.seek(2)
+        timeline.extend([_block(30, 40, "choir", bpm=120, scale="NOT_A_SCALE")])
+
+        cue = timeline.advance(28.0)
+        assert cue.config.scale == timeline.configs[2].scale
+        assert not cue.config_changed
+
+    def test_invalid_first_scale_leaves_it_unset(self):
+        timeline = PlaybackTimeline([_block(0, 10, "piano", scale="not_a_scale")])
+
+        assert timeline.cue(0).config.scale is None
+
+    def test_drop_played_keeps_absolute_indices(self, timeline):
+        blocks = timeline.blocks
+        timeline.advance(17.0)
+
+        assert timeline.drop_played() == 2
+        assert timeline.offset == 2
+        assert blocks is timeline.blocks
+        assert [b.lyria_config.prompt for b in blocks] == ["drums"]
+
+        timeline.extend([_block(30, 40, "choir")])
+        assert timeline.advance(27.0).index == 3
+
+    def test_find_block_at_position(self, timeline):
+        assert timeline.find(0.0) == 0
+        assert timeline.find(15.0) == 1
+        assert timeline.find(29.9) == 2
+        assert timeline.find(35.0) is None
+
+    def test_lead_moves_transition(self, timeline):
+        assert timeline.advance(8.0, lead=1.0) is None
+        assert timeline.advance(9.0, lead=1.0).index == 1
@@ -0,0 +1,149 @@
+import os
+import pytest
+from service.lyria.soundtrack_cache import SoundtrackCache, parse_byte_range
+
+FRAME = 4
+
+
+def _pcm(frames, value=1):
+    return bytes([value]) * frames * FRAME
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SoundtrackCache(str(tmp_path), segment_seconds=10 / 48000)
+
+
+class TestSoundtrackRecording:
+
+    def test_segments_split_on_block_change_and_visible_once_committed(self, cache):
+        recorder = cache.recorder("abc", 0)
+
+        recorder.write(_pcm(4), 0, 0, 0.5)
+        recorder.write(_pcm(4), 4, 0, 0.5)
+        assert cache.segments("abc") == []
+
+        recorder.write(_pcm(4, 2), 8, 1, 0.7)
+        recorder.close()
+
+        segments = cache.segments("abc")
+        assert [(s.block_index, s.start, s.frames, s.gain) for s in segments] == [
+            (0, 0, 8, 0.5),
+            (1, 8, 4, 0.7),
+        ]
+        assert cache.read_frames("abc", segments[1], 10, 2) == _pcm(2, 2)
+        assert "abc" not in cache.recording
+
+    def test_long_blocks_are_split_into_segments(self, cache):
+        recorder = cache.recorder("abc", 0)
+        for i in range(3):
+            recorder.write(_pcm(6), i * 6, 0, 0.5)
+        recorder.close()
+
+        assert [s.frames for s in cache.segments("abc")] == [12, 6]
+
+    def test_gap_stops_recording(self, cache):
+        recorder = cache.recorder("abc", 0)
+        recorder.write(_pcm(4), 0, 0, 0.5)
+
+        assert not recorder.write(_pcm(4), 8, 0, 0.5)
+        assert cache.rendered_frames("abc") == 4
+
+    def test_recorder_only_extends_the_rendered_run(self, cache):
+        recorder = cache.recorder("abc", 0)
+        assert cache.recorder("abc", 0) is None
+        recorder.write(_pcm(4), 0, 0, 0.5)
+        recorder.close()
+
+        assert cache.recorder("abc", 8) is None
+        assert cache.recorder("abc", 4) is not None
+
+    def test_complete_soundtracks_are_not_recorded_again(self, cache):
+        recorder = cache.recorder("abc", 0)
+        recorder.write(_pcm(4), 0, 0, 0.5)
+        recorder.close(complete=True)
+
+        assert cache.is_complete("abc")
+        assert cache.recorder("abc", 4) is None
+
+    def test_one_writer_across_nodes_sharing_the_root(self, cache):
+        other_node = SoundtrackCache(cache.root)
+        recorder = cache.recorder("abc", 0)
+
+        assert other_node.recorder("abc", 0) is None
+        recorder.write(_pcm(4), 0, 0, 0.5)
+        recorder.close()
+
+        assert other_node.recorder("abc", 4) is not None
+
+    def test_lock_of_a_dead_writer_is_released(self, cache):
+        crashed = cache.recorder("abc", 0)
+        # The kernel drops the lock with the process that held it
+        os.close(crashed.lock_fd)
+
+        other_node = SoundtrackCache(cache.root)
+        recorder = other_node.recorder("abc", 0)
+        recorder.write(_pcm(4), 0, 0, 0.5)
+        recorder.close()
+
+        assert [s.frames for s in cache.segments("abc")] == [4]
+
+    def test_prune_skips_soundtracks_being_recorded(self, cache):
+        cache.recorder("abc", 0)
+
+        SoundtrackCache(cache.root, ttl=-1).prune()
+
+        assert cache.session_dir("abc").exists()
+
+    def test_session_ids_cannot_escape_the_cache(self, cache):
+        with pytest.raises(ValueError):
+            cache.segments("../etc")
+
+
+class TestStaticSoundtrack:
+
+    @pytest.fixture
+    def segments(self, cache):
+        recorder = cache.recorder("abc", 0)
+        recorder.write(bytes(range(32)), 0, 0, 0.5)
+        recorder.write(bytes(range(32, 48)), 8, 1, 0.5)
+        recorder.close()
+        return cache.segments("abc")
+
+    def test_whole_file_is_a_wav(self, cache, segments):
+        size = cache.wav_size(segments)
+        body = b"".join(cache.iter_wav("abc", segments, 0, size - 1))
+
+        assert size == 44 + 48
+        assert body[:4] == b"RIFF" and body[8:12] == b"WAVE"
+        assert int.from_bytes(body[40:44], "little") == 48
+        assert body[44:] == bytes(range(48))
+
+    def test_range_spanning_header_and_segments(self, cache, segments):
+        body = b"".join(cache.iter_wav("abc", segments, 40, 44 + 35))
+
+        assert body[4:] == bytes(range(36))
+
+    def test_range_inside_a_later_segment(self, cache, segments):
+        body = b"".join(cache.iter_wav("abc", segments, 44 + 33, 44 + 40))
+
+        assert body == bytes(range(33, 41))
+
+    @pytest.mark.parametrize(
+        "header,expected",
+        [
+            ("bytes=0-9", (0, 9)),
+            ("bytes=10-", (10, 99)),
+            ("bytes=-20", (80, 99)),
+            ("bytes=90-200", (90, 99)),
+            ("bytes=0-1,5-6", None),
+            ("items=0-1", None),
+        ],
+    )
+    def test_parse_byte_range(self, header, expected):
+        assert parse_byte_range(header, 100) == expected
+
+    @pytest.mark.parametrize("header", ["bytes=100-", "bytes=5-2", "bytes=-0"])
+    def test_unsatisfiable_ranges(self, header):
+        with pytest.raises(ValueError):
+            parse_byte_range(header, 100)
@@ -0,0 +1,46 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from models.frame import Frame
+from models.llm_response import LLMResponse, MasterPlan
+from service.global_eval.global_eval_service import GlobalEvalService
+
+
+@pytest.fixture
+def service(tmp_path):
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"clip")
+    with patch("service.global_eval.global_eval_service.AudioUtils"), patch(
+        "service.global_eval.global_eval_service.LLMUtils"
+    ), patch("service.global_eval.global_eval_service.HelperUtils") as helper_utils:
+        helper_utils.return_value.create_temp_file.return_value = str(tmp_path / "v")
+        helper_utils.return_value.trim_video.return_value = str(clip)
+        yield GlobalEvalService(b"video")
+
+
+class TestEvaluateRemainder:
+
+    def test_only_the_rest_of_the_video_is_analyzed(self, service):
+        service.split_time = 30.0
+        service.audio_utils.get_transcription.return_value = [
+            {"text": "Hello", "timestamp": "1.5 - 4.0"}
+        ]
+        service.llm_utils.get_global_config.return_value = LLMResponse(
+            scene_analysis=[],
+            master_plan=MasterPlan(global_context="Noir", musical_blocks=[]),
+        )
+        frames = [Frame(data="x", timestamp=5.0, scene_start=0.0, scene_end=10.0)]
+
+        with patch("service.global_eval.global_eval_service.VideoUtils") as video_utils:
+            video_utils.return_value.get_unique_frames.return_value = frames
+            service.evaluate_remainder(
+                MasterPlan(global_context="Noir", musical_blocks=[])
+            )
+
+        service.helper_utils.trim_video.assert_called_once_with(
+            video_path=service.temp_video_path, start_duration=30.0, end_duration=None
+        )
+        kwargs = service.llm_utils.get_global_config.call_args.kwargs
+        assert kwargs["transcript"] == [{"text": "Hello", "timestamp": "31.5 - 34.0"}]
+        assert kwargs["frames"] == [
+            Frame(data="x", timestamp=35.0, scene_start=30.0, scene_end=40.0)
+        ]
@@ -0,0 +1,444 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from models.llm_response import LLMResponse, MasterPlan, MusicBlocks
+from models.lyria_config import LyriaConfig
+from redis.exceptions import ResponseError
+from service.redis_service import RedisService, SessionPayload
+
+
+@pytest.fixture
+def llm_response():
+    return LLMResponse(
+        scene_analysis=[{"description": "Rain", "mood": "Calm", "keywords": []}],
+        master_plan=MasterPlan(
+            global_context="Noir",
+            musical_blocks=[
+                MusicBlocks(
+                    time_range={"start": 0.0, "end": 10.0},
+                    musical_direction="Slow piano",
+                    transition="Fade in",
+                    gain=0.8,
+                    lyria_config=LyriaConfig(
+                        prompt="piano", bpm=80, scale="C_MAJOR_A_MINOR", weight=1.0
+                    ),
+                )
+            ],
+        ),
+    )
+
+
+@pytest.fixture
+def redis_service():
+    service = RedisService()
+    service.redis_client = MagicMock()
+    return service
+
+
+class TestRedisService:
+
+    def test_fetch_session_extends_ttl_with_getex(self, redis_service, llm_response):
+        stored = redis_service.codec.encode(
+            redis_service._llm_response_to_dict(llm_response)
+        )
+        redis_service.redis_client.getex = AsyncMock(return_value=stored)
+
+        session = asyncio.run(redis_service.fetch_session("abc", extend_ttl=1800))
+
+        redis_service.redis_client.getex.assert_awaited_once_with(
+            "session:abc", ex=1800
+        )
+        assert session.llm_response == llm_response
+
+    def test_fetch_missing_session(self, redis_service):
+        redis_service.redis_client.get = AsyncMock(return_value=None)
+        assert asyncio.run(redis_service.fetch_session("abc")) is None
+
+    def test_payload_message_forwards_stored_json(self, redis_service, llm_response):
+        data = redis_service._llm_response_to_dict(llm_response)
+        session = SessionPayload(
+            redis_service.codec.body(redis_service.codec.encode(data)),
+            redis_service._dict_to_llm_response,
+        )
+
+        assert json.loads(session.message("session_data")) == {
+            "type": "session_data",
+            "data": data,
+        }
+
+    def test_payload_materializes_lazily(self):
+        to_llm_response = MagicMock()
+        session = SessionPayload(b'{"a": 1}', to_llm_response)
+
+        session.message("session_data")
+        to_llm_response.assert_not_called()
+
+        assert session.llm_response is session.llm_response
+        to_llm_response.assert_called_once_with({"a": 1})
+
+
+def _block(start, end):
+    return {
+        "time_range": {"start": start, "end": end},
+        "musical_direction": "Strings",
+        "transition": "Cut",
+        "gain": 0.5,
+        "lyria_config": {
+            "prompt": "strings",
+            "bpm": 90,
+            "scale": "C_MAJOR_A_MINOR",
+            "weight": 1.0,
+        },
+    }
+
+
+def _scene(start):
+    return {
+        "description": f"Scene at {start}",
+        "mood": "Calm",
+        "keywords": [],
+        "timestamp": start,
+        "start_time": start,
+        "end_time": start + 5,
+    }
+
+
+class FakeHashPipeline:
+    def __init__(self, fields):
+        self.fields = fields
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def hmget(self, key, names):
+        self.commands.append(("hmget", key, names))
+
+    def hgetall(self, key):
+        self.commands.append(("hgetall", key))
+
+    def expire(self, key, ttl):
+        self.commands.append(("expire", key, ttl))
+
+    async def execute(self):
+        results = []
+        for command in self.commands:
+            if command[0] == "hmget":
+                results.append([self.fields.get(name) for name in command[2]])
+            elif command[0] == "hgetall":
+                results.append({k.encode(): v for k, v in self.fields.items()})
+            else:
+                results.append(True)
+        return results
+
+
+@pytest.fixture
+def long_session():
+    return {
+        "scene_analysis": [_scene(t) for t in range(0, 100, 5)],
+        "master_plan": {
+            "global_context": "Noir",
+            "musical_blocks": [_block(t, t + 10) for t in range(0, 100, 10)],
+        },
+        "analysis_complete": True,
+        "analysis_error": None,
+    }
+
+
+@pytest.fixture
+def hash_service(long_session):
+    service = RedisService(layout=RedisService.LAYOUT_HASH, initial_blocks=2)
+    service.redis_client = MagicMock()
+    fields = service._hash_fields(long_session)
+    service.redis_client.pipeline = MagicMock(
+        side_effect=lambda transaction=True: FakeHashPipeline(fields)
+    )
+    service.redis_client.hmget = AsyncMock(
+        side_effect=lambda key, names: [fields.get(name) for name in names]
+    )
+    return service
+
+
+class TestHashLayout:
+
+    def test_fields_split_blocks_and_scenes(self, hash_service, long_session):
+        fields = hash_service._hash_fields(long_session)
+
+        assert hash_service.codec.decode(fields["meta"])["block_count"] == 10
+        assert hash_service.codec.decode(fields["block:3"]) == _block(30, 40)
+        assert hash_service.codec.decode(fields["scenes:3"]) == [_scene(30), _scene(35)]
+
+    def test_scenes_before_first_block_stay_with_it(self, hash_service):
+        grouped = hash_service._group_scenes(
+            [_block(10, 20), _block(20, 30)], [_scene(0), _scene(12), _scene(25)]
+        )
+        assert grouped == {-1: [_scene(0)], 0: [_scene(12)], 1: [_scene(25)]}
+
+    def test_fetch_session_reads_initial_blocks(self, hash_service):
+        session = asyncio.run(hash_service.fetch_session("abc", extend_ttl=1800))
+
+        data = json.loads(session.message("session_data"))["data"]
+        assert data["master_plan"]["musical_blocks"] == [_block(0, 10), _block(10, 20)]
+        assert [s["start_time"] for s in data["scene_analysis"]] == [0, 5, 10, 15]
+        assert session.block_count == 10
+        assert len(session.llm_response.master_plan.musical_blocks) == 2
+
+    def test_fetch_blocks_window(self, hash_service):
+        window = asyncio.run(hash_service.fetch_blocks("abc", 8, 3))
+
+        assert window.start_index == 8
+        assert window.musical_blocks == [_block(80, 90), _block(90, 100)]
+        assert [s["start_time"] for s in window.scene_analysis] == [80, 85, 90, 95]
+        assert window.block_count == 10
+
+    def test_failed_analysis_is_stored_in_meta(self, long_session):
+        service = RedisService(layout=RedisService.LAYOUT_HASH)
+        service.redis_client = MagicMock()
+        long_session["analysis_complete"] = False
+        long_session["analysis_error"] = "Analysis failed"
+        fields = service._hash_fields(long_session)
+        service.redis_client.hmget = AsyncMock(
+            side_effect=lambda key, names: [fields.get(name) for name in names]
+        )
+
+        window = asyncio.run(service.fetch_blocks("abc", 8, 3))
+
+        assert not window.analysis_complete
+        assert window.analysis_error == "Analysis failed"
+
+    def test_get_session_assembles_everything(self, hash_service, long_session):
+        llm_response = asyncio.run(hash_service.get_session("abc"))
+        assert hash_service._llm_response_to_dict(llm_response) == long_session
+
+    def test_blob_fetch_blocks_slices_session(self, redis_service, long_session):
+        redis_service.redis_client.get = AsyncMock(
+            return_value=redis_service.codec.encode(long_session)
+        )
+
+        window = asyncio.run(redis_service.fetch_blocks("abc", 1, 2))
+
+        assert window.musical_blocks == [_block(10, 20), _block(20, 30)]
+        assert [s["start_time"] for s in window.scene_analysis] == [10, 15, 20, 25]
+
+    def test_falls_back_to_blob_for_older_sessions(self, hash_service, long_session):
+        hash_service.redis_client.hmget = AsyncMock(
+            side_effect=ResponseError("WRONGTYPE Operation against a key")
+        )
+        hash_service.redis_client.get = AsyncMock(
+            return_value=hash_service.codec.encode(long_session)
+        )
+
+        window = asyncio.run(hash_service.fetch_blocks("abc", 0, 1))
+
+        assert window.musical_blocks == [_block(0, 10)]
+
+
+class TestNearCache:
+
+    @pytest.fixture
+    def cached_service(self, redis_service, llm_response):
+        redis_service.invalidation_listening = True
+        redis_service.redis_client.getex = AsyncMock(
+            return_value=redis_service.codec.encode(
+                redis_service._llm_response_to_dict(llm_response)
+            )
+        )
+        redis_service.redis_client.expire = AsyncMock(return_value=True)
+        redis_service.redis_client.publish = AsyncMock()
+        return redis_service
+
+    def test_reconnect_is_served_from_memory(self, cached_service, llm_response):
+        first = asyncio.run(cached_service.fetch_session("abc", extend_ttl=1800))
+        second = asyncio.run(cached_service.fetch_session("abc", extend_ttl=1800))
+
+        cached_service.redis_client.getex.assert_awaited_once()
+        cached_service.redis_client.expire.assert_awaited_once_with("session:abc", 1800)
+        assert second.llm_response == llm_response
+        assert second.body == first.body
+
+    def test_connections_get_their_own_block_lists(self, cached_service):
+        first = asyncio.run(cached_service.fetch_session("abc", extend_ttl=1800))
+        first.llm_response.master_plan.musical_blocks.clear()
+
+        second = asyncio.run(cached_service.fetch_session("abc", extend_ttl=1800))
+        assert len(second.llm_response.master_plan.musical_blocks) == 1
+
+    def test_expired_key_drops_cached_copy(self, cached_service):
+        asyncio.run(cached_service.fetch_session("abc", extend_ttl=1800))
+        cached_service.redis_client.expire = AsyncMock(return_value=False)
+
+        assert asyncio.run(cached_service.fetch_session("abc", extend_ttl=1800)) is None
+        assert len(cached_service.session_cache) == 0
+
+    def test_delete_publishes_invalidation(self, cached_service):
+        asyncio.run(cached_service.fetch_session("abc", extend_ttl=1800))
+        cached_service.redis_client.delete = AsyncMock(return_value=1)
+
+        asyncio.run(cached_service.delete_session("abc"))
+
+        cached_service.redis_client.publish.assert_awaited_once_with(
+            RedisService.INVALIDATION_CHANNEL, "abc"
+        )
+        assert len(cached_service.session_cache) == 0
+
+    def test_not_cached_without_invalidation_listener(self, cached_service):
+        cached_service.invalidation_listening = False
+        asyncio.run(cached_service.fetch_session("abc", extend_ttl=1800))
+        assert len(cached_service.session_cache) == 0
+
+
+class TestCheckpoints:
+
+    def test_store_and_get_checkpoint(self, redis_service):
+        stored = {}
+
+        async def fake_set(key, value, ex):
+            stored[key] = value
+
+        redis_service.redis_client.set = AsyncMock(side_effect=fake_set)
+        redis_service.redis_client.get = AsyncMock(
+            side_effect=lambda key: stored.get(key)
+        )
+        state = {"elapsed_music_time": 6.0, "block_index": 1}
+
+        asyncio.run(redis_service.store_checkpoint("abc", "token", state, ttl=60))
+
+        redis_service.redis_client.set.assert_awaited_once()
+        assert redis_service.redis_client.set.await_args.kwargs["ex"] == 60
+        assert asyncio.run(redis_service.get_checkpoint("abc", "token")) == state
+        assert asyncio.run(redis_service.get_checkpoint("abc", "other")) is None
+
+
+class TestBroadcastOwnership:
+
+    def test_claim_is_set_if_absent(self, redis_service):
+        redis_service.redis_client.set = AsyncMock(side_effect=[True, None])
+
+        assert asyncio.run(redis_service.claim_broadcast("abc", "owner", 15))
+        assert not asyncio.run(redis_service.claim_broadcast("abc", "other", 15))
+
+        key = redis_service.redis_client.set.await_args.args[0]
+        assert key == "broadcast:abc:owner"
+        assert redis_service.redis_client.set.await_args.kwargs == {
+            "nx": True,
+            "ex": 15,
+        }
+
+    def test_refresh_and_release_check_the_owner(self, redis_service):
+        redis_service.redis_client.eval = AsyncMock(return_value=0)
+
+        assert not asyncio.run(redis_service.refresh_broadcast("abc", "owner", 15))
+        asyncio.run(redis_service.release_broadcast("abc", "owner"))
+
+        script, _, key, owner = redis_service.redis_client.eval.await_args.args
+        assert script == RedisService.RELEASE_OWNER_SCRIPT
+        assert (key, owner) == ("broadcast:abc:owner", "owner")
+
+
+class FakePubSub:
+    """Stand-in for the node's broadcast pub/sub connection"""
+
+    def __init__(self):
+        self.messages = asyncio.Queue()
+        self.subscribe = AsyncMock()
+        self.unsubscribe = AsyncMock()
+        self.aclose = AsyncMock()
+
+    async def get_message(self, ignore_subscribe_messages, timeout):
+        return await self.messages.get()
+
+
+class TestBroadcastSubscriptions:
+
+    def test_sessions_share_one_connection(self, redis_service):
+        pubsub = FakePubSub()
+        subscriber = MagicMock(aclose=AsyncMock())
+        subscriber.pubsub.return_value = pubsub
+        redis_service._subscriber_client = MagicMock(return_value=subscriber)
+
+        async def run():
+            first = redis_service.subscribe_broadcast("abc")
+            second = redis_service.subscribe_broadcast("def")
+            pending = [
+                asyncio.create_task(anext(first)),
+                asyncio.create_task(anext(second)),
+            ]
+            await asyncio.sleep(0)
+            for channel, data in (("broadcast:def", b"2"), ("broadcast:abc", b"1")):
+                pubsub.messages.put_nowait({"channel": channel, "data": data})
+            received = await asyncio.gather(*pending)
+            await first.aclose()
+            await second.aclose()
+            await redis_service.disconnect()
+            return received
+
+        redis_service.redis_client = None
+        assert asyncio.run(run()) == [b"1", b"2"]
+
+        redis_service._subscriber_client.assert_called_once()
+        assert [c.args for c in pubsub.subscribe.await_args_list] == [
+            ("broadcast:abc",),
+            ("broadcast:def",),
+        ]
+        assert [c.args for c in pubsub.unsubscribe.await_args_list] == [
+            ("broadcast:abc",),
+            ("broadcast:def",),
+        ]
+        pubsub.aclose.assert_awaited_once()
+
+
+class TestClusterAndReplicas:
+
+    @pytest.fixture
+    def replica_service(self, redis_service, llm_response):
+        stored = redis_service.codec.encode(
+            redis_service._llm_response_to_dict(llm_response)
+        )
+        redis_service.read_client = MagicMock()
+        redis_service.read_client.get = AsyncMock(return_value=stored)
+        redis_service.redis_client.get = AsyncMock(return_value=stored)
+        redis_service.redis_client.expire = AsyncMock(return_value=True)
+        return redis_service
+
+    def test_cluster_keys_share_a_hash_slot(self):
+        service = RedisService(cluster=True)
+        assert service._session_key("abc") == "session:{abc}"
+        assert service._checkpoint_key("abc", "t") == "checkpoint:{abc}:t"
+        assert service._broadcast_owner_key("abc") == "broadcast:{abc}:owner"
+        assert RedisService()._session_key("abc") == "session:abc"
+
+    def test_connect_reads_from_replica(self, replica_service, llm_response):
+        session = asyncio.run(replica_service.fetch_session("abc", extend_ttl=1800))
+
+        replica_service.read_client.get.assert_awaited_once_with("session:abc")
+        replica_service.redis_client.expire.assert_awaited_once_with(
+            "session:abc", 1800
+        )
+        replica_service.redis_client.get.assert_not_awaited()
+        assert session.llm_response == llm_response
+
+    def test_replica_lag_falls_back_to_primary(self, replica_service, llm_response):
+        replica_service.read_client.get = AsyncMock(return_value=None)
+
+        session = asyncio.run(replica_service.fetch_session("abc", extend_ttl=1800))
+
+        replica_service.redis_client.get.assert_awaited_once_with("session:abc")
+        assert session.llm_response == llm_response
+
+    def test_missing_on_primary_skips_fallback(self, replica_service):
+        replica_service.read_client.get = AsyncMock(return_value=None)
+        replica_service.redis_client.expire = AsyncMock(return_value=False)
+
+        assert asyncio.run(replica_service.fetch_session("abc", extend_ttl=1)) is None
+        replica_service.redis_client.get.assert_not_awaited()
+
+    def test_replica_error_without_fallback_raises(self, replica_service):
+        replica_service.replica_fallback = False
+        replica_service.read_client.get = AsyncMock(side_effect=ConnectionError())
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(replica_service.fetch_session("abc", extend_ttl=1800))
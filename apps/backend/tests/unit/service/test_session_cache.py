@@ -0,0 +1,62 @@
+import pytest
+from service.session_cache import SessionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    return SessionCache(max_entries=2, clock=clock)
+
+
+class TestSessionCache:
+
+    def test_get_after_put(self, cache):
+        cache.put("a", "session", ttl=10)
+        assert cache.get("a") == "session"
+        assert cache.hits == 1
+
+    def test_evicts_least_recently_used(self, cache):
+        cache.put("a", 1, ttl=10)
+        cache.put("b", 2, ttl=10)
+        cache.get("a")
+        cache.put("c", 3, ttl=10)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_entries_expire_with_ttl(self, cache, clock):
+        cache.put("a", 1, ttl=10)
+        clock.now = 10
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_extend_pushes_expiry(self, cache, clock):
+        cache.put("a", 1, ttl=10)
+        clock.now = 8
+        cache.extend("a", 10)
+        clock.now = 15
+        assert cache.get("a") == 1
+
+    def test_invalidate(self, cache):
+        cache.put("a", 1, ttl=10)
+        assert cache.invalidate("a")
+        assert not cache.invalidate("a")
+        assert cache.get("a") is None
+
+    def test_disabled_cache_stores_nothing(self, clock):
+        cache = SessionCache(max_entries=0, clock=clock)
+        cache.put("a", 1, ttl=10)
+        assert len(cache) == 0
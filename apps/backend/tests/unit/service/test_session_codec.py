@@ -0,0 +1,75 @@
+import json
+import zlib
+import pytest
+from unittest.mock import MagicMock
+import service.session_codec as session_codec
+from service.session_codec import SessionCodec
+
+
+@pytest.fixture
+def session():
+    return {
+        "scene_analysis": [
+            {"description": "A quiet street at night", "keywords": ["rain", "neon"]}
+        ]
+        * 50,
+        "master_plan": {"global_context": "Noir", "musical_blocks": []},
+        "analysis_complete": True,
+    }
+
+
+@pytest.fixture
+def fake_zstd(monkeypatch):
+    module = MagicMock()
+    module.ZstdCompressor.return_value.compress.side_effect = zlib.compress
+    module.ZstdDecompressor.return_value.decompress.side_effect = zlib.decompress
+    monkeypatch.setattr(session_codec, "zstandard", module)
+    return module
+
+
+class TestSessionCodec:
+
+    def test_round_trip(self, session):
+        codec = SessionCodec(compress_threshold=0)
+        encoded = codec.encode(session)
+        assert encoded[:2] == SessionCodec.MAGIC
+        assert encoded[2] == SessionCodec.SCHEMA_VERSION
+        assert codec.decode(encoded) == session
+
+    def test_smaller_than_legacy_json(self, session):
+        assert len(SessionCodec(compress_threshold=0).encode(session)) < len(
+            json.dumps(session)
+        )
+
+    def test_reads_legacy_json(self, session):
+        codec = SessionCodec()
+        assert codec.decode(json.dumps(session)) == session
+        assert codec.decode(json.dumps(session).encode("utf-8")) == session
+
+    def test_compresses_above_threshold(self, session, fake_zstd):
+        codec = SessionCodec(compress_threshold=100)
+        encoded = codec.encode(session)
+        assert encoded[3] & SessionCodec.FLAG_ZSTD
+        assert codec.decode(encoded) == session
+
+    def test_small_sessions_not_compressed(self, fake_zstd):
+        encoded = SessionCodec(compress_threshold=4096).encode({"a": 1})
+        assert encoded[3] == 0
+        fake_zstd.ZstdCompressor.assert_not_called()
+
+    def test_compressed_session_without_zstandard(
+        self, session, fake_zstd, monkeypatch
+    ):
+        encoded = SessionCodec(compress_threshold=100).encode(session)
+        monkeypatch.setattr(session_codec, "zstandard", None)
+        with pytest.raises(ValueError, match="zstandard"):
+            SessionCodec().decode(encoded)
+
+    def test_rejects_newer_schema(self):
+        raw = SessionCodec.MAGIC + bytes((SessionCodec.SCHEMA_VERSION + 1, 0)) + b"{}"
+        with pytest.raises(ValueError, match="newer"):
+            SessionCodec().decode(raw)
+
+    def test_rejects_unknown_encoding(self):
+        with pytest.raises(ValueError):
+            SessionCodec().decode(b"\x00garbage")
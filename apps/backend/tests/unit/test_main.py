@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+import main
+from models.llm_response import LLMResponse, MasterPlan
+from service.lyria.soundtrack_cache import SoundtrackCache
+
+
+@pytest.fixture
+def redis_service():
+    with patch.object(main, "redis_service") as service:
+        service.append_musical_blocks = AsyncMock(return_value=True)
+        yield service
+
+
+class TestProgressiveAnalysis:
+
+    def test_remainder_completes_the_session(self, redis_service):
+        remainder = LLMResponse(
+            scene_analysis=[{"start_time": 30.0}],
+            master_plan=MasterPlan(global_context="Noir", musical_blocks=[]),
+        )
+        global_eval = MagicMock()
+        global_eval.evaluate_remainder.return_value = remainder
+
+        asyncio.run(main.continue_progressive_analysis(global_eval, "abc", MagicMock()))
+
+        redis_service.append_musical_blocks.assert_awaited_once_with(
+            "abc",
+            [],
+            [{"start_time": 30.0}],
+            analysis_complete=True,
+            analysis_error=None,
+        )
+
+    def test_failure_is_stored_instead_of_completing(self, redis_service):
+        global_eval = MagicMock()
+        global_eval.evaluate_remainder.side_effect = RuntimeError("vision timeout")
+
+        asyncio.run(main.continue_progressive_analysis(global_eval, "abc", MagicMock()))
+
+        kwargs = redis_service.append_musical_blocks.await_args.kwargs
+        assert kwargs["analysis_complete"] is False
+        assert kwargs["analysis_error"]
+
+
+class TestSoundtrackEndpoint:
+
+    @pytest.fixture
+    def client(self, tmp_path):
+        cache = SoundtrackCache(str(tmp_path))
+        recorder = cache.recorder("abc", 0)
+        recorder.write(bytes(range(16)), 0, 0, 0.5)
+        recorder.close(complete=True)
+        main.app.dependency_overrides[main.get_current_user] = lambda: {}
+        with patch.object(main, "soundtrack_cache", cache):
+            yield TestClient(main.app)
+        main.app.dependency_overrides.clear()
+
+    def test_range_of_the_rendered_soundtrack(self, client):
+        response = client.get("/api/soundtrack/abc", headers={"Range": "bytes=44-47"})
+
+        assert response.status_code == 206
+        assert response.content == bytes(range(4))
+        assert response.headers["Content-Range"] == "bytes 44-47/60"
+
+    def test_unrendered_session(self, client):
+        assert client.get("/api/soundtrack/xyz").status_code == 404
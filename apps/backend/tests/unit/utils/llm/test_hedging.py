@@ -0,0 +1,102 @@
+import threading
+import time
+import pytest
+from utils.llm.hedging import HedgeBudget, HedgedCaller, LatencyTracker
+
+
+@pytest.fixture
+def warm_caller():
+    caller = HedgedCaller(max_timeout=60, hedge_ratio=1.0)
+    for _ in range(HedgedCaller.MIN_SAMPLES):
+        caller.tracker.record(0.05)
+    return caller
+
+
+class TestLatencyTracker:
+
+    def test_percentile_empty(self):
+        assert LatencyTracker().percentile(95) is None
+
+    def test_percentile(self):
+        tracker = LatencyTracker()
+        for i in range(1, 101):
+            tracker.record(float(i))
+        assert tracker.percentile(50) == 51.0
+        assert tracker.percentile(99) == 99.0
+
+    def test_window_drops_old_samples(self):
+        tracker = LatencyTracker(window=2)
+        for value in (100.0, 1.0, 2.0):
+            tracker.record(value)
+        assert tracker.percentile(100) == 2.0
+
+
+class TestHedgeBudget:
+
+    def test_budget_limits_hedges(self):
+        budget = HedgeBudget(ratio=0.5, burst=1.0)
+        assert budget.try_spend()
+        assert not budget.try_spend()
+        budget.on_request()
+        assert not budget.try_spend()
+        budget.on_request()
+        assert budget.try_spend()
+
+
+class TestHedgedCaller:
+
+    def test_cold_caller_uses_max_timeout_and_no_hedge(self):
+        caller = HedgedCaller(max_timeout=60)
+        assert caller.attempt_timeout() == 60
+        assert caller.hedge_delay() is None
+
+    def test_attempt_timeout_adapts_to_latency(self, warm_caller):
+        assert warm_caller.attempt_timeout() == HedgedCaller.MIN_TIMEOUT
+        for _ in range(50):
+            warm_caller.tracker.record(15.0)
+        assert warm_caller.attempt_timeout() == 45.0
+
+    def test_call_passes_timeout(self, warm_caller):
+        assert warm_caller.call(lambda timeout: timeout) == HedgedCaller.MIN_TIMEOUT
+
+    def test_slow_primary_is_hedged(self, warm_caller):
+        calls = []
+        lock = threading.Lock()
+
+        def request(timeout):
+            with lock:
+                calls.append(timeout)
+                attempt = len(calls)
+            if attempt == 1:
+                time.sleep(1.0)
+                return "primary"
+            return "hedge"
+
+        start = time.monotonic()
+        assert warm_caller.call(request) == "hedge"
+        assert time.monotonic() - start < 0.9
+        assert len(calls) == 2
+
+    def test_no_hedge_without_budget(self, warm_caller):
+        warm_caller.budget = HedgeBudget(ratio=0.0, burst=0.0)
+        calls = []
+
+        def request(timeout):
+            calls.append(timeout)
+            time.sleep(0.2)
+            return "primary"
+
+        assert warm_caller.call(request) == "primary"
+        assert len(calls) == 1
+
+    def test_error_is_raised_when_all_attempts_fail(self, warm_caller):
+        def request(timeout):
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError, match="boom"):
+            warm_caller.call(request)
+
+    def test_for_model_returns_shared_caller(self):
+        assert HedgedCaller.for_model("model-a", 60) is HedgedCaller.for_model(
+            "model-a", 60
+        )
@@ -0,0 +1,144 @@
+import pytest
+from models.llm_response import MasterPlan, MusicBlocks
+from models.lyria_config import LyriaConfig
+from utils.llm.master_planner import MasterPlanner, PlanAct
+
+
+def make_scene(start, end, mood="Calm", keywords=None):
+    return {
+        "description": "scene",
+        "mood": mood,
+        "keywords": keywords or ["city"],
+        "start_time": start,
+        "end_time": end,
+    }
+
+
+def make_block(start, end, bpm=90, scale="C_MAJOR_A_MINOR"):
+    return MusicBlocks(
+        time_range={"start": start, "end": end},
+        musical_direction="direction",
+        transition="transition",
+        gain=0.5,
+        lyria_config=LyriaConfig(prompt="prompt", bpm=bpm, scale=scale),
+    )
+
+
+@pytest.fixture
+def scenes():
+    return [make_scene(i * 30.0, (i + 1) * 30.0) for i in range(10)]
+
+
+class TestMasterPlanner:
+
+    def test_split_into_acts(self, scenes):
+        acts = MasterPlanner.split_into_acts(scenes, act_seconds=120)
+
+        assert [(act.start, act.end) for act in acts] == [
+            (0.0, 120.0),
+            (120.0, 240.0),
+            (240.0, 300.0),
+        ]
+        assert sum(len(act.scenes) for act in acts) == len(scenes)
+
+    def test_split_into_acts_empty(self):
+        assert MasterPlanner.split_into_acts([], act_seconds=120) == []
+
+    def test_split_into_acts_with_start_time(self, scenes):
+        acts = MasterPlanner.split_into_acts(
+            scenes[4:], act_seconds=120, start_time=120.0
+        )
+        assert acts[0].start == 120.0
+
+    def test_summarize_acts(self):
+        acts = [
+            PlanAct(
+                start=0.0,
+                end=60.0,
+                scenes=[make_scene(0, 60, mood="Tense", keywords=["Rain", "rain"])],
+            )
+        ]
+        summary = MasterPlanner.summarize_acts(acts)
+        assert "Act 1 (0s-60s)" in summary
+        assert "Tense" in summary
+        assert "rain" in summary
+
+    def test_reduce_plans_makes_blocks_contiguous(self):
+        acts = [PlanAct(start=0.0, end=120.0), PlanAct(start=120.0, end=240.0)]
+        plans = [
+            MasterPlan("Intro", [make_block(0, 100)]),
+            MasterPlan("Climax", [make_block(130, 200)]),
+        ]
+
+        result = MasterPlanner.reduce_plans(acts, plans)
+
+        assert [block.time_range for block in result.musical_blocks] == [
+            {"start": 0.0, "end": 120.0},
+            {"start": 120.0, "end": 240.0},
+        ]
+        assert result.global_context == "Intro → Climax"
+
+    def test_reduce_plans_snaps_close_bpms(self):
+        acts = [PlanAct(start=0.0, end=120.0), PlanAct(start=120.0, end=240.0)]
+        plans = [
+            MasterPlan("Intro", [make_block(0, 120, bpm=90)]),
+            MasterPlan("Intro", [make_block(120, 240, bpm=95)]),
+        ]
+
+        result = MasterPlanner.reduce_plans(acts, plans)
+
+        assert [block.lyria_config.bpm for block in result.musical_blocks] == [90, 90]
+
+    def test_reduce_plans_keeps_scale_for_short_act(self):
+        acts = [PlanAct(start=0.0, end=120.0), PlanAct(start=120.0, end=150.0)]
+        plans = [
+            MasterPlan("Intro", [make_block(0, 120)]),
+            MasterPlan("Outro", [make_block(120, 150, scale="D_MAJOR_B_MINOR")]),
+        ]
+
+        result = MasterPlanner.reduce_plans(acts, plans)
+
+        assert result.musical_blocks[1].lyria_config.scale == "C_MAJOR_A_MINOR"
+
+    def test_reduce_plans_keeps_key_changes_inside_an_act(self):
+        acts = [PlanAct(start=0.0, end=120.0), PlanAct(start=120.0, end=240.0)]
+        plans = [
+            MasterPlan("Intro", [make_block(0, 120)]),
+            MasterPlan(
+                "Climax",
+                [
+                    make_block(120, 140, scale="D_MAJOR_B_MINOR"),
+                    make_block(140, 200),
+                    make_block(200, 230, scale="E_MAJOR_D_FLAT_MINOR"),
+                ],
+            ),
+        ]
+
+        result = MasterPlanner.reduce_plans(acts, plans)
+
+        # The short key change at the act boundary is smoothed, the modulation kept
+        assert [block.lyria_config.scale for block in result.musical_blocks] == [
+            "C_MAJOR_A_MINOR",
+            "C_MAJOR_A_MINOR",
+            "C_MAJOR_A_MINOR",
+            "E_MAJOR_D_FLAT_MINOR",
+        ]
+
+    def test_reduce_plans_extends_over_missing_act(self):
+        acts = [PlanAct(start=0.0, end=120.0), PlanAct(start=120.0, end=240.0)]
+        plans = [MasterPlan("Intro", [make_block(0, 120)]), None]
+
+        result = MasterPlanner.reduce_plans(acts, plans)
+
+        assert len(result.musical_blocks) == 1
+        assert result.musical_blocks[0].time_range["end"] == 240.0
+
+    def test_reduce_plans_covers_missing_first_act(self):
+        acts = [PlanAct(start=0.0, end=120.0), PlanAct(start=120.0, end=240.0)]
+        plans = [None, MasterPlan("Climax", [make_block(130, 200)])]
+
+        result = MasterPlanner.reduce_plans(acts, plans)
+
+        assert [block.time_range for block in result.musical_blocks] == [
+            {"start": 0.0, "end": 240.0}
+        ]
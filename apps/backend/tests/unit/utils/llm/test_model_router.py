@@ -0,0 +1,58 @@
+import pytest
+from utils.llm.hedging import HedgedCaller
+from utils.llm.model_router import ModelRouter
+
+
+@pytest.fixture
+def router():
+    return ModelRouter(
+        large_model="router-test-large",
+        fast_model="router-test-fast",
+        max_timeout=60,
+        fast_max_input_tokens=1000,
+        fast_max_items=4,
+        latency_slo=5.0,
+    )
+
+
+@pytest.fixture(autouse=True)
+def reset_hedgers():
+    yield
+    for model in ("router-test-large", "router-test-fast"):
+        HedgedCaller._callers.pop(model, None)
+
+
+class TestModelRouter:
+
+    def test_small_request_goes_fast(self, router):
+        assert router.route(input_tokens=500, item_count=2) == "router-test-fast"
+
+    def test_large_input_goes_large(self, router):
+        assert router.route(input_tokens=1500, item_count=2) == "router-test-large"
+
+    def test_many_items_go_large(self, router):
+        assert router.route(input_tokens=500, item_count=6) == "router-test-large"
+
+    def test_slow_large_model_shifts_medium_requests_to_fast(self, router):
+        tracker = router.hedger("router-test-large").tracker
+        for _ in range(HedgedCaller.MIN_SAMPLES):
+            tracker.record(8.0)
+        assert router.route(input_tokens=1500, item_count=6) == "router-test-fast"
+        assert router.route(input_tokens=2500, item_count=6) == "router-test-large"
+
+    def test_without_fast_model_always_large(self):
+        router = ModelRouter(large_model="m", fast_model="", max_timeout=60)
+        assert router.route(input_tokens=1, item_count=1) == "m"
+
+    def test_same_fast_and_large_model_disables_routing(self):
+        router = ModelRouter(large_model="m", fast_model="m", max_timeout=60)
+        assert router.fast_model is None
+
+    def test_escalate_returns_large_model(self, router):
+        assert router.escalate("router-test-fast") == "router-test-large"
+        assert router.escalate("router-test-large") == "router-test-large"
+
+    def test_hedger_is_shared_per_model(self, router):
+        assert router.hedger("router-test-fast") is HedgedCaller.for_model(
+            "router-test-fast", 60
+        )
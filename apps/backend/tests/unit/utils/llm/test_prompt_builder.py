@@ -0,0 +1,120 @@
+import pytest
+from utils.llm.prompt_builder import PromptBuilder
+from utils.llm.prompts import Prompts
+
+
+@pytest.fixture
+def scenes():
+    return [
+        {
+            "description": "A long | detailed description " * 10,
+            "mood": "Tense",
+            "keywords": ["rain", "night"],
+            "start_time": float(i * 10),
+            "end_time": float(i * 10 + 10),
+        }
+        for i in range(6)
+    ]
+
+
+@pytest.fixture
+def transcript():
+    return [
+        {
+            "text": f"Line number {i} of the dialogue",
+            "timestamp": f"{i * 5} - {i * 5 + 5}",
+        }
+        for i in range(12)
+    ]
+
+
+class TestPromptBuilder:
+
+    def test_estimate_tokens(self):
+        assert PromptBuilder.estimate_tokens("") == 0
+        assert PromptBuilder.estimate_tokens("abcd") == 1
+        assert PromptBuilder.estimate_tokens("abcde") == 2
+
+    def test_estimate_messages_tokens_counts_images(self):
+        messages = [
+            {"role": "system", "content": "abcd"},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "abcd"},
+                    {"type": "image_url", "image_url": {"url": "data:..."}},
+                ],
+            },
+        ]
+        assert (
+            PromptBuilder.estimate_messages_tokens(messages)
+            == 2 + PromptBuilder.IMAGE_TOKENS
+        )
+
+    def test_encode_transcript(self, transcript):
+        rows = PromptBuilder().encode_transcript(transcript[:2]).split("\n")
+        assert rows == [
+            "0|5|Line number 0 of the dialogue",
+            "5|10|Line number 1 of the dialogue",
+        ]
+
+    def test_encode_scenes_escapes_separator(self, scenes):
+        row = (
+            PromptBuilder()
+            .encode_scenes(scenes[:1], description_limit=20)
+            .split("\n")[0]
+        )
+        assert row.startswith("0|10|Tense|rain,night|")
+        assert row.count("|") == 4
+
+    def test_compact_plan_prompt_is_smaller_than_legacy(self, scenes, transcript):
+        legacy = PromptBuilder(compact=False).build_master_plan_prompt(
+            scenes, transcript
+        )
+        compact = PromptBuilder(compact=True).build_master_plan_prompt(
+            scenes, transcript
+        )
+        assert PromptBuilder.estimate_tokens(compact) < PromptBuilder.estimate_tokens(
+            legacy
+        )
+
+    def test_plan_prompt_trimmed_to_budget(self, scenes, transcript):
+        untrimmed = PromptBuilder(token_budget=100000).build_master_plan_prompt(
+            scenes, transcript
+        )
+        budget = PromptBuilder.estimate_tokens(untrimmed) - 100
+        trimmed = PromptBuilder(token_budget=budget).build_master_plan_prompt(
+            scenes, transcript
+        )
+        assert PromptBuilder.estimate_tokens(trimmed) <= budget
+
+    def test_scene_prompt_deduplicates_dialogue(self, transcript):
+        scene_data = [
+            {
+                "timestamp": 2.0,
+                "scene_start": 0.0,
+                "scene_end": 5.0,
+                "transcription": transcript[:2],
+            },
+            {
+                "timestamp": 7.0,
+                "scene_start": 5.0,
+                "scene_end": 10.0,
+                "transcription": transcript[1:3],
+            },
+        ]
+        prompt = PromptBuilder().build_scene_prompt(scene_data)
+        assert prompt.count("Line number 1 of") == 1
+        assert "0|2|0|5" in prompt
+
+    def test_legacy_mode_uses_original_prompts(self):
+        builder = PromptBuilder(compact=False)
+        assert (
+            builder.build_scene_system_prompt() == Prompts.get_global_context_prompt()
+        )
+        assert builder.scene_max_tokens(5) == PromptBuilder.LEGACY_SCENE_MAX_TOKENS
+
+    def test_scene_max_tokens_scales_with_scene_count(self):
+        builder = PromptBuilder()
+        assert builder.scene_max_tokens(1) == PromptBuilder.MIN_SCENE_MAX_TOKENS
+        assert builder.scene_max_tokens(10) > builder.scene_max_tokens(5)
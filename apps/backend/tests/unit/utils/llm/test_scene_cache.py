@@ -0,0 +1,121 @@
+import base64
+import json
+from io import BytesIO
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from PIL import Image
+from models.frame import Frame
+from utils.llm.global_llm_utils import LLMUtils
+from utils.llm.scene_cache import SceneCache
+
+
+def make_frame(quality=95, width=64, seed=0, timestamp=1.0):
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 255, size=(16, 16, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels).resize((width, width), Image.Resampling.NEAREST)
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return Frame(
+        data=base64.b64encode(buffer.getvalue()).decode("utf-8"),
+        timestamp=timestamp,
+        scene_start=timestamp - 1.0,
+        scene_end=timestamp + 1.0,
+    )
+
+
+@pytest.fixture
+def scene_cache():
+    with patch("utils.llm.scene_cache.redis.from_url") as mock_from_url:
+        mock_from_url.return_value = MagicMock()
+        yield SceneCache(redis_url="redis://test", ttl=60, namespace="model:abc")
+
+
+class TestSceneCache:
+
+    def test_frame_fingerprint_survives_reencode(self):
+        original = SceneCache.frame_fingerprint(make_frame(quality=95, width=64))
+        reencoded = SceneCache.frame_fingerprint(make_frame(quality=70, width=48))
+        distance = bin(int(original, 16) ^ int(reencoded, 16)).count("1")
+        assert distance <= 6
+
+    def test_frame_fingerprint_differs_for_other_image(self):
+        assert SceneCache.frame_fingerprint(
+            make_frame(seed=1)
+        ) != SceneCache.frame_fingerprint(make_frame(seed=2))
+
+    def test_scene_key_depends_on_transcript(self, scene_cache):
+        frame = make_frame()
+        key_a = scene_cache.scene_key(frame, [{"text": "hello", "timestamp": "0 - 1"}])
+        key_b = scene_cache.scene_key(frame, [{"text": "bye", "timestamp": "0 - 1"}])
+        assert key_a != key_b
+        assert key_a.startswith("scene-cache:model:abc:")
+
+    def test_transcript_fingerprint_ignores_timestamps(self):
+        assert SceneCache.transcript_fingerprint(
+            [{"text": "hello", "timestamp": "0 - 1"}]
+        ) == SceneCache.transcript_fingerprint(
+            [{"text": "hello", "timestamp": "5 - 6"}]
+        )
+
+    def test_prompt_namespace_changes_with_prompt(self):
+        assert SceneCache.prompt_namespace("m", "a") != SceneCache.prompt_namespace(
+            "m", "b"
+        )
+
+    def test_get_many_refreshes_ttl_of_hits(self, scene_cache):
+        scene_cache.redis_client.mget.return_value = [
+            json.dumps({"mood": "Calm"}),
+            None,
+        ]
+        pipe = scene_cache.redis_client.pipeline.return_value
+
+        result = scene_cache.get_many(["a", "b"])
+
+        assert result == [{"mood": "Calm"}, None]
+        pipe.expire.assert_called_once_with("a", 60)
+
+    def test_get_many_treats_errors_as_misses(self, scene_cache):
+        scene_cache.redis_client.mget.side_effect = ConnectionError("down")
+        assert scene_cache.get_many(["a", "b"]) == [None, None]
+
+    def test_set_many_strips_time_fields(self, scene_cache):
+        pipe = scene_cache.redis_client.pipeline.return_value
+        scene_cache.set_many(
+            {"a": {"mood": "Calm", "timestamp": 1.0, "start_time": 0, "end_time": 2}}
+        )
+        pipe.setex.assert_called_once_with("a", 60, json.dumps({"mood": "Calm"}))
+
+    def test_restamp_uses_current_frame_times(self):
+        frame = make_frame(timestamp=10.0)
+        scene = SceneCache.restamp({"mood": "Calm"}, frame)
+        assert scene == {
+            "mood": "Calm",
+            "timestamp": 10.0,
+            "start_time": 9.0,
+            "end_time": 11.0,
+        }
+
+
+class TestSceneCaching:
+
+    @pytest.fixture
+    def llm_utils(self):
+        environ = {"GROQ_API_KEY": "key", "SCENE_CACHE_ENABLED": "true"}
+        with patch.dict("os.environ", environ), patch(
+            "utils.llm.global_llm_utils.Groq"
+        ), patch("utils.llm.scene_cache.redis.from_url"):
+            llm_utils = LLMUtils()
+        llm_utils.scene_cache.set_many = MagicMock()
+        return llm_utils
+
+    def test_only_primary_model_analyses_are_cached(self, llm_utils):
+        frame = make_frame()
+        scenes = [{"description": "Rain"}]
+        keys = {id(frame): "key"}
+
+        llm_utils._store_cached_scenes([frame], scenes, keys, "fast-model")
+        llm_utils.scene_cache.set_many.assert_not_called()
+
+        llm_utils._store_cached_scenes([frame], scenes, keys, llm_utils.vision_model)
+        llm_utils.scene_cache.set_many.assert_called_once_with({"key": scenes[0]})
@@ -0,0 +1,96 @@
+import random
+import pytest
+from utils.llm.llm_validators import LLMValidators
+from utils.llm.transcript_index import TranscriptIndex
+
+
+def linear_overlap(transcript, scene_start, scene_end):
+    result = []
+    for entry in transcript:
+        start_str, _, end_str = entry["timestamp"].partition(" - ")
+        start = float(start_str)
+        end = float(end_str or start_str)
+        if start < scene_end and end > scene_start:
+            result.append(entry)
+    return result
+
+
+@pytest.fixture
+def transcript():
+    return [
+        {"text": "a", "timestamp": "0.0 - 4.0"},
+        {"text": "b", "timestamp": "4.0 - 30.0"},
+        {"text": "c", "timestamp": "10.0 - 12.0"},
+        {"text": "d", "timestamp": "15.5"},
+        {"text": "e", "timestamp": "40.0 - 42.0"},
+    ]
+
+
+class TestTranscriptIndex:
+
+    def test_parses_and_sorts_entries(self):
+        index = TranscriptIndex(
+            [
+                {"text": "late", "timestamp": "5 - 6"},
+                {"text": "early", "timestamp": "1 - 2"},
+            ]
+        )
+        assert [entry["text"] for entry in index.entries] == ["early", "late"]
+        assert index.starts.tolist() == [1.0, 5.0]
+        assert index.ends.tolist() == [2.0, 6.0]
+
+    def test_skips_unparseable_entries(self):
+        index = TranscriptIndex(
+            [
+                {"text": "no timestamp"},
+                {"text": "bad", "timestamp": "abc - def"},
+                {"text": "ok", "timestamp": "1 - 2"},
+            ]
+        )
+        assert [entry["text"] for entry in index.entries] == ["ok"]
+
+    def test_query_finds_long_segment_starting_before_scene(self, transcript):
+        index = TranscriptIndex(transcript)
+        assert [entry["text"] for entry in index.query(20.0, 25.0)] == ["b"]
+
+    def test_query_excludes_touching_boundaries(self, transcript):
+        index = TranscriptIndex(transcript)
+        assert [entry["text"] for entry in index.query(30.0, 40.0)] == []
+
+    def test_query_includes_point_entries(self, transcript):
+        index = TranscriptIndex(transcript)
+        assert [entry["text"] for entry in index.query(15.0, 16.0)] == ["b", "d"]
+
+    def test_query_many_matches_linear_scan(self):
+        rng = random.Random(7)
+        transcript = []
+        for _ in range(300):
+            start = rng.uniform(0, 600)
+            transcript.append(
+                {
+                    "text": f"{start:.2f}",
+                    "timestamp": f"{start:.2f} - {start + rng.uniform(0, 20):.2f}",
+                }
+            )
+        transcript.sort(key=lambda entry: float(entry["text"]))
+        scenes = [(t, t + rng.uniform(0.5, 15)) for t in range(0, 600, 7)]
+
+        index = TranscriptIndex(transcript)
+        results = index.query_many([s for s, _ in scenes], [e for _, e in scenes])
+
+        for (start, end), result in zip(scenes, results):
+            assert result == linear_overlap(transcript, start, end)
+
+    def test_query_many_on_empty_index(self):
+        assert TranscriptIndex([]).query_many([0.0, 1.0], [1.0, 2.0]) == [[], []]
+
+    def test_window_returns_queryable_index(self, transcript):
+        window = TranscriptIndex(transcript).window(9.0, 20.0)
+        assert [entry["text"] for entry in window.entries] == ["b", "c", "d"]
+        assert [entry["text"] for entry in window.query(11.0, 12.0)] == ["b", "c"]
+
+    def test_extract_transcription_for_scene_accepts_index(self, transcript):
+        index = TranscriptIndex(transcript)
+        assert LLMValidators.extract_transcription_for_scene(
+            index, 0.0, 5.0
+        ) == LLMValidators.extract_transcription_for_scene(transcript, 0.0, 5.0)
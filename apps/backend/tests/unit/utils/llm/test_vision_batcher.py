@@ -0,0 +1,110 @@
+import base64
+import concurrent.futures
+from io import BytesIO
+import numpy as np
+import pytest
+from PIL import Image
+from models.frame import Frame
+from utils.llm.vision_batcher import PayloadLatencyModel, VisionBatcher
+
+
+def make_frame(pixels, timestamp=1.0):
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=95)
+    return Frame(
+        data=base64.b64encode(buffer.getvalue()).decode("utf-8"),
+        timestamp=timestamp,
+        scene_start=timestamp - 1.0,
+        scene_end=timestamp + 1.0,
+    )
+
+
+def noisy_frame(seed=0, timestamp=1.0):
+    rng = np.random.default_rng(seed)
+    return make_frame(
+        rng.integers(0, 255, size=(300, 540, 3), dtype=np.uint8), timestamp
+    )
+
+
+def flat_frame(timestamp=1.0):
+    return make_frame(np.full((300, 540, 3), 90, dtype=np.uint8), timestamp)
+
+
+@pytest.fixture
+def batcher():
+    return VisionBatcher(max_images=5, target_payload_bytes=1024 * 1024)
+
+
+@pytest.fixture
+def executor():
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+class TestPayloadLatencyModel:
+
+    def test_no_prediction_without_samples(self):
+        assert PayloadLatencyModel().predict(5, 100_000) is None
+
+    def test_fits_linear_latency(self):
+        model = PayloadLatencyModel()
+        for images in range(1, 6):
+            for kb in (50, 150, 300):
+                model.record(images, kb * 1024, 1.0 + 0.5 * images + 0.01 * kb)
+        assert model.predict(3, 200 * 1024) == pytest.approx(4.5)
+
+
+class TestVisionBatcher:
+
+    def test_cold_batcher_uses_max_batch_size(self, batcher):
+        assert batcher.choose_batch_size(frame_count=20, concurrency=10) == 5
+
+    def test_batch_size_limited_by_payload_target(self):
+        batcher = VisionBatcher(max_images=5, target_payload_bytes=150 * 1024)
+        assert batcher.choose_batch_size(frame_count=20, concurrency=10) == 2
+
+    def test_splits_batches_when_image_cost_dominates(self, batcher):
+        for images in range(1, 6):
+            for _ in range(3):
+                batcher.record(images, images * 60 * 1024, 0.2 + 2.0 * images)
+        assert batcher.choose_batch_size(frame_count=10, concurrency=10) == 1
+
+    def test_keeps_large_batches_when_requests_are_expensive(self, batcher):
+        for images in range(1, 6):
+            for _ in range(3):
+                batcher.record(images, images * 60 * 1024, 5.0 + 0.1 * images)
+        assert batcher.choose_batch_size(frame_count=40, concurrency=2) == 5
+
+    def test_simple_scene_sent_at_low_resolution(self, batcher):
+        frame = flat_frame()
+        shaped = Image.open(
+            BytesIO(base64.b64decode(batcher.shape_frame(frame, 10**6)))
+        )
+        assert shaped.width == VisionBatcher.SIMPLE_PROFILE[0]
+
+    def test_complex_scene_shrinks_to_byte_budget(self, batcher):
+        frame = noisy_frame()
+        generous = batcher.shape_frame(frame, 10**7)
+        tight = batcher.shape_frame(frame, 20 * 1024)
+        assert len(tight) < len(generous) <= len(frame.data)
+
+    def test_invalid_frame_is_passed_through(self, batcher):
+        frame = Frame(data="not-an-image", timestamp=0, scene_start=0, scene_end=1)
+        assert batcher.shape_frame(frame, 10**6) == "not-an-image"
+
+    def test_plan_packs_frames_in_order(self, batcher, executor):
+        frames = [noisy_frame(seed=i, timestamp=float(i)) for i in range(7)]
+        batches, payloads = batcher.plan(frames, concurrency=10, executor=executor)
+        assert [len(batch) for batch in batches] == [5, 2]
+        assert [frame for batch in batches for frame in batch] == frames
+        assert set(payloads) == {id(frame) for frame in frames}
+
+    def test_plan_respects_payload_target(self, executor):
+        batcher = VisionBatcher(max_images=5, target_payload_bytes=200 * 1024)
+        frames = [noisy_frame(seed=i, timestamp=float(i)) for i in range(6)]
+        batches, payloads = batcher.plan(frames, concurrency=10, executor=executor)
+        for batch in batches:
+            assert (
+                len(batch) == 1
+                or sum(len(payloads[id(frame)]) for frame in batch) <= 200 * 1024
+            )
@@ -0,0 +1,138 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from groq.types.chat import ChatCompletion
+from utils.provider.provider_utils import (
+    LLMProvider,
+    RecordingNotFoundError,
+    RecordingStore,
+)
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 1,
+    "model": "test-model",
+    "choices": [
+        {
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": '{"scene_analysis": []}'},
+        }
+    ],
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RecordingStore(str(tmp_path))
+
+
+@pytest.fixture
+def groq_client():
+    client = MagicMock()
+    client.chat.completions.create.return_value = ChatCompletion.model_validate(
+        COMPLETION
+    )
+    client.audio.transcriptions.create.return_value = {"text": "hello"}
+    return client
+
+
+class TestRecordingStore:
+
+    def test_request_key_is_stable_and_content_based(self):
+        key = RecordingStore.request_key("chat", {"model": "m", "messages": [1, 2]})
+        assert key == RecordingStore.request_key(
+            "chat", {"messages": [1, 2], "model": "m"}
+        )
+        assert key != RecordingStore.request_key(
+            "chat", {"model": "m", "messages": [2, 1]}
+        )
+
+    def test_request_key_hashes_bytes(self):
+        assert RecordingStore.request_key(
+            "transcription", {"file": ("a.wav", b"one")}
+        ) != RecordingStore.request_key("transcription", {"file": ("a.wav", b"two")})
+
+    def test_save_and_load(self, store):
+        store.save("key", {"file": b"abc"}, {"text": "hi"}, 0.5)
+        record = store.load("key")
+        assert record["response"] == {"text": "hi"}
+        assert record["latency"] == 0.5
+        assert record["request"]["file"]["size"] == 3
+
+    def test_load_missing(self, store):
+        assert store.load("missing") is None
+
+
+class TestLLMProvider:
+
+    def test_live_passes_through(self, groq_client):
+        provider = LLMProvider(groq_client)
+        provider.chat.completions.create(model="m", messages=[])
+        groq_client.chat.completions.create.assert_called_once_with(
+            model="m", messages=[]
+        )
+
+    def test_record_then_replay(self, groq_client, store):
+        LLMProvider(
+            groq_client, mode=LLMProvider.RECORD, store=store
+        ).chat.completions.create(
+            model="m", messages=[{"role": "user", "content": "hi"}], timeout=30
+        )
+
+        offline_client = MagicMock()
+        replayed = LLMProvider(
+            offline_client, mode=LLMProvider.REPLAY, store=store, replay_latency=0
+        ).chat.completions.create(
+            model="m", messages=[{"role": "user", "content": "hi"}], timeout=10
+        )
+
+        offline_client.chat.completions.create.assert_not_called()
+        assert isinstance(replayed, ChatCompletion)
+        assert replayed.choices[0].message.content == '{"scene_analysis": []}'
+
+    def test_replay_transcription(self, groq_client, store):
+        LLMProvider(
+            groq_client, mode=LLMProvider.RECORD, store=store
+        ).audio.transcriptions.create(file=("audio.wav", b"pcm"), model="whisper")
+
+        transcription = LLMProvider(
+            MagicMock(), mode=LLMProvider.REPLAY, store=store, replay_latency=0
+        ).audio.transcriptions.create(file=("audio.wav", b"pcm"), model="whisper")
+
+        assert transcription.model_dump() == {"text": "hello"}
+
+    def test_replay_miss_raises(self, store):
+        provider = LLMProvider(MagicMock(), mode=LLMProvider.REPLAY, store=store)
+        with pytest.raises(RecordingNotFoundError):
+            provider.chat.completions.create(model="m", messages=[])
+
+    @patch("utils.provider.provider_utils.time.sleep")
+    def test_replay_uses_recorded_latency(self, mock_sleep, store):
+        key = RecordingStore.request_key("chat", {"model": "m"})
+        store.save(key, {"model": "m"}, COMPLETION, 1.5)
+
+        LLMProvider(
+            MagicMock(), mode=LLMProvider.REPLAY, store=store
+        ).chat.completions.create(model="m")
+
+        mock_sleep.assert_called_once_with(1.5)
+
+    def test_invalid_mode(self, groq_client):
+        with pytest.raises(ValueError):
+            LLMProvider(groq_client, mode="offline")
+
+    def test_from_env(self, groq_client, tmp_path):
+        with patch.dict(
+            os.environ,
+            {
+                "LLM_PROVIDER_MODE": "replay",
+                "LLM_RECORDINGS_DIR": str(tmp_path),
+                "LLM_REPLAY_LATENCY": "0.25",
+            },
+        ):
+            provider = LLMProvider.from_env(groq_client)
+        assert provider.mode == LLMProvider.REPLAY
+        assert provider.store.directory == str(tmp_path)
+        assert provider.replay_latency == 0.25
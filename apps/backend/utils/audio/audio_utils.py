@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 from groq import Groq
 from shared.logging import get_logger
 from utils.helper.helper_utils import HelperUtils
+from utils.provider.provider_utils import LLMProvider
 
 logger = get_logger(__name__)
 load_dotenv()
@@ -13,7 +14,7 @@ load_dotenv()
 
 class AudioUtils:
     def __init__(self) -> None:
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.client = LLMProvider.from_env(Groq(api_key=os.getenv("GROQ_API_KEY")))
         self.whisper_model = os.getenv("WHISPER_MODEL", "whisper-large-v3-turbo")
         self.helper_utils = HelperUtils()
 
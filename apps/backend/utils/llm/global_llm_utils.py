@@ -1,6 +1,7 @@
 import os
+import time
 from groq import Groq
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 import concurrent.futures
 from models.llm_response import LLMResponse, MasterPlan
@@ -9,6 +10,13 @@ from shared.logging import get_logger
 from utils.llm.chat_history import ChatHistory
 from utils.llm.prompts import Prompts
 from utils.llm.llm_validators import LLMValidators
+from utils.llm.master_planner import MasterPlanner
+from utils.llm.prompt_builder import PromptBuilder
+from utils.llm.scene_cache import SceneCache
+from utils.llm.model_router import ModelRouter
+from utils.llm.transcript_index import TranscriptIndex
+from utils.llm.vision_batcher import VisionBatcher
+from utils.provider.provider_utils import LLMProvider
 
 logger = get_logger(__name__)
 load_dotenv()
@@ -19,22 +27,73 @@ class LLMUtils:
     MAX_RETRIES = 3
     RETRY_DELAY = 2
     MAX_FRAMES_PER_REQUEST = 5
+    MAX_PARALLEL_REQUESTS = 10
+    PLAN_ACT_SECONDS = 120
 
     def __init__(self, history: bool = False) -> None:
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY environment variable is required")
 
-        self.client: Groq = Groq(api_key=api_key)
+        self.client: LLMProvider = LLMProvider.from_env(Groq(api_key=api_key))
         self.vision_model = os.getenv(
             "GROQ_VISION_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct"
         )
         self.reasoning_model = os.getenv("GROQ_REASONING_MODEL", "openai/gpt-oss-120b")
         self.history: Optional[ChatHistory] = ChatHistory() if history else None
+        self.prompt_builder = PromptBuilder(
+            token_budget=int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "8000")),
+            compact=os.getenv("LLM_COMPACT_PROMPTS", "true").lower() == "true",
+        )
+        hedge_ratio = float(os.getenv("LLM_HEDGE_RATIO", "0.1"))
+        latency_slo = float(os.getenv("LLM_LATENCY_SLO_SECONDS", "10"))
+        self.vision_router = ModelRouter(
+            large_model=self.vision_model,
+            fast_model=os.getenv("GROQ_VISION_MODEL_FAST"),
+            max_timeout=self.API_TIMEOUT,
+            hedge_ratio=hedge_ratio,
+            fast_max_input_tokens=int(
+                os.getenv("LLM_FAST_VISION_MAX_INPUT_TOKENS", "3000")
+            ),
+            latency_slo=latency_slo,
+        )
+        self.reasoning_router = ModelRouter(
+            large_model=self.reasoning_model,
+            fast_model=os.getenv("GROQ_REASONING_MODEL_FAST", "openai/gpt-oss-20b"),
+            max_timeout=self.API_TIMEOUT,
+            hedge_ratio=hedge_ratio,
+            fast_max_input_tokens=int(
+                os.getenv("LLM_FAST_PLAN_MAX_INPUT_TOKENS", "3000")
+            ),
+            fast_max_items=int(os.getenv("LLM_FAST_PLAN_MAX_SCENES", "8")),
+            latency_slo=latency_slo,
+        )
+        self.vision_batcher = VisionBatcher.for_model(
+            self.vision_model,
+            max_images=self.MAX_FRAMES_PER_REQUEST,
+            target_payload_bytes=int(os.getenv("LLM_VISION_TARGET_PAYLOAD_KB", "1024"))
+            * 1024,
+            simple_scenes=os.getenv("LLM_VISION_SIMPLE_SCENES", "true").lower()
+            == "true",
+        )
+        self.scene_cache: Optional[SceneCache] = None
+        if os.getenv("SCENE_CACHE_ENABLED", "false").lower() == "true":
+            self.scene_cache = SceneCache(
+                redis_url=os.getenv("REDIS_URL", "redis://localhost:6379"),
+                ttl=int(os.getenv("SCENE_CACHE_TTL", "604800")),
+                namespace=SceneCache.prompt_namespace(
+                    self.vision_model, self.prompt_builder.build_scene_system_prompt()
+                ),
+            )
 
     def _process_chunk(
-        self, chunk: List[Frame], transcript: List[dict], system_prompt: str
-    ) -> List[dict]:
+        self,
+        chunk: List[Frame],
+        frame_transcripts: Dict[int, List[dict]],
+        system_prompt: str,
+        frame_payloads: Dict[int, str],
+    ) -> Tuple[List[dict], str]:
+        """The chunk's scene analyses and the model that produced them"""
         scene_data = []
         for scene in chunk:
             scene_data.append(
@@ -42,22 +101,23 @@ class LLMUtils:
                     "timestamp": scene.timestamp,
                     "scene_start": scene.scene_start,
                     "scene_end": scene.scene_end,
-                    "transcription": LLMValidators.extract_transcription_for_scene(
-                        transcript, scene.scene_start, scene.scene_end
-                    ),
+                    "transcription": frame_transcripts.get(id(scene), []),
                 }
             )
 
-        user_prompt = Prompts.get_global_context_user_prompt(scene_data=scene_data)
+        user_prompt = self.prompt_builder.build_scene_prompt(scene_data=scene_data)
 
         content = []
         content.append({"type": "text", "text": user_prompt})
+        payload_bytes = 0
         for frame in chunk:
+            payload = frame_payloads.get(id(frame), frame.data)
+            payload_bytes += len(payload)
             content.append(
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{frame.data}",
+                        "url": f"data:image/jpeg;base64,{payload}",
                     },
                 }
             )
@@ -67,30 +127,44 @@ class LLMUtils:
             {"role": "user", "content": content},
         ]
 
-        logger.info("Sending request to LLM for global configuration chunk.")
+        input_tokens = PromptBuilder.estimate_messages_tokens(messages)
+        logger.info(
+            f"Sending request to LLM for global configuration chunk "
+            f"(~{input_tokens} input tokens)."
+        )
 
+        model = self.vision_router.route(input_tokens, len(chunk))
         for attempt in range(self.MAX_RETRIES):
+            start = time.monotonic()
             response = LLMValidators.make_api_call_with_retry(
                 self.client,
                 self.MAX_RETRIES,
                 self.RETRY_DELAY,
                 self.API_TIMEOUT,
-                model=self.vision_model,
+                hedger=self.vision_router.hedger(model),
+                model=model,
                 messages=messages,
                 stream=False,
                 temperature=0.7,
-                max_tokens=1000,
+                max_tokens=self.prompt_builder.scene_max_tokens(len(chunk)),
+            )
+            self.vision_batcher.record(
+                len(chunk), payload_bytes, time.monotonic() - start
             )
 
             logger.debug(f"LLM Response (attempt {attempt + 1}): {response}")
             logger.info("Parsing response.")
 
             try:
-                return LLMValidators.parse_scene_analysis(response, chunk)
+                scenes = LLMValidators.parse_scene_analysis(response, chunk)
+                if not scenes:
+                    raise ValueError("No scenes could be parsed from the response")
+                return scenes, model
             except Exception as parse_error:
                 logger.warning(f"Parse attempt {attempt + 1} failed: {parse_error}")
 
                 if attempt < self.MAX_RETRIES - 1:
+                    model = self.vision_router.escalate(model)
                     logger.info(
                         f"Retrying LLM call due to parsing failure (attempt {attempt + 2}/{self.MAX_RETRIES})"
                     )
@@ -98,11 +172,196 @@ class LLMUtils:
                     logger.error(
                         f"All parsing attempts failed for chunk. Last error: {parse_error}"
                     )
-                    return []
-        return []
+                    return [], model
+        return [], model
+
+    def _lookup_cached_scenes(
+        self, frames: List[Frame], frame_transcripts: Dict[int, List[dict]]
+    ) -> Tuple[List[dict], List[Frame], Dict[int, str]]:
+        if not self.scene_cache:
+            return [], frames, {}
+
+        frame_keys: Dict[int, str] = {}
+        for frame in frames:
+            try:
+                frame_keys[id(frame)] = self.scene_cache.scene_key(
+                    frame, frame_transcripts.get(id(frame), [])
+                )
+            except Exception as e:
+                logger.warning(f"Could not fingerprint frame at {frame.timestamp}: {e}")
+
+        keyed_frames = [frame for frame in frames if id(frame) in frame_keys]
+        cached = self.scene_cache.get_many(
+            [frame_keys[id(frame)] for frame in keyed_frames]
+        )
+
+        cached_scenes = []
+        cached_ids = set()
+        for frame, scene in zip(keyed_frames, cached):
+            if scene is not None:
+                cached_scenes.append(SceneCache.restamp(scene, frame))
+                cached_ids.add(id(frame))
+                del frame_keys[id(frame)]
+
+        uncached_frames = [frame for frame in frames if id(frame) not in cached_ids]
+        return cached_scenes, uncached_frames, frame_keys
+
+    def _store_cached_scenes(
+        self,
+        chunk: List[Frame],
+        chunk_result: List[dict],
+        frame_keys: Dict[int, str],
+        model: str,
+    ) -> None:
+        if not self.scene_cache:
+            return
+        if model != self.vision_model:
+            # The namespace is the primary model's, fast tier analyses would be served as its
+            return
+        if len(chunk_result) != len(chunk):
+            # Analyses are matched to frames by position, a short reply would misalign them
+            logger.warning(
+                f"Not caching scene analysis: got {len(chunk_result)} results for {len(chunk)} frames"
+            )
+            return
+
+        self.scene_cache.set_many(
+            {
+                frame_keys[id(frame)]: scene
+                for frame, scene in zip(chunk, chunk_result)
+                if id(frame) in frame_keys
+            }
+        )
+
+    def _generate_master_plan(self, global_prompt: str, scene_count: int) -> MasterPlan:
+        messages = []
+        messages.append({"role": "user", "content": global_prompt})
+
+        model = self.reasoning_router.route(
+            PromptBuilder.estimate_tokens(global_prompt), scene_count
+        )
+        master_plan = None
+        for attempt in range(self.MAX_RETRIES):
+            try:
+                response = LLMValidators.make_api_call_with_retry(
+                    self.client,
+                    self.MAX_RETRIES,
+                    self.RETRY_DELAY,
+                    self.API_TIMEOUT,
+                    hedger=self.reasoning_router.hedger(model),
+                    model=model,
+                    messages=messages,
+                    stream=False,
+                    temperature=0.7,
+                )
+
+                if not response.choices or not response.choices[0].message.content:
+                    logger.error("No content in LLM response for master plan")
+                    raise ValueError("No content in LLM response for master plan")
+
+                logger.info(response.choices[0].message.content)
+
+                master_plan = LLMValidators.validate_master_plan_response(
+                    response.choices[0].message.content
+                )
+                break
+
+            except Exception as parse_error:
+                logger.warning(
+                    f"Master plan parse attempt {attempt + 1} failed: {parse_error}"
+                )
+
+                if attempt < self.MAX_RETRIES - 1:
+                    model = self.reasoning_router.escalate(model)
+                    logger.info(
+                        f"Retrying master plan generation due to parsing failure (attempt {attempt + 2}/{self.MAX_RETRIES})"
+                    )
+                else:
+                    logger.error(
+                        f"All master plan parsing attempts failed. Last error: {parse_error}"
+                    )
+                    raise parse_error
+
+        if master_plan is None:
+            raise ValueError("Failed to generate valid master plan after all retries")
+
+        return master_plan
+
+    def _plan_master_plan(
+        self,
+        scene_analysis: List[dict],
+        transcript: TranscriptIndex,
+        previous_plan: Optional[MasterPlan] = None,
+    ) -> MasterPlan:
+        continuation_context = ""
+        start_time = 0.0
+        if previous_plan and previous_plan.musical_blocks:
+            continuation_context = Prompts.get_plan_continuation_context(previous_plan)
+            start_time = float(previous_plan.musical_blocks[-1].time_range["end"])
+
+        acts = MasterPlanner.split_into_acts(
+            scene_analysis, self.PLAN_ACT_SECONDS, start_time=start_time
+        )
+
+        if len(acts) <= 1:
+            global_prompt = self.prompt_builder.build_master_plan_prompt(
+                scenes=scene_analysis,
+                transcript=transcript,
+                plan_context=continuation_context,
+            )
+            return self._generate_master_plan(global_prompt, len(scene_analysis))
+
+        logger.info(f"Planning {len(acts)} acts in parallel.")
+
+        outline = MasterPlanner.summarize_acts(acts)
+        act_prompts = []
+        for i, act in enumerate(acts):
+            plan_context = Prompts.get_act_plan_context(
+                act_number=i + 1,
+                act_count=len(acts),
+                start_time=act.start,
+                end_time=act.end,
+                outline=outline,
+            )
+            if i == 0:
+                plan_context = continuation_context + plan_context
+
+            act_prompts.append(
+                self.prompt_builder.build_master_plan_prompt(
+                    scenes=act.scenes,
+                    transcript=transcript.window(act.start, act.end),
+                    plan_context=plan_context,
+                )
+            )
+
+        act_plans: List[Optional[MasterPlan]] = [None] * len(acts)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(len(acts), 10)
+        ) as executor:
+            future_to_index = {
+                executor.submit(
+                    self._generate_master_plan, prompt, len(acts[i].scenes)
+                ): i
+                for i, prompt in enumerate(act_prompts)
+            }
+
+            for future in concurrent.futures.as_completed(future_to_index):
+                i = future_to_index[future]
+                try:
+                    act_plans[i] = future.result()
+                except Exception as exc:
+                    logger.error(f"Act {i + 1} planning generated an exception: {exc}")
+
+        if not any(act_plans):
+            raise ValueError("Failed to generate a plan for any act")
+
+        return MasterPlanner.reduce_plans(acts, act_plans)
 
     def get_global_config(
-        self, transcript: List[dict], frames: List[Frame]
+        self,
+        transcript: List[dict],
+        frames: List[Frame],
+        previous_plan: Optional[MasterPlan] = None,
     ) -> LLMResponse:
         logger.info("Generating global configuration for video.")
 
@@ -110,84 +369,58 @@ class LLMUtils:
             LLMValidators.validate_transcript(transcript)
             LLMValidators.validate_frames(frames)
 
-            system_prompt = Prompts.get_global_context_prompt()
-            chunks = LLMValidators.chunk_frames(frames, self.MAX_FRAMES_PER_REQUEST)
-
-            logger.info(f"Processing {len(chunks)} chunks in parallel.")
+            transcript_index = TranscriptIndex(transcript)
+            scene_transcripts = transcript_index.query_many(
+                [frame.scene_start for frame in frames],
+                [frame.scene_end for frame in frames],
+            )
+            frame_transcripts = {
+                id(frame): scene_transcript
+                for frame, scene_transcript in zip(frames, scene_transcripts)
+            }
+
+            system_prompt = self.prompt_builder.build_scene_system_prompt()
+            scene_analysis, uncached_frames, frame_keys = self._lookup_cached_scenes(
+                frames, frame_transcripts
+            )
 
             with concurrent.futures.ThreadPoolExecutor(
-                max_workers=min(len(chunks), 10)
+                max_workers=self.MAX_PARALLEL_REQUESTS
             ) as executor:
+                chunks, frame_payloads = self.vision_batcher.plan(
+                    uncached_frames, self.MAX_PARALLEL_REQUESTS, executor
+                )
+
+                logger.info(f"Processing {len(chunks)} chunks in parallel.")
+
                 future_to_chunk = {
                     executor.submit(
-                        self._process_chunk, chunk, transcript, system_prompt
+                        self._process_chunk,
+                        chunk,
+                        frame_transcripts,
+                        system_prompt,
+                        frame_payloads,
                     ): chunk
                     for chunk in chunks
                 }
 
-                scene_analysis = []
                 for future in concurrent.futures.as_completed(future_to_chunk):
                     try:
-                        chunk_result = future.result()
+                        chunk_result, model = future.result()
                         scene_analysis.extend(chunk_result)
+                        self._store_cached_scenes(
+                            future_to_chunk[future], chunk_result, frame_keys, model
+                        )
                     except Exception as exc:
                         _ = future_to_chunk[future]
                         logger.error(f"Chunk processing generated an exception: {exc}")
 
             logger.info("Generating master plan based on scene analysis.")
 
-            global_prompt = Prompts.get_global_summary_plan_prompt(
-                scenes=scene_analysis, transcription=transcript
+            master_plan = self._plan_master_plan(
+                scene_analysis, transcript_index, previous_plan
             )
 
-            messages = []
-            messages.append({"role": "user", "content": global_prompt})
-
-            master_plan = None
-            for attempt in range(self.MAX_RETRIES):
-                try:
-                    response = LLMValidators.make_api_call_with_retry(
-                        self.client,
-                        self.MAX_RETRIES,
-                        self.RETRY_DELAY,
-                        self.API_TIMEOUT,
-                        model=self.reasoning_model,
-                        messages=messages,
-                        stream=False,
-                        temperature=0.7,
-                    )
-
-                    if not response.choices or not response.choices[0].message.content:
-                        logger.error("No content in LLM response for master plan")
-                        raise ValueError("No content in LLM response for master plan")
-
-                    logger.info(response.choices[0].message.content)
-
-                    master_plan = LLMValidators.validate_master_plan_response(
-                        response.choices[0].message.content
-                    )
-                    break
-
-                except Exception as parse_error:
-                    logger.warning(
-                        f"Master plan parse attempt {attempt + 1} failed: {parse_error}"
-                    )
-
-                    if attempt < self.MAX_RETRIES - 1:
-                        logger.info(
-                            f"Retrying master plan generation due to parsing failure (attempt {attempt + 2}/{self.MAX_RETRIES})"
-                        )
-                    else:
-                        logger.error(
-                            f"All master plan parsing attempts failed. Last error: {parse_error}"
-                        )
-                        raise parse_error
-
-            if master_plan is None:
-                raise ValueError(
-                    "Failed to generate valid master plan after all retries"
-                )
-
             return LLMResponse(
                 scene_analysis=scene_analysis,
                 master_plan=master_plan,
@@ -0,0 +1,140 @@
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional, TypeVar
+from groq import APITimeoutError
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+_HEDGE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=32, thread_name_prefix="llm-hedge"
+)
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200) -> None:
+        self.samples: deque = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self.lock:
+            self.samples.append(seconds)
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self.samples)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        with self.lock:
+            if not self.samples:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """Token bucket: every request earns `ratio` tokens and every hedge spends one"""
+
+    def __init__(self, ratio: float = 0.1, burst: float = 3.0) -> None:
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self.lock = threading.Lock()
+
+    def on_request(self) -> None:
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self.lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+
+class HedgedCaller:
+    HEDGE_PERCENTILE = 95
+    TIMEOUT_PERCENTILE = 99
+    TIMEOUT_MULTIPLIER = 3.0
+    MIN_TIMEOUT = 10.0
+    MIN_SAMPLES = 10
+
+    _callers: Dict[str, "HedgedCaller"] = {}
+    _callers_lock = threading.Lock()
+
+    def __init__(self, max_timeout: float, hedge_ratio: float = 0.1) -> None:
+        self.max_timeout = max_timeout
+        self.tracker = LatencyTracker()
+        self.budget = HedgeBudget(ratio=hedge_ratio)
+
+    @classmethod
+    def for_model(
+        cls, model: str, max_timeout: float, hedge_ratio: float = 0.1
+    ) -> "HedgedCaller":
+        with cls._callers_lock:
+            if model not in cls._callers:
+                cls._callers[model] = cls(
+                    max_timeout=max_timeout, hedge_ratio=hedge_ratio
+                )
+            return cls._callers[model]
+
+    def attempt_timeout(self) -> float:
+        if self.tracker.count() < self.MIN_SAMPLES:
+            return self.max_timeout
+        tail = self.tracker.percentile(self.TIMEOUT_PERCENTILE) or self.max_timeout
+        return min(
+            self.max_timeout, max(self.MIN_TIMEOUT, tail * self.TIMEOUT_MULTIPLIER)
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        if self.tracker.count() < self.MIN_SAMPLES:
+            return None
+        return self.tracker.percentile(self.HEDGE_PERCENTILE)
+
+    def _timed(self, request: Callable[[float], T], timeout: float) -> T:
+        start = time.monotonic()
+        try:
+            response = request(timeout)
+        except APITimeoutError:
+            self.tracker.record(timeout)
+            raise
+        self.tracker.record(time.monotonic() - start)
+        return response
+
+    def call(self, request: Callable[[float], T]) -> T:
+        timeout = self.attempt_timeout()
+        self.budget.on_request()
+
+        pending = {_HEDGE_EXECUTOR.submit(self._timed, request, timeout)}
+
+        delay = self.hedge_delay()
+        if delay is not None:
+            done, _ = concurrent.futures.wait(pending, timeout=delay)
+            if not done and self.budget.try_spend():
+                logger.info(
+                    f"Request slower than p{self.HEDGE_PERCENTILE} ({delay:.2f}s), sending hedge"
+                )
+                pending.add(_HEDGE_EXECUTOR.submit(self._timed, request, timeout))
+
+        last_exception: Optional[BaseException] = None
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_exception = e
+
+        raise (
+            last_exception
+            if last_exception
+            else Exception("Hedged request finished without a result")
+        )
@@ -3,11 +3,14 @@ import time
 import base64
 from google.genai import types
 from groq.types.chat import ChatCompletion
-from typing import Dict, List
+from typing import Dict, List, Optional, Union
+from groq import APITimeoutError
 from models.frame import Frame
 from models.lyria_config import LyriaConfig
 from models.llm_response import LLMResponse, MasterPlan, MusicBlocks
 from shared.logging import get_logger
+from utils.llm.hedging import HedgedCaller
+from utils.llm.transcript_index import TranscriptIndex
 
 logger = get_logger(__name__)
 
@@ -75,35 +78,49 @@ class LLMValidators:
             weight=lyria_config_data["weight"],
         )
 
+    @staticmethod
+    def create_chat_completion(client, **kwargs) -> ChatCompletion:
+        response = client.chat.completions.create(**kwargs)
+
+        if not response or not response.choices or not response.choices[0]:
+            raise ValueError("Invalid response structure from API")
+
+        if not response.choices[0].message or not response.choices[0].message.content:
+            raise ValueError("No content in API response")
+
+        return response
+
     @staticmethod
     def make_api_call_with_retry(
-        client, max_retries: int, retry_delay: int, api_timeout: int, **kwargs
+        client,
+        max_retries: int,
+        retry_delay: int,
+        api_timeout: int,
+        hedger: Optional[HedgedCaller] = None,
+        **kwargs,
     ) -> ChatCompletion:
         last_exception = None
 
         for attempt in range(max_retries):
             try:
-                kwargs["timeout"] = api_timeout
-
-                response = client.chat.completions.create(**kwargs)
-
-                if not response or not response.choices or not response.choices[0]:
-                    raise ValueError("Invalid response structure from API")
-
-                if (
-                    not response.choices[0].message
-                    or not response.choices[0].message.content
-                ):
-                    raise ValueError("No content in API response")
+                if hedger:
+                    return hedger.call(
+                        lambda timeout: LLMValidators.create_chat_completion(
+                            client, timeout=timeout, **kwargs
+                        )
+                    )
 
-                return response
+                kwargs["timeout"] = api_timeout
+                return LLMValidators.create_chat_completion(client, **kwargs)
 
             except Exception as e:
                 last_exception = e
                 logger.warning(f"API call attempt {attempt + 1} failed: {e}")
 
                 if attempt < max_retries - 1:
-                    time.sleep(retry_delay * (attempt + 1))
+                    # A timed out attempt already waited long enough, retry right away
+                    if not isinstance(e, APITimeoutError):
+                        time.sleep(retry_delay * (attempt + 1))
                 else:
                     logger.error(f"All {max_retries} API call attempts failed")
 
@@ -173,36 +190,17 @@ class LLMValidators:
 
     @staticmethod
     def extract_transcription_for_scene(
-        transcript: List[Dict], scene_start: float, scene_end: float
+        transcript: Union[TranscriptIndex, List[Dict]],
+        scene_start: float,
+        scene_end: float,
     ) -> List[dict]:
         if not transcript:
             return []
 
-        filtered_transcript = []
-
-        for entry in transcript:
-            if "timestamp" not in entry:
-                continue
-
-            timestamp = entry["timestamp"]
-
-            try:
-                if " - " in timestamp:
-                    start_str, end_str = timestamp.split(" - ")
-                    entry_start = float(start_str)
-                    entry_end = float(end_str)
-                else:
-                    entry_start = float(timestamp)
-                    entry_end = entry_start
-
-                if entry_start < scene_end and entry_end > scene_start:
-                    filtered_transcript.append(entry)
-
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Could not parse timestamp '{timestamp}': {e}")
-                continue
+        if not isinstance(transcript, TranscriptIndex):
+            transcript = TranscriptIndex(transcript)
 
-        return filtered_transcript
+        return transcript.query(scene_start, scene_end)
 
     @staticmethod
     def validate_master_plan_response(content: str) -> MasterPlan:
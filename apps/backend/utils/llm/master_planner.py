@@ -0,0 +1,149 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional
+from models.llm_response import MasterPlan, MusicBlocks
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class PlanAct:
+    start: float
+    end: float
+    scenes: List[dict] = field(default_factory=list)
+
+
+class MasterPlanner:
+    BPM_SNAP_TOLERANCE = 8
+    MIN_KEY_CHANGE_SECONDS = 45.0
+
+    @staticmethod
+    def split_into_acts(
+        scene_analysis: List[dict], act_seconds: float, start_time: float = 0.0
+    ) -> List[PlanAct]:
+        scenes = sorted(scene_analysis, key=lambda scene: scene.get("start_time", 0.0))
+        if not scenes:
+            return []
+
+        acts = [PlanAct(start=start_time, end=start_time)]
+        for scene in scenes:
+            act = acts[-1]
+            if act.scenes and act.end - act.start >= act_seconds:
+                act = PlanAct(start=act.end, end=act.end)
+                acts.append(act)
+            act.scenes.append(scene)
+            act.end = max(act.end, float(scene.get("end_time", act.end)))
+
+        return acts
+
+    @staticmethod
+    def summarize_acts(acts: List[PlanAct]) -> str:
+        lines = []
+        for i, act in enumerate(acts):
+            moods = list(
+                dict.fromkeys(
+                    str(scene["mood"]) for scene in act.scenes if scene.get("mood")
+                )
+            )
+            keywords = Counter(
+                str(keyword).lower()
+                for scene in act.scenes
+                for keyword in scene.get("keywords", [])
+            )
+            lines.append(
+                f"- Act {i + 1} ({act.start:.0f}s-{act.end:.0f}s): "
+                f"mood {', '.join(moods[:3]) or 'unknown'}; "
+                f"keywords {', '.join(word for word, _ in keywords.most_common(5)) or 'none'}"
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def reduce_plans(
+        acts: List[PlanAct], act_plans: List[Optional[MasterPlan]]
+    ) -> MasterPlan:
+        musical_blocks: List[MusicBlocks] = []
+        act_ranges = []
+        contexts = []
+
+        for act, plan in zip(acts, act_plans):
+            if plan is None or not plan.musical_blocks:
+                if musical_blocks:
+                    logger.warning(
+                        f"No plan for act {act.start:.0f}s-{act.end:.0f}s, extending previous block"
+                    )
+                    musical_blocks[-1].time_range["end"] = act.end
+                continue
+
+            if plan.global_context not in contexts:
+                contexts.append(plan.global_context)
+
+            act_start_index = len(musical_blocks)
+            blocks = sorted(
+                plan.musical_blocks, key=lambda block: float(block.time_range["start"])
+            )
+            for block in blocks:
+                start = max(float(block.time_range["start"]), act.start)
+                end = min(float(block.time_range["end"]), act.end)
+                if end <= start:
+                    continue
+                if musical_blocks:
+                    start = float(musical_blocks[-1].time_range["end"])
+                    if end <= start:
+                        continue
+                block.time_range = {"start": start, "end": end}
+                musical_blocks.append(block)
+
+            if len(musical_blocks) > act_start_index:
+                musical_blocks[-1].time_range["end"] = act.end
+                act_ranges.append((act_start_index, len(musical_blocks)))
+
+        if musical_blocks:
+            # Cover the opening when the first act has no plan or starts late
+            musical_blocks[0].time_range["start"] = acts[0].start
+
+        MasterPlanner._harmonize_scales(musical_blocks, act_ranges)
+        MasterPlanner._snap_bpms(musical_blocks)
+
+        return MasterPlan(
+            global_context=" → ".join(contexts) or "Default Concept",
+            musical_blocks=musical_blocks,
+        )
+
+    @staticmethod
+    def _harmonize_scales(
+        musical_blocks: List[MusicBlocks], act_ranges: List[tuple]
+    ) -> None:
+        # Only where one act's plan meets the next: a new key there has to hold for
+        # MIN_KEY_CHANGE_SECONDS, key changes the act planner placed inside an act stay
+        for start_index, end_index in act_ranges:
+            if start_index == 0:
+                continue
+            previous_scale = musical_blocks[start_index - 1].lyria_config.scale
+            act_scale = musical_blocks[start_index].lyria_config.scale
+            if act_scale == previous_scale:
+                continue
+
+            run_end = start_index
+            run_duration = 0.0
+            while (
+                run_end < end_index
+                and musical_blocks[run_end].lyria_config.scale == act_scale
+            ):
+                time_range = musical_blocks[run_end].time_range
+                run_duration += float(time_range["end"]) - float(time_range["start"])
+                run_end += 1
+
+            if run_duration < MasterPlanner.MIN_KEY_CHANGE_SECONDS:
+                for block in musical_blocks[start_index:run_end]:
+                    block.lyria_config.scale = previous_scale
+
+    @staticmethod
+    def _snap_bpms(musical_blocks: List[MusicBlocks]) -> None:
+        for previous, block in zip(musical_blocks, musical_blocks[1:]):
+            if (
+                block.lyria_config.scale == previous.lyria_config.scale
+                and abs(block.lyria_config.bpm - previous.lyria_config.bpm)
+                <= MasterPlanner.BPM_SNAP_TOLERANCE
+            ):
+                block.lyria_config.bpm = previous.lyria_config.bpm
@@ -0,0 +1,73 @@
+from typing import Optional
+from shared.logging import get_logger
+from utils.llm.hedging import HedgedCaller
+
+logger = get_logger(__name__)
+
+
+class ModelRouter:
+    """Sends small requests to a fast model tier and everything else, including retries after bad output, to the large one"""
+
+    LATENCY_PERCENTILE = 95
+    # Inputs up to this multiple of the fast limits still go fast when the large model misses its SLO
+    SLO_OVERFLOW = 2
+
+    def __init__(
+        self,
+        large_model: str,
+        fast_model: Optional[str],
+        max_timeout: float,
+        hedge_ratio: float = 0.1,
+        fast_max_input_tokens: int = 3000,
+        fast_max_items: Optional[int] = None,
+        latency_slo: Optional[float] = None,
+    ) -> None:
+        self.large_model = large_model
+        self.fast_model = (
+            fast_model if fast_model and fast_model != large_model else None
+        )
+        self.max_timeout = max_timeout
+        self.hedge_ratio = hedge_ratio
+        self.fast_max_input_tokens = fast_max_input_tokens
+        self.fast_max_items = fast_max_items
+        self.latency_slo = latency_slo
+
+    def hedger(self, model: str) -> HedgedCaller:
+        return HedgedCaller.for_model(
+            model, max_timeout=self.max_timeout, hedge_ratio=self.hedge_ratio
+        )
+
+    def _fits_fast(self, input_tokens: int, item_count: int, scale: int = 1) -> bool:
+        if input_tokens > self.fast_max_input_tokens * scale:
+            return False
+        return self.fast_max_items is None or item_count <= self.fast_max_items * scale
+
+    def _large_misses_slo(self) -> bool:
+        if self.latency_slo is None:
+            return False
+        hedger = self.hedger(self.large_model)
+        if hedger.tracker.count() < HedgedCaller.MIN_SAMPLES:
+            return False
+        latency = hedger.tracker.percentile(self.LATENCY_PERCENTILE)
+        return latency is not None and latency > self.latency_slo
+
+    def route(self, input_tokens: int, item_count: int) -> str:
+        if not self.fast_model:
+            return self.large_model
+
+        if self._fits_fast(input_tokens, item_count):
+            model = self.fast_model
+        elif self._large_misses_slo() and self._fits_fast(
+            input_tokens, item_count, scale=self.SLO_OVERFLOW
+        ):
+            model = self.fast_model
+        else:
+            model = self.large_model
+
+        logger.info(f"Routing {item_count} items (~{input_tokens} tokens) to {model}")
+        return model
+
+    def escalate(self, model: str) -> str:
+        if model != self.large_model:
+            logger.info(f"Escalating from {model} to {self.large_model}")
+        return self.large_model
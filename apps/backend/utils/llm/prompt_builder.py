@@ -0,0 +1,220 @@
+import math
+from typing import List, Optional, Tuple, Union
+from shared.logging import get_logger
+from utils.llm.prompts import Prompts
+from utils.llm.transcript_index import TranscriptIndex
+
+logger = get_logger(__name__)
+
+
+class PromptBuilder:
+    CHARS_PER_TOKEN = 4
+    IMAGE_TOKENS = 800
+    SCENE_OUTPUT_TOKENS = 60
+    LEGACY_SCENE_OUTPUT_TOKENS = 180
+    BLOCK_OUTPUT_TOKENS = 90
+    LEGACY_BLOCK_OUTPUT_TOKENS = 160
+    SECONDS_PER_BLOCK = 45
+    MIN_SCENE_MAX_TOKENS = 256
+    LEGACY_SCENE_MAX_TOKENS = 1000
+    # (description chars, dialogue chars) tried in order until the prompt fits,
+    # after which dialogue rows are thinned out up to MAX_DIALOGUE_STRIDE
+    TRIM_LEVELS: List[Tuple[Optional[int], Optional[int]]] = [
+        (None, None),
+        (160, 200),
+        (80, 120),
+        (40, 60),
+        (0, 40),
+    ]
+    MAX_DIALOGUE_STRIDE = 8
+
+    def __init__(self, token_budget: int = 8000, compact: bool = True) -> None:
+        self.token_budget = token_budget
+        self.compact = compact
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return math.ceil(len(text) / PromptBuilder.CHARS_PER_TOKEN)
+
+    @staticmethod
+    def estimate_messages_tokens(messages: List[dict]) -> int:
+        tokens = 0
+        for message in messages:
+            content = message.get("content", "")
+            if isinstance(content, str):
+                tokens += PromptBuilder.estimate_tokens(content)
+                continue
+            for part in content:
+                if part.get("type") == "text":
+                    tokens += PromptBuilder.estimate_tokens(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    tokens += PromptBuilder.IMAGE_TOKENS
+        return tokens
+
+    def estimate_scene_output_tokens(self, scene_count: int) -> int:
+        per_scene = (
+            self.SCENE_OUTPUT_TOKENS
+            if self.compact
+            else self.LEGACY_SCENE_OUTPUT_TOKENS
+        )
+        return scene_count * per_scene
+
+    def estimate_plan_output_tokens(self, duration: float) -> int:
+        per_block = (
+            self.BLOCK_OUTPUT_TOKENS
+            if self.compact
+            else self.LEGACY_BLOCK_OUTPUT_TOKENS
+        )
+        return (int(duration // self.SECONDS_PER_BLOCK) + 1) * per_block
+
+    def scene_max_tokens(self, scene_count: int) -> int:
+        if not self.compact:
+            return self.LEGACY_SCENE_MAX_TOKENS
+        return max(
+            self.MIN_SCENE_MAX_TOKENS,
+            2 * self.estimate_scene_output_tokens(scene_count),
+        )
+
+    def build_scene_system_prompt(self) -> str:
+        if not self.compact:
+            return Prompts.get_global_context_prompt()
+        return Prompts.get_compact_global_context_prompt()
+
+    def build_scene_prompt(self, scene_data: List[dict]) -> str:
+        if not self.compact:
+            return Prompts.get_global_context_user_prompt(scene_data=scene_data)
+
+        scene_rows = "\n".join(
+            f"{i}|{self._num(scene['timestamp'])}|{self._num(scene['scene_start'])}|{self._num(scene['scene_end'])}"
+            for i, scene in enumerate(scene_data)
+        )
+
+        dialogue = []
+        seen = set()
+        for scene in scene_data:
+            for entry in scene.get("transcription", []):
+                key = (entry.get("timestamp"), entry.get("text"))
+                if key not in seen:
+                    seen.add(key)
+                    dialogue.append(entry)
+        dialogue_index = TranscriptIndex(dialogue)
+
+        def render(description_limit, dialogue_limit, dialogue_stride):
+            return Prompts.get_compact_global_context_user_prompt(
+                scene_rows=scene_rows,
+                dialogue_rows=self.encode_transcript(
+                    dialogue_index, dialogue_limit, dialogue_stride
+                ),
+            )
+
+        return self._fit(render, "scene analysis")
+
+    def build_master_plan_prompt(
+        self,
+        scenes: List[dict],
+        transcript: Union[TranscriptIndex, List[dict]],
+        plan_context: str = "",
+    ) -> str:
+        if not isinstance(transcript, TranscriptIndex):
+            transcript = TranscriptIndex(transcript)
+
+        if not self.compact:
+            prompt = Prompts.get_global_summary_plan_prompt(
+                scenes=scenes,
+                transcription=transcript.entries,
+                plan_context=plan_context,
+            )
+            logger.info(
+                f"Master plan prompt: ~{self.estimate_tokens(prompt)} input tokens"
+            )
+            return prompt
+
+        def render(description_limit, dialogue_limit, dialogue_stride):
+            return Prompts.get_compact_global_summary_plan_prompt(
+                scene_rows=self.encode_scenes(scenes, description_limit),
+                dialogue_rows=self.encode_transcript(
+                    transcript, dialogue_limit, dialogue_stride
+                ),
+                plan_context=plan_context,
+            )
+
+        prompt = self._fit(render, "master plan")
+        duration = max((scene.get("end_time", 0.0) for scene in scenes), default=0.0)
+        logger.info(
+            f"Master plan prompt: ~{self.estimate_tokens(prompt)} input tokens, "
+            f"~{self.estimate_plan_output_tokens(duration)} output tokens expected"
+        )
+        return prompt
+
+    def encode_scenes(
+        self, scenes: List[dict], description_limit: Optional[int] = None
+    ) -> str:
+        rows = []
+        for scene in sorted(scenes, key=lambda s: s.get("start_time", 0.0)):
+            keywords = ",".join(str(k) for k in scene.get("keywords", []))
+            rows.append(
+                f"{self._num(scene.get('start_time', 0.0))}|{self._num(scene.get('end_time', 0.0))}|"
+                f"{self._cell(scene.get('mood', ''))}|{self._cell(keywords)}|"
+                f"{self._cell(scene.get('description', ''), description_limit)}"
+            )
+        return "\n".join(rows)
+
+    def encode_transcript(
+        self,
+        transcript: Union[TranscriptIndex, List[dict]],
+        text_limit: Optional[int] = None,
+        stride: int = 1,
+    ) -> str:
+        if not isinstance(transcript, TranscriptIndex):
+            transcript = TranscriptIndex(transcript)
+
+        rows = []
+        for start, end, entry in zip(
+            transcript.starts[::stride],
+            transcript.ends[::stride],
+            transcript.entries[::stride],
+        ):
+            rows.append(
+                f"{self._num(start)}|{self._num(end)}|"
+                f"{self._cell(entry.get('text', ''), text_limit)}"
+            )
+        return "\n".join(rows)
+
+    def _fit(self, render, label: str) -> str:
+        levels = [(*level, 1) for level in self.TRIM_LEVELS]
+        stride = 2
+        while stride <= self.MAX_DIALOGUE_STRIDE:
+            levels.append((*self.TRIM_LEVELS[-1], stride))
+            stride *= 2
+
+        prompt = ""
+        for i, (description_limit, dialogue_limit, dialogue_stride) in enumerate(
+            levels
+        ):
+            prompt = render(description_limit, dialogue_limit, dialogue_stride)
+            if self.estimate_tokens(prompt) <= self.token_budget:
+                if i > 0:
+                    logger.info(
+                        f"Trimmed {label} prompt to fit {self.token_budget} token budget"
+                    )
+                return prompt
+
+        logger.warning(
+            f"{label} prompt still ~{self.estimate_tokens(prompt)} tokens after trimming, "
+            f"over the {self.token_budget} token budget"
+        )
+        return prompt
+
+    @staticmethod
+    def _cell(value, limit: Optional[int] = None) -> str:
+        text = " ".join(str(value).split()).replace("|", "/")
+        if limit is not None and len(text) > limit:
+            text = text[:limit].rstrip() + "…" if limit > 0 else ""
+        return text
+
+    @staticmethod
+    def _num(value) -> str:
+        try:
+            return f"{float(value):.2f}".rstrip("0").rstrip(".")
+        except (TypeError, ValueError):
+            return str(value)
@@ -1,4 +1,5 @@
 from typing import List
+from models.llm_response import MasterPlan
 
 
 class Prompts:
@@ -53,6 +54,7 @@ Scenes: {scene_data}"""
 ### INPUT DATA
 Scene Analysis: {scene_analysis}
 Transcription: {transcription}
+{plan_context}
 
 ### CORE PRINCIPLES
 1. **USE TRANSCRIPTION FIRST** - Dialogue reveals the true narrative arc and emotional journey
@@ -99,18 +101,124 @@ Respond with valid JSON only. No markdown.
 
 Example: 2-minute video = 2-3 blocks, NOT 20+."""
 
+    COMPACT_GLOBAL_CONTEXT_PROMPT = """You are an expert Video Analyst. Analyze a batch of video scenes: one keyframe image per scene, in order, plus the dialogue heard during them.
+
+### INPUT
+scenes: one row per image, "idx|timestamp|start|end" (seconds)
+dialogue: one row per transcript segment, "start|end|text"
+
+### GOAL
+For every scene, combine the dialogue (primary source: narrative and emotion) with the keyframe (setting, lighting, action).
+
+### OUTPUT
+Respond ONLY with valid JSON, no markdown, one entry per scene in input order:
+{"scene_analysis":[{"description":"max 25 words, dialogue first then visuals","mood":"1-3 words","keywords":["max 4 tags"]}]}"""
+
+    COMPACT_GLOBAL_CONTEXT_USER_PROMPT = """scenes:
+{scene_rows}
+dialogue:
+{dialogue_rows}"""
+
+    COMPACT_GLOBAL_SUMMARY_PLAN_PROMPT = """You are a Musical Director creating a cohesive soundtrack. Build a Musical Master Plan from the scenes and dialogue.
+
+### INPUT
+scenes: "start|end|mood|keywords|description" (seconds)
+{scene_rows}
+dialogue: "start|end|text" (seconds)
+{dialogue_rows}
+{plan_context}
+### RULES
+1. Dialogue reveals the narrative arc; use it first.
+2. Favor 30-60+ second blocks; change only on genuine narrative shifts (2-minute video = 2-3 blocks).
+3. Keep BPM and scale consistent unless the narrative demands a change; steer with prompt tweaks and weight (0.8-1.2).
+4. Descriptive prompts: mood + genre + instruments, e.g. "Cinematic emotional piano with subtle strings, melancholic".
+Scales: C_MAJOR_A_MINOR, D_MAJOR_B_MINOR, E_MAJOR_D_FLAT_MINOR, F_MAJOR_D_MINOR, G_MAJOR_E_MINOR, A_MAJOR_G_FLAT_MINOR, etc.
+
+### OUTPUT
+Respond ONLY with valid JSON, no markdown:
+{{"global_context":"max 20 words","musical_blocks":[{{"time_range":{{"start":float,"end":float}},"musical_direction":"max 12 words","transition":"max 10 words","gain":0.2-0.7,"lyria_config":{{"prompt":"max 20 words","bpm":int 60-200,"scale":"SCALE","weight":0.8-1.2}}}}]}}"""
+
+    PLAN_CONTINUATION_CONTEXT = """
+### CONTINUATION
+The soundtrack is already playing up to {start_time} seconds. Overall theme so far: {global_context}
+The last block uses:
+- Prompt: {prompt}
+- BPM: {bpm}
+- Scale: {scale}
+
+Your first block MUST start at {start_time}. Continue smoothly from the music above and keep its BPM and scale unless the narrative clearly demands a change.
+"""
+
+    ACT_PLAN_CONTEXT = """
+### ACT WINDOW
+This is act {act_number} of {act_count} of a longer video. Plan ONLY the window from {start_time} to {end_time} seconds: the first block must start at {start_time} and the last block must end at {end_time}.
+Outline of the whole video, use it to pick a BPM and scale that fit the full story:
+{outline}
+"""
+
     @staticmethod
     def get_global_context_prompt() -> str:
         return Prompts.GLOBAL_CONTEXT_PROMPT
 
     @staticmethod
     def get_global_summary_plan_prompt(
-        scenes: List[dict], transcription: List[dict]
+        scenes: List[dict], transcription: List[dict], plan_context: str = ""
     ) -> str:
         return Prompts.GLOBAL_SUMMARY_PLAN_PROMPT.format(
-            scene_analysis=str(scenes), transcription=str(transcription)
+            scene_analysis=str(scenes),
+            transcription=str(transcription),
+            plan_context=plan_context,
+        )
+
+    @staticmethod
+    def get_plan_continuation_context(previous_plan: MasterPlan) -> str:
+        last_block = previous_plan.musical_blocks[-1]
+        return Prompts.PLAN_CONTINUATION_CONTEXT.format(
+            start_time=last_block.time_range["end"],
+            global_context=previous_plan.global_context,
+            prompt=last_block.lyria_config.prompt,
+            bpm=last_block.lyria_config.bpm,
+            scale=last_block.lyria_config.scale,
+        )
+
+    @staticmethod
+    def get_act_plan_context(
+        act_number: int,
+        act_count: int,
+        start_time: float,
+        end_time: float,
+        outline: str,
+    ) -> str:
+        return Prompts.ACT_PLAN_CONTEXT.format(
+            act_number=act_number,
+            act_count=act_count,
+            start_time=round(start_time, 2),
+            end_time=round(end_time, 2),
+            outline=outline,
         )
 
     @staticmethod
     def get_global_context_user_prompt(scene_data: List[dict]) -> str:
         return Prompts.GLOBAL_CONTEXT_USER_PROMPT.format(scene_data=str(scene_data))
+
+    @staticmethod
+    def get_compact_global_context_prompt() -> str:
+        return Prompts.COMPACT_GLOBAL_CONTEXT_PROMPT
+
+    @staticmethod
+    def get_compact_global_context_user_prompt(
+        scene_rows: str, dialogue_rows: str
+    ) -> str:
+        return Prompts.COMPACT_GLOBAL_CONTEXT_USER_PROMPT.format(
+            scene_rows=scene_rows, dialogue_rows=dialogue_rows
+        )
+
+    @staticmethod
+    def get_compact_global_summary_plan_prompt(
+        scene_rows: str, dialogue_rows: str, plan_context: str = ""
+    ) -> str:
+        return Prompts.COMPACT_GLOBAL_SUMMARY_PLAN_PROMPT.format(
+            scene_rows=scene_rows,
+            dialogue_rows=dialogue_rows,
+            plan_context=plan_context,
+        )
@@ -0,0 +1,91 @@
+import base64
+import hashlib
+import json
+from io import BytesIO
+from typing import Dict, List, Optional
+import numpy as np
+import redis
+from PIL import Image
+from models.frame import Frame
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class SceneCache:
+    KEY_PREFIX = "scene-cache:"
+    HASH_SIZE = 8
+    TIME_FIELDS = ("timestamp", "start_time", "end_time")
+
+    def __init__(self, redis_url: str, ttl: int, namespace: str) -> None:
+        self.redis_client = redis.from_url(
+            redis_url, encoding="utf-8", decode_responses=True
+        )
+        self.ttl = ttl
+        self.namespace = namespace
+
+    @staticmethod
+    def prompt_namespace(model: str, *prompts: str) -> str:
+        prompt_hash = hashlib.sha1("\n".join(prompts).encode("utf-8")).hexdigest()
+        return f"{model}:{prompt_hash[:12]}"
+
+    @staticmethod
+    def frame_fingerprint(frame: Frame) -> str:
+        """Difference hash of the keyframe, stable across re-encodes and resizes"""
+        image = Image.open(BytesIO(base64.b64decode(frame.data))).convert("L")
+        image = image.resize(
+            (SceneCache.HASH_SIZE + 1, SceneCache.HASH_SIZE), Image.Resampling.LANCZOS
+        )
+        pixels = np.asarray(image, dtype=np.int16)
+        bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+        return f"{int(''.join('1' if bit else '0' for bit in bits), 2):016x}"
+
+    @staticmethod
+    def transcript_fingerprint(transcript_slice: List[dict]) -> str:
+        texts = [str(entry.get("text", "")).strip() for entry in transcript_slice]
+        return hashlib.sha1(json.dumps(texts).encode("utf-8")).hexdigest()[:16]
+
+    def scene_key(self, frame: Frame, transcript_slice: List[dict]) -> str:
+        return (
+            f"{self.KEY_PREFIX}{self.namespace}:"
+            f"{self.frame_fingerprint(frame)}:{self.transcript_fingerprint(transcript_slice)}"
+        )
+
+    def get_many(self, keys: List[str]) -> List[Optional[dict]]:
+        if not keys:
+            return []
+
+        try:
+            values = self.redis_client.mget(keys)
+            hits = [key for key, value in zip(keys, values) if value is not None]
+            if hits:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key in hits:
+                    pipe.expire(key, self.ttl)
+                pipe.execute()
+            logger.info(f"Scene cache: {len(hits)}/{len(keys)} hits")
+            return [json.loads(value) if value else None for value in values]
+        except Exception as e:
+            logger.warning(f"Scene cache lookup failed, analyzing all scenes: {e}")
+            return [None] * len(keys)
+
+    def set_many(self, scenes: Dict[str, dict]) -> None:
+        if not scenes:
+            return
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, scene in scenes.items():
+                value = {k: v for k, v in scene.items() if k not in self.TIME_FIELDS}
+                pipe.setex(key, self.ttl, json.dumps(value))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to store {len(scenes)} scenes in cache: {e}")
+
+    @staticmethod
+    def restamp(scene: dict, frame: Frame) -> dict:
+        scene = dict(scene)
+        scene["timestamp"] = round(frame.timestamp, 2)
+        scene["start_time"] = round(frame.scene_start, 2)
+        scene["end_time"] = round(frame.scene_end, 2)
+        return scene
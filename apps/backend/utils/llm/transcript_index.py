@@ -0,0 +1,97 @@
+from typing import List, Sequence
+import numpy as np
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class TranscriptIndex:
+    """Transcript segments parsed once into sorted start/end arrays for overlap queries"""
+
+    def __init__(self, transcript: List[dict]) -> None:
+        entries = []
+        starts = []
+        ends = []
+
+        for entry in transcript or []:
+            if "timestamp" not in entry:
+                continue
+
+            timestamp = entry["timestamp"]
+            try:
+                if " - " in timestamp:
+                    start_str, end_str = timestamp.split(" - ")
+                    entry_start = float(start_str)
+                    entry_end = float(end_str)
+                else:
+                    entry_start = float(timestamp)
+                    entry_end = entry_start
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Could not parse timestamp '{timestamp}': {e}")
+                continue
+
+            entries.append(entry)
+            starts.append(entry_start)
+            ends.append(entry_end)
+
+        order = np.argsort(np.asarray(starts, dtype=np.float64), kind="stable")
+        self._set(
+            [entries[i] for i in order],
+            np.asarray(starts, dtype=np.float64)[order],
+            np.asarray(ends, dtype=np.float64)[order],
+        )
+
+    @classmethod
+    def _from_arrays(
+        cls, entries: List[dict], starts: np.ndarray, ends: np.ndarray
+    ) -> "TranscriptIndex":
+        index = cls.__new__(cls)
+        index._set(entries, starts, ends)
+        return index
+
+    def _set(self, entries: List[dict], starts: np.ndarray, ends: np.ndarray) -> None:
+        self.entries = entries
+        self.starts = starts
+        self.ends = ends
+        self.max_duration = float((ends - starts).max()) if len(entries) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _bounds(
+        self, scene_starts: np.ndarray, scene_ends: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Anything starting before scene_start - max_duration has ended before the scene
+        lo = np.searchsorted(self.starts, scene_starts - self.max_duration, side="left")
+        hi = np.searchsorted(self.starts, scene_ends, side="left")
+        return lo, hi
+
+    def query_many(
+        self, scene_starts: Sequence[float], scene_ends: Sequence[float]
+    ) -> List[List[dict]]:
+        if not self.entries:
+            return [[] for _ in scene_starts]
+
+        starts = np.asarray(scene_starts, dtype=np.float64)
+        ends = np.asarray(scene_ends, dtype=np.float64)
+        lo, hi = self._bounds(starts, ends)
+
+        results = []
+        for scene_start, first, last in zip(starts, lo, hi):
+            matches = np.flatnonzero(self.ends[first:last] > scene_start) + first
+            results.append([self.entries[i] for i in matches])
+        return results
+
+    def query(self, scene_start: float, scene_end: float) -> List[dict]:
+        return self.query_many([scene_start], [scene_end])[0]
+
+    def window(self, start: float, end: float) -> "TranscriptIndex":
+        if not self.entries:
+            return self
+
+        lo, hi = self._bounds(np.array([start]), np.array([end]))
+        first, last = int(lo[0]), int(hi[0])
+        matches = np.flatnonzero(self.ends[first:last] > start) + first
+        return TranscriptIndex._from_arrays(
+            [self.entries[i] for i in matches], self.starts[matches], self.ends[matches]
+        )
@@ -0,0 +1,203 @@
+import base64
+import math
+import threading
+from collections import deque
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from models.frame import Frame
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class PayloadLatencyModel:
+    """Least squares fit of request latency against image count and payload size"""
+
+    MIN_SAMPLES = 8
+
+    def __init__(self, window: int = 200) -> None:
+        self.samples: deque = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, image_count: int, payload_bytes: int, seconds: float) -> None:
+        with self.lock:
+            self.samples.append((image_count, payload_bytes / 1024, seconds))
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self.samples)
+
+    def predict(self, image_count: int, payload_bytes: int) -> Optional[float]:
+        with self.lock:
+            if len(self.samples) < self.MIN_SAMPLES:
+                return None
+            samples = np.array(self.samples, dtype=np.float64)
+
+        features = np.column_stack(
+            [np.ones(len(samples)), samples[:, 0], samples[:, 1]]
+        )
+        coefficients, *_ = np.linalg.lstsq(features, samples[:, 2], rcond=None)
+        # Latency never shrinks with a bigger payload, ignore negative slopes from noise
+        base, per_image, per_kb = coefficients[0], *np.maximum(coefficients[1:], 0.0)
+        return max(0.0, base + per_image * image_count + per_kb * payload_bytes / 1024)
+
+
+class VisionBatcher:
+    # (max width, JPEG quality) tried in order until a frame fits its share of the payload
+    PROFILES: List[Tuple[int, int]] = [(540, 85), (480, 80), (400, 75), (320, 70)]
+    SIMPLE_PROFILE: Tuple[int, int] = (320, 70)
+    SIMPLE_EDGE_THRESHOLD = 4.0
+    COMPLEXITY_WIDTH = 160
+    DEFAULT_IMAGE_BYTES = 60 * 1024
+    # A smaller batch has to be this much faster to be worth the extra requests
+    SPLIT_GAIN = 0.9
+
+    _batchers: Dict[str, "VisionBatcher"] = {}
+    _batchers_lock = threading.Lock()
+
+    def __init__(
+        self, max_images: int, target_payload_bytes: int, simple_scenes: bool = True
+    ) -> None:
+        self.max_images = max_images
+        self.target_payload_bytes = target_payload_bytes
+        self.simple_scenes = simple_scenes
+        self.latency_model = PayloadLatencyModel()
+        self.image_bytes = float(self.DEFAULT_IMAGE_BYTES)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_model(
+        cls,
+        model: str,
+        max_images: int,
+        target_payload_bytes: int,
+        simple_scenes: bool = True,
+    ) -> "VisionBatcher":
+        with cls._batchers_lock:
+            if model not in cls._batchers:
+                cls._batchers[model] = cls(
+                    max_images=max_images,
+                    target_payload_bytes=target_payload_bytes,
+                    simple_scenes=simple_scenes,
+                )
+            return cls._batchers[model]
+
+    def record(self, image_count: int, payload_bytes: int, seconds: float) -> None:
+        self.latency_model.record(image_count, payload_bytes, seconds)
+        with self.lock:
+            self.image_bytes = 0.8 * self.image_bytes + 0.2 * (
+                payload_bytes / max(image_count, 1)
+            )
+
+    def choose_batch_size(self, frame_count: int, concurrency: int) -> int:
+        with self.lock:
+            image_bytes = self.image_bytes
+
+        fitting = max(1, int(self.target_payload_bytes // max(image_bytes, 1)))
+        largest = max(1, min(self.max_images, fitting, frame_count))
+
+        best_size = largest
+        best_estimate = None
+        for size in range(largest, 0, -1):
+            latency = self.latency_model.predict(size, int(size * image_bytes))
+            if latency is None:
+                return largest
+
+            waves = math.ceil(math.ceil(frame_count / size) / max(concurrency, 1))
+            estimate = waves * latency
+            if best_estimate is None or estimate < best_estimate * self.SPLIT_GAIN:
+                best_size, best_estimate = size, estimate
+
+        return best_size
+
+    @staticmethod
+    def edge_density(image: Image.Image) -> float:
+        width = VisionBatcher.COMPLEXITY_WIDTH
+        height = max(1, round(image.height * width / max(image.width, 1)))
+        pixels = np.asarray(
+            image.convert("L").resize((width, height), Image.Resampling.BILINEAR),
+            dtype=np.float32,
+        )
+        if pixels.shape[0] < 2 or pixels.shape[1] < 2:
+            return 0.0
+        return float(
+            (
+                np.abs(np.diff(pixels, axis=0)).mean()
+                + np.abs(np.diff(pixels, axis=1)).mean()
+            )
+            / 2
+        )
+
+    @staticmethod
+    def _encode(image: Image.Image, max_width: int, quality: int) -> str:
+        if image.width > max_width:
+            image = image.resize(
+                (max_width, max(1, int(image.height * max_width / image.width))),
+                Image.Resampling.LANCZOS,
+            )
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=quality)
+        return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+    def shape_frame(self, frame: Frame, byte_budget: int) -> str:
+        try:
+            image = Image.open(BytesIO(base64.b64decode(frame.data))).convert("RGB")
+
+            if (
+                self.simple_scenes
+                and self.edge_density(image) < self.SIMPLE_EDGE_THRESHOLD
+            ):
+                return self._encode(image, *self.SIMPLE_PROFILE)
+
+            data = frame.data
+            for max_width, quality in self.PROFILES:
+                data = self._encode(image, max_width, quality)
+                if len(data) <= byte_budget:
+                    break
+            return data if len(data) < len(frame.data) else frame.data
+        except Exception as e:
+            logger.warning(f"Could not shape frame at {frame.timestamp}: {e}")
+            return frame.data
+
+    def plan(
+        self, frames: List[Frame], concurrency: int, executor
+    ) -> Tuple[List[List[Frame]], Dict[int, str]]:
+        """Shape every frame and pack them into requests, returns the batches and payload per frame id"""
+        if not frames:
+            return [], {}
+
+        batch_size = self.choose_batch_size(len(frames), concurrency)
+        byte_budget = self.target_payload_bytes // batch_size
+
+        payloads = dict(
+            zip(
+                (id(frame) for frame in frames),
+                executor.map(
+                    lambda frame: self.shape_frame(frame, byte_budget), frames
+                ),
+            )
+        )
+
+        batches: List[List[Frame]] = []
+        batch: List[Frame] = []
+        batch_bytes = 0
+        for frame in frames:
+            frame_bytes = len(payloads[id(frame)])
+            if batch and (
+                len(batch) >= batch_size
+                or batch_bytes + frame_bytes > self.target_payload_bytes
+            ):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(frame)
+            batch_bytes += frame_bytes
+        batches.append(batch)
+
+        total_bytes = sum(len(payload) for payload in payloads.values())
+        logger.info(
+            f"Vision plan: {len(frames)} frames in {len(batches)} requests "
+            f"(batch size {batch_size}, {total_bytes // 1024} KB total)"
+        )
+        return batches, payloads
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+from dotenv import load_dotenv
+from groq.types.audio import Transcription
+from groq.types.chat import ChatCompletion
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+load_dotenv()
+
+
+class RecordingNotFoundError(LookupError):
+    pass
+
+
+class RecordingStore:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    @staticmethod
+    def _default(value: Any) -> Any:
+        if isinstance(value, (bytes, bytearray)):
+            return {"sha256": hashlib.sha256(value).hexdigest(), "size": len(value)}
+        if hasattr(value, "model_dump"):
+            return value.model_dump()
+        return repr(value)
+
+    @staticmethod
+    def request_key(kind: str, request: dict) -> str:
+        body = json.dumps(
+            request, sort_keys=True, default=RecordingStore._default
+        ).encode("utf-8")
+        return f"{kind}-{hashlib.sha256(body).hexdigest()[:32]}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key: str, request: dict, response: dict, latency: float) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        record = {
+            "request": json.loads(
+                json.dumps(request, sort_keys=True, default=self._default)
+            ),
+            "response": response,
+            "latency": latency,
+        }
+        # Write to a temp file first so parallel recorders never leave a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(record, f)
+        os.replace(temp_path, self._path(key))
+
+
+class LLMProvider:
+    """
+    Drop-in for the Groq client used by LLMUtils and AudioUtils.
+
+    live calls Groq, record calls Groq and stores every response under a hash of the
+    request, replay answers from the stored responses without network access.
+    """
+
+    LIVE = "live"
+    RECORD = "record"
+    REPLAY = "replay"
+    MODES = (LIVE, RECORD, REPLAY)
+    # Request arguments that do not change the response
+    IGNORED_ARGUMENTS = ("timeout",)
+
+    def __init__(
+        self,
+        client,
+        mode: str = LIVE,
+        store: Optional[RecordingStore] = None,
+        replay_latency: Optional[float] = None,
+    ) -> None:
+        if mode not in self.MODES:
+            raise ValueError(
+                f"Unknown provider mode '{mode}', expected one of {self.MODES}"
+            )
+        if mode != self.LIVE and store is None:
+            raise ValueError(f"Provider mode '{mode}' needs a recording store")
+
+        self.client = client
+        self.mode = mode
+        self.store = store
+        self.replay_latency = replay_latency
+        self.chat = SimpleNamespace(
+            completions=SimpleNamespace(create=self.create_chat_completion)
+        )
+        self.audio = SimpleNamespace(
+            transcriptions=SimpleNamespace(create=self.create_transcription)
+        )
+
+    @classmethod
+    def from_env(cls, client) -> "LLMProvider":
+        mode = os.getenv("LLM_PROVIDER_MODE", cls.LIVE).lower()
+        latency = os.getenv("LLM_REPLAY_LATENCY", "recorded").lower()
+        provider = cls(
+            client,
+            mode=mode,
+            store=RecordingStore(os.getenv("LLM_RECORDINGS_DIR", "recordings")),
+            replay_latency=None if latency == "recorded" else float(latency),
+        )
+        if mode != cls.LIVE:
+            logger.info(f"LLM provider in {mode} mode using {provider.store.directory}")
+        return provider
+
+    def _call(
+        self,
+        kind: str,
+        request: dict,
+        live_call: Callable[[], Any],
+        decode: Callable[[dict], Any],
+    ) -> Any:
+        if self.mode == self.LIVE:
+            return live_call()
+
+        key = RecordingStore.request_key(
+            kind,
+            {k: v for k, v in request.items() if k not in self.IGNORED_ARGUMENTS},
+        )
+
+        if self.mode == self.REPLAY:
+            record = self.store.load(key)
+            if record is None:
+                raise RecordingNotFoundError(f"No recording for {kind} request {key}")
+            latency = (
+                record.get("latency", 0.0)
+                if self.replay_latency is None
+                else self.replay_latency
+            )
+            if latency > 0:
+                time.sleep(latency)
+            return decode(record["response"])
+
+        start = time.monotonic()
+        response = live_call()
+        latency = time.monotonic() - start
+        self.store.save(
+            key,
+            request,
+            response.model_dump() if hasattr(response, "model_dump") else response,
+            latency,
+        )
+        return response
+
+    def create_chat_completion(self, **kwargs) -> ChatCompletion:
+        return self._call(
+            "chat",
+            kwargs,
+            lambda: self.client.chat.completions.create(**kwargs),
+            ChatCompletion.model_validate,
+        )
+
+    def create_transcription(self, **kwargs) -> Transcription:
+        return self._call(
+            "transcription",
+            kwargs,
+            lambda: self.client.audio.transcriptions.create(**kwargs),
+            Transcription.model_validate,
+        )
@@ -50,6 +50,14 @@ class VideoUtils:
         finally:
             self.helper_utils.cleanup_temp_file(self.temp_video_path)
 
+    def get_duration(self) -> float:
+        """Length of the video in seconds, 0 when it cannot be read"""
+        cap = cv2.VideoCapture(self.temp_video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        cap.release()
+        return total_frames / fps if fps else 0.0
+
     def _pick_best_frame_from_scene(self) -> list[Frame]:
         logger.info("Picking best frames from scenes")
 
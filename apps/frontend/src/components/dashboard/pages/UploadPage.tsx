@@ -35,7 +35,7 @@ export function UploadPage() {
         headers['Authorization'] = `Bearer ${token}`;
       }
 
-      const response = await fetch(`${apiUrl}/api/context`, {
+      const response = await fetch(`${apiUrl}/api/context?progressive=true`, {
         method: 'POST',
         headers,
         body: formData,
@@ -34,7 +34,7 @@ export function CustomVideoPlayer({
         console.log('Audio stream stopped');
     }, []);
 
-    const { play: playAudio, pause: pauseAudio, stop: stopAudio, seek, isReady, isBuffering, bufferedDuration, musicalContext } = useAudioStream({
+    const { play: playAudio, pause: pauseAudio, stop: stopAudio, seek, isReady, isBuffering, bufferedDuration, musicalContext, broadcast, analysisError, ownerState } = useAudioStream({
         videoDuration: duration,
         onStop: handleAudioStop,
         initialPaused: initialPaused,
@@ -43,6 +43,15 @@ export function CustomVideoPlayer({
 
     const initialPauseApplied = useRef(false);
 
+    // Joining a session someone else is playing: start the video where their stream is
+    useEffect(() => {
+        const video = videoRef.current;
+        if (!video || broadcast?.role !== 'listener') return;
+        video.currentTime = broadcast.position;
+        setCurrentTime(broadcast.position);
+        seek(broadcast.position);
+    }, [broadcast, seek]);
+
     useEffect(() => {
         const video = videoRef.current;
         if (!video || initialPauseApplied.current) return;
@@ -320,7 +329,22 @@ export function CustomVideoPlayer({
                 </div>
             )}
 
+            {analysisError && (
+                <div className="absolute top-3 left-3 right-3 pointer-events-none z-40 rounded-lg bg-black/60 backdrop-blur-sm px-3 py-2 text-sm text-white/80">
+                    Music ends early: {analysisError}
+                </div>
+            )}
+
+            {ownerState && (
+                <div className="absolute bottom-16 left-3 right-3 pointer-events-none z-40 rounded-lg bg-black/60 backdrop-blur-sm px-3 py-2 text-sm text-white/80">
+                    {ownerState === 'paused'
+                        ? 'The session owner paused the music'
+                        : 'Waiting for the session owner\'s music'}
+                </div>
+            )}
+
             {/* Buffering Spinner Overlay (when playing but buffering) */}
+
             {isPlaying && isBuffering && (
                 <div className="absolute inset-0 flex items-center justify-center pointer-events-none bg-black/30 backdrop-blur-sm z-50">
                     <div className="flex flex-col items-center gap-3">
@@ -28,6 +28,43 @@ export interface MusicalContext {
                 };
             }>;
         };
+        // Total stored blocks when only the first ones were sent on connect
+        block_count?: number;
+        // Background analysis failed; the music ends after the blocks above
+        analysis_error?: string | null;
+    };
+}
+
+type MusicalData = MusicalContext['data'];
+
+export interface MusicalBlocksMessage {
+    type: 'musical_blocks';
+    start_index: number;
+    data: {
+        musical_blocks: MusicalData['master_plan']['musical_blocks'];
+        scene_analysis: MusicalData['scene_analysis'];
+        block_count: number;
+    };
+}
+
+// Places blocks loaded during playback at their index and adds their scenes once
+export function mergeMusicalBlocks(context: MusicalContext, message: MusicalBlocksMessage): MusicalContext {
+    const blocks = context.data.master_plan.musical_blocks.slice(0, message.start_index);
+    const sceneKey = (scene: MusicalData['scene_analysis'][number]) => `${scene.start_time}:${scene.timestamp}`;
+    const knownScenes = new Set(context.data.scene_analysis.map(sceneKey));
+    const newScenes = message.data.scene_analysis.filter(scene => !knownScenes.has(sceneKey(scene)));
+
+    return {
+        ...context,
+        data: {
+            ...context.data,
+            scene_analysis: [...context.data.scene_analysis, ...newScenes].sort((a, b) => a.start_time - b.start_time),
+            master_plan: {
+                ...context.data.master_plan,
+                musical_blocks: [...blocks, ...message.data.musical_blocks],
+            },
+            block_count: message.data.block_count,
+        },
     };
 }
 
@@ -219,7 +256,7 @@ export function MusicalBlockBar({ context, currentTime }: MusicalContextDisplayP
                         </div>
                         {currentBlock && (
                             <span className="text-[8px] font-mono text-white/40">
-                                Block {context.data.master_plan.musical_blocks.indexOf(currentBlock) + 1} of {context.data.master_plan.musical_blocks.length}
+                                Block {context.data.master_plan.musical_blocks.indexOf(currentBlock) + 1} of {context.data.block_count ?? context.data.master_plan.musical_blocks.length}
                             </span>
                         )}
                     </div>
@@ -1,4 +1,9 @@
-export function processAudioChunk(audioContext: AudioContext, arrayBuffer: ArrayBuffer): AudioBuffer {
+export function processAudioChunk(
+    audioContext: AudioContext,
+    arrayBuffer: ArrayBuffer,
+    channels: number = 2,
+    sampleRate: number = 48000
+): AudioBuffer {
     const int16Data = new Int16Array(arrayBuffer);
     const float32Data = new Float32Array(int16Data.length);
 
@@ -8,13 +13,12 @@ export function processAudioChunk(audioContext: AudioContext, arrayBuffer: Array
     }
 
     // Create AudioBuffer
-    // 2 channels, length is total samples / channels
-    const channels = 2;
-    const frameCount = float32Data.length / channels;
+    // length is total samples / channels
+    const frameCount = Math.floor(float32Data.length / channels);
     const audioBuffer = audioContext.createBuffer(
         channels,
         frameCount,
-        48000
+        sampleRate
     );
 
     // De-interleave
@@ -32,3 +36,209 @@ export function processAudioChunk(audioContext: AudioContext, arrayBuffer: Array
 
     return audioBuffer;
 }
+
+// Framed chunks sent once an encoding has been negotiated:
+// version u8, codec u8, channels u8, reserved u8 (flags from version 3), sample rate u32 LE,
+// frames u32 LE, then from version 2 sequence u32 LE and media timestamp u64 LE (48 kHz
+// frames), payload
+const AUDIO_FRAME_HEADER_BYTES: Record<number, number> = { 1: 12, 2: 24, 3: 24 };
+const MEDIA_TIMESTAMP_RATE = 48000;
+const CODEC_PCM = 0;
+export const CODEC_OPUS = 1;
+// The Opus payload starts a new stream, its first packet is the OpusHead
+const FLAG_STREAM_START = 1;
+const OPUS_SAMPLE_RATE = 48000;
+
+export interface AudioFrame {
+    codec: number;
+    channels: number;
+    flags: number;
+    sampleRate: number;
+    frames: number;
+    sequence?: number;
+    // Start of the chunk in seconds of music time
+    timestamp?: number;
+    payload: ArrayBuffer;
+}
+
+export interface DecodedAudioFrame {
+    buffer: AudioBuffer;
+    sequence?: number;
+    timestamp?: number;
+}
+
+export function parseAudioFrame(arrayBuffer: ArrayBuffer): AudioFrame {
+    const view = new DataView(arrayBuffer);
+    const version = view.getUint8(0);
+    const headerBytes = AUDIO_FRAME_HEADER_BYTES[version];
+    if (headerBytes === undefined) {
+        throw new Error(`Unsupported audio frame version ${version}`);
+    }
+
+    const frame: AudioFrame = {
+        codec: view.getUint8(1),
+        channels: view.getUint8(2),
+        flags: version >= 3 ? view.getUint8(3) : 0,
+        sampleRate: view.getUint32(4, true),
+        frames: view.getUint32(8, true),
+        payload: arrayBuffer.slice(headerBytes),
+    };
+    if (version >= 2) {
+        frame.sequence = view.getUint32(12, true);
+        frame.timestamp = Number(view.getBigUint64(16, true)) / MEDIA_TIMESTAMP_RATE;
+    }
+    return frame;
+}
+
+export async function decodeAudioFrame(audioContext: AudioContext, arrayBuffer: ArrayBuffer): Promise<DecodedAudioFrame> {
+    const frame = parseAudioFrame(arrayBuffer);
+    const { sequence, timestamp } = frame;
+    if (frame.codec === CODEC_PCM) {
+        const buffer = processAudioChunk(audioContext, frame.payload, frame.channels, frame.sampleRate);
+        return { buffer, sequence, timestamp };
+    }
+
+    // FLAC chunks are complete files the browser can decode natively
+    const decoded = await audioContext.decodeAudioData(frame.payload);
+
+    // Trim codec padding so chunks stay back to back on the timeline
+    const expected = Math.round(frame.frames * decoded.sampleRate / frame.sampleRate);
+    if (decoded.length <= expected) return { buffer: decoded, sequence, timestamp };
+
+    const trimmed = audioContext.createBuffer(decoded.numberOfChannels, expected, decoded.sampleRate);
+    for (let channel = 0; channel < decoded.numberOfChannels; channel++) {
+        trimmed.copyToChannel(decoded.getChannelData(channel).subarray(0, expected), channel);
+    }
+    return { buffer: trimmed, sequence, timestamp };
+}
+
+// Opus payloads are u16 LE length-prefixed packets
+function splitPackets(payload: ArrayBuffer): Uint8Array[] {
+    const view = new DataView(payload);
+    const packets: Uint8Array[] = [];
+    let offset = 0;
+    while (offset + 2 <= payload.byteLength) {
+        const length = view.getUint16(offset, true);
+        packets.push(new Uint8Array(payload, offset + 2, length));
+        offset += 2 + length;
+    }
+    return packets;
+}
+
+interface PendingOpusFrame {
+    frames: number;
+    sequence?: number;
+    timestamp?: number;
+}
+
+// Decodes the server's Opus frames as one continuous stream, so there is no priming or
+// padding between chunks. Output is regrouped into one buffer per frame received.
+export class OpusStreamDecoder {
+    private decoder: AudioDecoder | null = null;
+    private packetCount = 0;
+    // Decoded frames still to drop for the encoder's pre-skip
+    private skip = 0;
+    private planes: Float32Array[][] = [];
+    private collected = 0;
+    private pending: PendingOpusFrame[] = [];
+
+    constructor(
+        private audioContext: AudioContext,
+        private onAudio: (frame: DecodedAudioFrame) => void,
+        private onError: (error: unknown) => void,
+    ) {}
+
+    static supported(): boolean {
+        return typeof AudioDecoder !== 'undefined';
+    }
+
+    push(frame: AudioFrame): void {
+        const packets = splitPackets(frame.payload);
+        if (frame.flags & FLAG_STREAM_START) {
+            const head = packets.shift();
+            if (!head) return;
+            this.start(head, frame.channels);
+        }
+        const decoder = this.decoder;
+        // Joined mid-stream or failed: wait for the next stream start
+        if (!decoder || decoder.state === 'closed') return;
+
+        if (frame.frames > 0) {
+            this.pending.push({ frames: frame.frames, sequence: frame.sequence, timestamp: frame.timestamp });
+        }
+        for (const data of packets) {
+            decoder.decode(new EncodedAudioChunk({ type: 'key', timestamp: this.packetCount++, data }));
+        }
+    }
+
+    private start(head: Uint8Array, channels: number): void {
+        this.close();
+        // Pre-skip is applied here, not left to the browser's decoder
+        const description = head.slice();
+        this.skip = new DataView(description.buffer).getUint16(10, true);
+        description[10] = 0;
+        description[11] = 0;
+
+        this.decoder = new AudioDecoder({
+            output: data => this.output(data),
+            error: e => this.onError(e),
+        });
+        this.decoder.configure({
+            codec: 'opus',
+            sampleRate: OPUS_SAMPLE_RATE,
+            numberOfChannels: channels,
+            description,
+        });
+    }
+
+    private output(data: AudioData): void {
+        const planes: Float32Array[] = [];
+        for (let channel = 0; channel < data.numberOfChannels; channel++) {
+            const plane = new Float32Array(data.numberOfFrames);
+            data.copyTo(plane, { planeIndex: channel, format: 'f32-planar' });
+            planes.push(plane);
+        }
+        this.collected += data.numberOfFrames;
+        data.close();
+        this.planes.push(planes);
+
+        while (this.pending.length > 0 && this.collected >= this.pending[0]!.frames) {
+            this.emit(this.pending.shift()!);
+        }
+    }
+
+    private emit({ frames, sequence, timestamp }: PendingOpusFrame): void {
+        const channels = this.planes[0]!.length;
+        const samples = Array.from({ length: channels }, () => new Float32Array(frames));
+        let filled = 0;
+        while (filled < frames) {
+            const planes = this.planes[0]!;
+            const take = Math.min(planes[0]!.length, frames - filled);
+            planes.forEach((plane, channel) => samples[channel]!.set(plane.subarray(0, take), filled));
+            filled += take;
+            if (take === planes[0]!.length) {
+                this.planes.shift();
+            } else {
+                this.planes[0] = planes.map(plane => plane.subarray(take));
+            }
+        }
+        this.collected -= frames;
+
+        const skip = Math.min(this.skip, frames);
+        this.skip -= skip;
+        if (frames === skip) return;
+        const buffer = this.audioContext.createBuffer(channels, frames - skip, OPUS_SAMPLE_RATE);
+        samples.forEach((plane, channel) => buffer.copyToChannel(plane.subarray(skip), channel));
+        this.onAudio({ buffer, sequence, timestamp });
+    }
+
+    close(): void {
+        if (this.decoder && this.decoder.state !== 'closed') {
+            this.decoder.close();
+        }
+        this.decoder = null;
+        this.planes = [];
+        this.collected = 0;
+        this.pending = [];
+    }
+}
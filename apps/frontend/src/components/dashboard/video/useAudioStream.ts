@@ -1,6 +1,13 @@
 import { useEffect, useRef, useState, useCallback } from 'react';
-import { processAudioChunk } from './audioUtils';
-import { MusicalContext } from './MusicalContextDisplay';
+import {
+    CODEC_OPUS,
+    DecodedAudioFrame,
+    OpusStreamDecoder,
+    decodeAudioFrame,
+    parseAudioFrame,
+    processAudioChunk,
+} from './audioUtils';
+import { MusicalContext, MusicalBlocksMessage, mergeMusicalBlocks } from './MusicalContextDisplay';
 import { amplifyAuth } from '../../../lib/auth';
 
 interface UseAudioStreamProps {
@@ -10,6 +17,33 @@ interface UseAudioStreamProps {
     sessionId: string;
 }
 
+// Reconnect backoff after an unexpected close, doubling per attempt
+const RECONNECT_BASE_DELAY_MS = 500;
+const MAX_RECONNECT_ATTEMPTS = 5;
+
+// Audio held before resuming after an underrun, raised by the server's jitter_buffer target
+const MIN_REBUFFER_SECONDS = 1.0;
+
+// Encoding requested on connect; the server confirms with an audio_format message.
+// The Opus stream needs WebCodecs, browsers without it get FLAC chunks instead
+function audioRequest() {
+    const encoding = process.env.NEXT_PUBLIC_AUDIO_ENCODING || 'opus';
+    return {
+        encoding: encoding === 'opus' && !OpusStreamDecoder.supported() ? 'flac' : encoding,
+        sample_rate: Number(process.env.NEXT_PUBLIC_AUDIO_SAMPLE_RATE || 48000),
+        channels: Number(process.env.NEXT_PUBLIC_AUDIO_CHANNELS || 2),
+    };
+}
+
+// Role in a session's shared stream; listeners hear the owner's music from position on
+export interface BroadcastState {
+    role: 'owner' | 'listener';
+    position: number;
+}
+
+// Why a listener hears no music from the owner: paused by its client, or silent
+export type OwnerState = 'paused' | 'stalled' | null;
+
 interface AudioChunk {
     buffer: AudioBuffer;
     startTime: number;
@@ -32,11 +66,26 @@ export function useAudioStream({ videoDuration, onStop, initialPaused = false, s
     const currentMediaTimeRef = useRef<number>(0);
     const playbackAnchorRef = useRef<{ contextTime: number, mediaTime: number } | null>(null);
 
+    // Resumable stream state: the server checkpoints playback under this token
+    const resumeTokenRef = useRef<string | null>(null);
+    const intentionalCloseRef = useRef<boolean>(false);
+    const reconnectAttemptsRef = useRef<number>(0);
+    const connectRef = useRef<((resume?: boolean) => Promise<void>) | null>(null);
+
+    // Negotiated chunks carry a frame header and may need async decoding, chained to keep order
+    const framedAudioRef = useRef<boolean>(false);
+    const decodeChainRef = useRef<Promise<void>>(Promise.resolve());
+    const nextSequenceRef = useRef<number | null>(null);
+    const rebufferSecondsRef = useRef<number>(MIN_REBUFFER_SECONDS);
+
     const [isReady, setIsReady] = useState(false);
     const [isBuffering, setIsBuffering] = useState(false);
     const [bufferedDuration, setBufferedDuration] = useState(0);
 
     const [musicalContext, setMusicalContext] = useState<MusicalContext | null>(null);
+    const [broadcast, setBroadcast] = useState<BroadcastState | null>(null);
+    const [analysisError, setAnalysisError] = useState<string | null>(null);
+    const [ownerState, setOwnerState] = useState<OwnerState>(null);
 
     const videoDurationRef = useRef(videoDuration);
 
@@ -139,14 +188,22 @@ export function useAudioStream({ videoDuration, onStop, initialPaused = false, s
         });
     }, []);
 
-    const connect = useCallback(async () => {
+    const connect = useCallback(async (resume: boolean = false) => {
         if (wsRef.current?.readyState === WebSocket.OPEN) return;
 
-        console.log('Connecting to WebSocket...');
+        console.log(resume ? 'Reconnecting to WebSocket...' : 'Connecting to WebSocket...');
+        intentionalCloseRef.current = false;
 
-        // Reset state for new connection
-        totalBufferedDurationRef.current = 0;
-        audioChunksRef.current = [];
+        // Reset state for new connection; a resumed stream keeps the audio already received
+        if (!resume) {
+            totalBufferedDurationRef.current = 0;
+            audioChunksRef.current = [];
+            resumeTokenRef.current = null;
+            reconnectAttemptsRef.current = 0;
+        }
+        framedAudioRef.current = false;
+        decodeChainRef.current = Promise.resolve();
+        nextSequenceRef.current = null;
 
         const token = await amplifyAuth.getIdToken();
         const baseWsUrl = process.env.NEXT_PUBLIC_WS_URL || 'ws://localhost:8000/ws/music';
@@ -155,17 +212,98 @@ export function useAudioStream({ videoDuration, onStop, initialPaused = false, s
         const ws = new WebSocket(wsUrl);
         wsRef.current = ws;
         ws.binaryType = 'arraybuffer';
+        let opusDecoder: OpusStreamDecoder | null = null;
 
         ws.onopen = () => {
             console.log('WebSocket connected');
             if (sessionId) {
-                ws.send(JSON.stringify({ session_id: sessionId }));
+                ws.send(JSON.stringify(
+                    resume && resumeTokenRef.current
+                        ? {
+                            session_id: sessionId,
+                            resume_token: resumeTokenRef.current,
+                            position: totalBufferedDurationRef.current,
+                            audio: audioRequest(),
+                        }
+                        : { session_id: sessionId, audio: audioRequest() }
+                ));
             } else {
                 console.error('No session ID provided to useAudioStream');
                 ws.close();
             }
         };
 
+        const bufferAudio = (audioContext: AudioContext, { buffer: audioBuffer, sequence, timestamp }: DecodedAudioFrame) => {
+            if (sequence !== undefined) {
+                if (nextSequenceRef.current !== null && sequence !== nextSequenceRef.current) {
+                    console.warn(`Audio gap: expected chunk ${nextSequenceRef.current}, got ${sequence}`);
+                }
+                nextSequenceRef.current = sequence + 1;
+            }
+
+            // Store chunk; after a gap it starts at its media timestamp, leaving silence in between
+            const chunkStartTime = timestamp !== undefined
+                ? Math.max(timestamp, totalBufferedDurationRef.current)
+                : totalBufferedDurationRef.current;
+            const chunk: AudioChunk = {
+                buffer: audioBuffer,
+                startTime: chunkStartTime,
+                duration: audioBuffer.duration
+            };
+            audioChunksRef.current.push(chunk);
+            totalBufferedDurationRef.current = chunkStartTime + audioBuffer.duration;
+            setBufferedDuration(totalBufferedDurationRef.current);
+
+            if (isPlayingRef.current) {
+                if (isBufferingRef.current) {
+                    const bufferedAhead = totalBufferedDurationRef.current - currentMediaTimeRef.current;
+                    if (bufferedAhead > rebufferSecondsRef.current || totalBufferedDurationRef.current >= videoDurationRef.current) {
+                        console.log('Buffer filled, resuming...');
+                        isBufferingRef.current = false;
+                        setIsBuffering(false);
+
+                        if (audioContext.state === 'suspended') {
+                            audioContext.resume();
+                        }
+                    }
+                }
+
+                if (playbackAnchorRef.current) {
+                    const { contextTime: anchorContextTime, mediaTime: anchorMediaTime } = playbackAnchorRef.current;
+                    const startTimeInContext = anchorContextTime + (chunk.startTime - anchorMediaTime);
+
+                    if (startTimeInContext + chunk.duration > audioContext.currentTime) {
+                        const source = audioContext.createBufferSource();
+                        source.buffer = chunk.buffer;
+                        source.connect(audioContext.destination);
+
+                        let start = startTimeInContext;
+                        let offset = 0;
+                        let duration = chunk.duration;
+
+                        if (start < audioContext.currentTime) {
+                            offset = audioContext.currentTime - start;
+                            start = audioContext.currentTime;
+                            duration -= offset;
+                        }
+
+                        source.start(start, offset, duration);
+                        activeSourcesRef.current.add(source);
+                        source.onended = () => activeSourcesRef.current.delete(source);
+                    }
+                }
+            }
+
+            const currentVideoDuration = videoDurationRef.current;
+            if (currentVideoDuration > 0 && totalBufferedDurationRef.current >= currentVideoDuration) {
+                console.log('Video duration reached, sending STOP');
+                intentionalCloseRef.current = true;
+                ws.send(JSON.stringify({ command: "STOP" }));
+                ws.close();
+                onStop?.();
+            }
+        };
+
         ws.onmessage = async (event) => {
             if (typeof event.data === 'string') {
                 console.log('Received string message:', event.data);
@@ -182,9 +320,48 @@ export function useAudioStream({ videoDuration, onStop, initialPaused = false, s
                         return;
                     }
 
+                    if (parsedData.type === 'audio_format') {
+                        console.log('Negotiated audio format:', parsedData);
+                        framedAudioRef.current = true;
+                        return;
+                    }
+
+                    if (parsedData.type === 'jitter_buffer') {
+                        rebufferSecondsRef.current = Math.max(MIN_REBUFFER_SECONDS, parsedData.target);
+                        return;
+                    }
+
+                    if (parsedData.type === 'broadcast') {
+                        if (parsedData.error) {
+                            console.warn('Broadcast:', parsedData.error);
+                        } else if (parsedData.state) {
+                            setOwnerState(parsedData.state === 'playing' ? null : parsedData.state);
+                        } else {
+                            setBroadcast({ role: parsedData.role, position: parsedData.position });
+                        }
+                        return;
+                    }
+
+                    if (parsedData.type === 'analysis') {
+                        console.warn('Analysis:', parsedData.error);
+                        setAnalysisError(parsedData.error);
+                        return;
+                    }
+
+                    if (parsedData.type === 'resume_token') {
+                        resumeTokenRef.current = parsedData.token;
+                        reconnectAttemptsRef.current = 0;
+                        return;
+                    }
+
                     if (parsedData.type === 'session_data' && parsedData.data) {
                         console.log('Received session data:', parsedData.data);
-                        setMusicalContext(parsedData as MusicalContext);
+                        // On resume keep the context, it already holds the blocks loaded so far
+                        setMusicalContext(prev => resume && prev ? prev : parsedData as MusicalContext);
+                        setAnalysisError(parsedData.data.analysis_error ?? null);
+                    } else if (parsedData.type === 'musical_blocks' && parsedData.data) {
+                        console.log(`Received musical blocks from ${parsedData.start_index}`);
+                        setMusicalContext(prev => prev && mergeMusicalBlocks(prev, parsedData as MusicalBlocksMessage));
                     } else if (parsedData.global_context && parsedData.musical_blocks) {
                         // Fallback for old format if any
                         console.log('Received legacy musical context:', parsedData);
@@ -206,66 +383,30 @@ export function useAudioStream({ videoDuration, onStop, initialPaused = false, s
                 const audioContext = audioContextRef.current;
                 if (!audioContext) return;
 
-                const audioBuffer = processAudioChunk(audioContext, event.data);
-
-                // Store chunk
-                const chunkStartTime = totalBufferedDurationRef.current;
-                const chunk: AudioChunk = {
-                    buffer: audioBuffer,
-                    startTime: chunkStartTime,
-                    duration: audioBuffer.duration
-                };
-                audioChunksRef.current.push(chunk);
-                totalBufferedDurationRef.current += audioBuffer.duration;
-                setBufferedDuration(totalBufferedDurationRef.current);
-
-                if (isPlayingRef.current) {
-                    if (isBufferingRef.current) {
-                        const bufferedAhead = totalBufferedDurationRef.current - currentMediaTimeRef.current;
-                        if (bufferedAhead > 1.0 || totalBufferedDurationRef.current >= videoDurationRef.current) {
-                            console.log('Buffer filled, resuming...');
-                            isBufferingRef.current = false;
-                            setIsBuffering(false);
-
-                            if (audioContext.state === 'suspended') {
-                                audioContext.resume();
-                            }
-                        }
-                    }
-
-                    if (playbackAnchorRef.current) {
-                        const { contextTime: anchorContextTime, mediaTime: anchorMediaTime } = playbackAnchorRef.current;
-                        const startTimeInContext = anchorContextTime + (chunk.startTime - anchorMediaTime);
-
-                        if (startTimeInContext + chunk.duration > audioContext.currentTime) {
-                            const source = audioContext.createBufferSource();
-                            source.buffer = chunk.buffer;
-                            source.connect(audioContext.destination);
-
-                            let start = startTimeInContext;
-                            let offset = 0;
-                            let duration = chunk.duration;
-
-                            if (start < audioContext.currentTime) {
-                                offset = audioContext.currentTime - start;
-                                start = audioContext.currentTime;
-                                duration -= offset;
-                            }
-
-                            source.start(start, offset, duration);
-                            activeSourcesRef.current.add(source);
-                            source.onended = () => activeSourcesRef.current.delete(source);
-                        }
+                const data = event.data;
+                if (framedAudioRef.current) {
+                    const frame = parseAudioFrame(data);
+                    if (frame.codec === CODEC_OPUS) {
+                        // Opus is one stream across chunks, decoded in order as it arrives
+                        opusDecoder ??= new OpusStreamDecoder(
+                            audioContext,
+                            decoded => {
+                                if (wsRef.current === ws) bufferAudio(audioContext, decoded);
+                            },
+                            e => console.error('Failed to decode audio stream:', e),
+                        );
+                        opusDecoder.push(frame);
+                        return;
                     }
                 }
-
-                const currentVideoDuration = videoDurationRef.current;
-                if (currentVideoDuration > 0 && totalBufferedDurationRef.current >= currentVideoDuration) {
-                    console.log('Video duration reached, sending STOP');
-                    ws.send(JSON.stringify({ command: "STOP" }));
-                    ws.close();
-                    onStop?.();
-                }
+                decodeChainRef.current = decodeChainRef.current
+                    .then(async () => {
+                        const frame = framedAudioRef.current
+                            ? await decodeAudioFrame(audioContext, data)
+                            : { buffer: processAudioChunk(audioContext, data) };
+                        if (wsRef.current === ws) bufferAudio(audioContext, frame);
+                    })
+                    .catch(e => console.error('Failed to decode audio chunk:', e));
             }
         };
 
@@ -275,10 +416,22 @@ export function useAudioStream({ videoDuration, onStop, initialPaused = false, s
 
         ws.onclose = () => {
             console.log('WebSocket closed');
+            opusDecoder?.close();
+            if (wsRef.current !== ws || intentionalCloseRef.current || !resumeTokenRef.current) return;
+
+            if (reconnectAttemptsRef.current >= MAX_RECONNECT_ATTEMPTS) {
+                console.error('Giving up on resuming the music stream');
+                return;
+            }
+            const delay = RECONNECT_BASE_DELAY_MS * 2 ** reconnectAttemptsRef.current;
+            reconnectAttemptsRef.current += 1;
+            setTimeout(() => connectRef.current?.(true), delay);
         };
 
     }, [onStop]);
 
+    connectRef.current = connect;
+
     const seek = useCallback((time: number) => {
         if (!audioContextRef.current) return;
 
@@ -350,6 +503,8 @@ export function useAudioStream({ videoDuration, onStop, initialPaused = false, s
     }, [stopAllSources]);
 
     const stop = useCallback(() => {
+        intentionalCloseRef.current = true;
+        resumeTokenRef.current = null;
         wsRef.current?.close();
         wsRef.current = null;
         audioContextRef.current?.close();
@@ -365,6 +520,8 @@ export function useAudioStream({ videoDuration, onStop, initialPaused = false, s
         isBufferingRef.current = false;
         setIsBuffering(false);
         setMusicalContext(null);
+        setAnalysisError(null);
+        setOwnerState(null);
     }, [stopAllSources]);
 
     return {
@@ -375,7 +532,10 @@ export function useAudioStream({ videoDuration, onStop, initialPaused = false, s
         isReady,
         isBuffering,
         bufferedDuration,
-        musicalContext
+        musicalContext,
+        broadcast,
+        analysisError,
+        ownerState
     };
 }
 